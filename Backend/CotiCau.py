@@ -1,27 +1,71 @@
-from turtle import pd
-from fastapi import FastAPI, HTTPException
+import asyncio
+import anyio
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import pyodbc
-import pandas as pd
-from typing import List
+from functools import partial
+from typing import Iterator, List
 # Configuración de la conexión a SQL Server
 from dotenv import load_dotenv
+import json
 import os
-class ImpuestoDetalle(BaseModel):
-    impCod: str
-    base: float
-    alicuota: float
-    importe: float
+import time
+from pool import ConnectionPool, PoolTimeout
+from db_async import DBExecutor, QueryTimeout
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from derechos import cargar_tabla
+from cotizacion import (FuenteCotizacion, QuoteDetails, calcular_comparacion, calcular_cotizacion,
+                        calcular_planes, clave_solicitud, compactar, parsear_impuestos)
+from impuestos import PlanImpuestos
+from cache import CacheTTL
+from cache_resultados import CacheResultados
+from recotizacion import Recotizador, Resultado, Trabajo
+from grilla import filas_grilla, rango
+import masivo
+from singleflight import SingleFlight
+from metricas import metricas
+import registro
+import replica
+import tomador
+from tomador import PerfilTomador
+import ramos
+from ramos import Ramo
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Abrir las conexiones mínimas antes de atender el primer request
+    try:
+        db_pool.warm()
+    except Exception as e:
+        # Sin base disponible igual levantamos; el pool reintenta al prestar
+        log.warning("No se pudo precalentar el pool de conexiones", extra={"campos": {"error": str(e)}})
+    precalentado = asyncio.create_task(_precalentar()) if PRECALENTAR_SOLICITUDES > 0 else None
+    vigilancia = asyncio.create_task(_vigilar_tarifas()) if RAMOS_CONFIG and TARIFAS_REVISAR > 0 else None
+    yield
+    for tarea in (precalentado, vigilancia):
+        if tarea:
+            tarea.cancel()
+    cerrar()
 
-# Cargar la tabla de derechos de emisión
-deremi_df = pd.read_excel("deremi.xlsx")
 
-# Asegurarse que los nombres de columnas estén limpios
-deremi_df.columns = deremi_df.columns.str.strip()
+def cerrar():
+    # Procesos de recotización, cache de resultados, hilos y conexiones de la
+    # base y el hilo del registro; también lo usa recotizar_archivo.py
+    for rm in ramos_activos.values():
+        rm.recotizador.close()
+    if resultados_cache:
+        resultados_cache.close()
+    db.close()
+    db_pool.close()
+    registro.detener()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 class impDetail(BaseModel):
@@ -42,6 +86,13 @@ app.add_middleware(
 # carga .env si existe
 load_dotenv()  
 
+# Logs JSON por una cola (formato y escritura en un hilo aparte); LOG_MUESTREO
+# es la fracción de eventos por request que se registra
+log = registro.configurar(
+    nivel=os.getenv("LOG_LEVEL", "INFO"),
+    muestreo=float(os.getenv("LOG_MUESTREO", "0.01")),
+)
+
 DB_SERVER = os.getenv("DB_SERVER")
 DB_DATABASE = os.getenv("DB_DATABASE")
 DB_USERNAME = os.getenv("DB_USERNAME")
@@ -58,6 +109,125 @@ conn_str = (
     f'PWD={DB_PASSWORD}'
 )
 
+def conectar():
+    with metricas.medir("etapa_segundos", etapa="connect"):
+        return pyodbc.connect(conn_str, autocommit=True)
+
+# Con REPLICA_PATH se atiende desde la réplica local de las solicitudes
+# (exportar_replica.py) en lugar de SQL Server, con las mismas consultas
+REPLICA_PATH = os.getenv("REPLICA_PATH")
+
+# Pool de conexiones: se reutilizan entre requests en lugar de abrir una por llamada
+db_pool = ConnectionPool(
+    partial(replica.conectar, REPLICA_PATH) if REPLICA_PATH else conectar,
+    min_size=int(os.getenv("DB_POOL_MIN", "2")),
+    max_size=int(os.getenv("DB_POOL_MAX", "10")),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+    recycle=float(os.getenv("DB_POOL_RECYCLE", "1800")),
+    ping_after=float(os.getenv("DB_POOL_PING_AFTER", "30")),
+)
+
+# Hilos dedicados a las consultas (aparte del threadpool de AnyIO donde corre el
+# cálculo) y timeout por consulta; más hilos que conexiones sólo harían esperar al pool
+db = DBExecutor(
+    db_pool,
+    max_workers=int(os.getenv("DB_EXECUTOR_WORKERS", str(db_pool.max_size))),
+    timeout=float(os.getenv("DB_QUERY_TIMEOUT", "15")),
+)
+
+# Ramos (EmpCod, RamCod) atendidos, de RAMOS_CONFIG (ver ramos.py). Las tablas de
+# derechos se cargan desde su snapshot binario; pandas y openpyxl sólo se
+# importan si la planilla cambió (ver derechos.py). Ramos con la misma planilla
+# comparten la tabla
+RAMOS_CONFIG = os.getenv("RAMOS_CONFIG")
+# La marca se toma antes de leer: un cambio durante la lectura se recarga después
+marca_ramos = ramos.marca(RAMOS_CONFIG)
+RAMOS = ramos.leer_config(RAMOS_CONFIG)
+tablas_derechos = {}
+for config in RAMOS:
+    if config.deremi not in tablas_derechos:
+        tablas_derechos[config.deremi] = cargar_tabla(config.deremi)
+
+# Recotización masiva: con RECOTIZACION_WORKERS > 1 los lotes grandes se reparten
+# entre procesos (fork en POSIX: los workers heredan tabla y tarifa sin
+# serializarlas); un recotizador por ramo, con su tabla y su tarifa
+ramos_activos = {
+    (config.empresa, config.ramo): Ramo(
+        config.empresa, config.ramo, tablas_derechos[config.deremi], config.tarifa,
+        Recotizador(
+            tablas_derechos[config.deremi],
+            workers=int(os.getenv("RECOTIZACION_WORKERS", "1")),
+            chunk_size=int(os.getenv("RECOTIZACION_CHUNK", "500")),
+            start_method=os.getenv("RECOTIZACION_START") or None,
+            tarifa=config.tarifa,
+        ),
+    )
+    for config in RAMOS
+}
+
+# Ramo de los endpoints que no indican ?empresa=&ramo=
+EMPRESA, RAMO = RAMOS[0].empresa, RAMOS[0].ramo
+
+# Cada cuántos segundos se revisa si cambió RAMOS_CONFIG para recargar las
+# tarifas sin reiniciar (0 = no revisar)
+TARIFAS_REVISAR = float(os.getenv("TARIFAS_REVISAR", "5"))
+
+# Solicitudes más recientes de cada ramo que se cargan en cache_solicitudes al
+# arrancar (0 = no precalentar)
+PRECALENTAR_SOLICITUDES = int(os.getenv("PRECALENTAR_SOLICITUDES", "500"))
+
+# Cache de los datos de cada solicitud (tasa, suma, cargos e impuestos
+# compilados) por (EmpCod, RamCod, SolNro): cada acierto se revalida con una
+# consulta de versión en lugar de repetir la consulta completa.
+# SOLICITUD_REVALIDAR > 0 acepta servir una solicitud editada durante esos
+# segundos a cambio de ahorrar la consulta
+cache_solicitudes = CacheTTL(
+    max_size=int(os.getenv("SOLICITUD_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("SOLICITUD_CACHE_TTL", "300")),
+    revalidar=float(os.getenv("SOLICITUD_REVALIDAR", "0")),
+)
+
+# Perfil del tomador por (EmpCod, RamCod, SolNro) (id, CUIT, nombre, provincia):
+# cambiar el monto o el plazo en /policyholder no vuelve a consultar la base
+cache_tomadores = CacheTTL(
+    max_size=int(os.getenv("TOMADOR_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("TOMADOR_CACHE_TTL", "3600")),
+)
+
+# Proporciones de sumaAseg * meses para itemA..itemE, p. ej. "itemA=.20,itemC=.25"
+PROPORCIONES_ITEMS = tomador.parsear_proporciones(os.getenv("TOMADOR_ITEMS"))
+
+# Versión de la solicitud. Con SOLICITUD_ROWVERSION (las columnas rowversion de
+# solici, SolRieCob y SolImp, p. ej. "s.Sol1RowVer,c.Sol14RowVer,i.Sol2RowVer")
+# es la mayor de las tres, que cambia con cualquier modificación de la solicitud
+# y se lee con búsquedas por clave. Sin rowversion, un checksum de las columnas
+# que usa la cotización (el mismo que compara la réplica)
+SOLICITUD_ROWVERSION = [c.strip() for c in os.getenv("SOLICITUD_ROWVERSION", "").split(",") if c.strip()]
+if SOLICITUD_ROWVERSION:
+    VERSION_ORIGEN = replica.version_rowversion(*SOLICITUD_ROWVERSION)
+else:
+    VERSION_ORIGEN = """checksum(
+            binary_checksum(s.Sol1Pri, s.Sol1RAd, s.Sol1RFin, s.Sol1DEm, s.Sol1OtrCar, c.Sol14TasApl, c.Sol14CapAse),
+            (select checksum_agg(binary_checksum(i.ImpCod, i.Sol2Base, i.Sol2Ali))
+             from SolImp i
+             where i.EmpCod = s.EmpCod and i.RamCod = s.RamCod and i.SolNro = s.SolNro))"""
+# La réplica guarda la versión que tenía cada solicitud en SQL Server, así las
+# claves de los caches no cambian al pasar de una base a la otra
+VERSION_SOLICITUD = "s.ReplicaVersion" if REPLICA_PATH else VERSION_ORIGEN
+
+# Resultados de /recotizar2 memorizados en un SQLite local, compartido por
+# todos los workers de uvicorn (RESULTADOS_CACHE_SIZE=0 lo desactiva)
+resultados_cache = None
+if int(os.getenv("RESULTADOS_CACHE_SIZE", "100000")) > 0:
+    resultados_cache = CacheResultados(
+        os.getenv("RESULTADOS_CACHE_PATH", "resultados.sqlite"),
+        max_entries=int(os.getenv("RESULTADOS_CACHE_SIZE", "100000")),
+        ttl=float(os.getenv("RESULTADOS_CACHE_TTL", "3600")),
+    )
+
+# Coalescencia de pedidos idénticos en curso (lecturas y cotizaciones)
+vuelos = SingleFlight()
+
 class PolicyHolder(BaseModel):
     id: str
     cuit: str
@@ -70,24 +240,43 @@ class PolicyHolder(BaseModel):
     itemD: float
     itemE: float
 
-class QuoteDetails(BaseModel):
-    primaTarifa: float
-    bonificacion: float
-    bonificacionPct: float
-    primaNeta: float
-    recAdministrativo: float
-    recAdministrativoPct: float
-    recFinanciero: float
-    recFinancieroPct: float
-    derEmision: float
-    gastosEscribania: float
-    subtotal: float
-    impuestos: float
-    # nueva sublista de impuestos
-    detalleImpuestos: List[ImpuestoDetalle] = []
-    premio: float
-    tasaAplicada: float
-    sumaAsegurada: float
+class BatchQuoteItem(BaseModel):
+    application_id: str
+    premioinformado: int
+    dias: int
+    sumaTotal: float
+    cuotas: int
+    tipo: str = 'F'
+
+class BatchQuoteResult(BaseModel):
+    application_id: str
+    quote: QuoteDetails | None = None
+    error: str | None = None
+
+class PlanCuotas(BaseModel):
+    cuotas: int
+    quote: QuoteDetails
+
+class PantallaSolicitud(BaseModel):
+    policyHolder: PolicyHolder | None = None
+    # Cotización guardada en la solicitud (/quote) y su detalle de impuestos (/impDetail)
+    quote: QuoteDetails
+    impuestos: List[impDetail]
+    # Recotización con los parámetros de /recotizar2, si se enviaron dias y sumaTotal
+    recotizacion: QuoteDetails | None = None
+
+class ComparacionTipos(BaseModel):
+    tipos: List[str]
+    cuotas: List[int]
+    # Por tipo
+    tasaAplicada: List[float]
+    primaTarifa: List[float]
+    derEmision: List[float]
+    # Por tipo y cuotas: [tipo][plan]
+    subtotal: List[List[float]]
+    impuestos: List[List[float]]
+    recFinanciero: List[List[float]]
+    premio: List[List[float]]
 
 # Datos de ejemplo
 policyholders = {
@@ -125,44 +314,101 @@ quotes = {
     )
 }
 
-@app.get("/impDetail/{application_id}/", response_model=list[impDetail])
-def get_taxes(application_id: str):
-    query = """
-    select ImpCod, Sol2Base, Sol2Ali, Sol2Imp
-    from SolImp s
-    where s.EmpCod = 1 and s.RamCod = 9 and s.SolNro = ?
-    """
+@app.middleware("http")
+async def medir_requests(request: Request, call_next):
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    # Ruta con sus parámetros ({application_id}, ...) para no abrir una serie por solicitud
+    ruta = request.scope.get("route")
+    metricas.observar("request_segundos", time.perf_counter() - t0,
+                      ruta=getattr(ruta, "path", "otra"), metodo=request.method)
+    return response
+
+@app.get("/metrics")
+async def get_metrics():
+    medidores = {f"pool_{k}": v for k, v in db_pool.stats().items()}
+    medidores.update({f"ejecutor_{k}": v for k, v in db.stats().items()})
+    medidores.update({f"cache_solicitudes_{k}": v for k, v in cache_solicitudes.stats().items()})
+    return Response(content=metricas.exportar(medidores), media_type="text/plain; version=0.0.4")
+
+@app.get("/pool/stats")
+async def get_pool_stats():
+    return {**db_pool.stats(), "ejecutor": db.stats()}
+
+@app.get("/tarifas")
+async def get_tarifas():
+    return [
+        {"empresa": rm.empresa, "ramo": rm.ramo, "version": rm.tarifa.version,
+         "factor_tipo": rm.tarifa.factor_tipo, "aumento_cuotas": rm.tarifa.aumento_cuotas,
+         "rec_admin_pct": rm.tarifa.rec_admin_pct}
+        for rm in ramos_activos.values()
+    ]
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return {
+        "solicitudes": cache_solicitudes.stats(),
+        "tomadores": cache_tomadores.stats(),
+        "resultados": resultados_cache.stats() if resultados_cache else None,
+        "coalescencia": vuelos.stats(),
+    }
+
+def _ramo(empresa: int, ramo: int) -> Ramo:
+    rm = ramos_activos.get((empresa, ramo))
+    if rm is None:
+        raise HTTPException(status_code=404, detail=f"Ramo {empresa}/{ramo} no configurado")
+    return rm
+
+
+@contextmanager
+def _errores_http():
+    # Errores de la base y del cálculo como respuesta HTTP: consulta vencida 504,
+    # pool agotado 503 y el resto 500. Las HTTPException (p. ej. un 404) pasan tal cual
     try:
-        with pyodbc.connect(conn_str) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, application_id)
-            rows = cursor.fetchall()
-            if rows:
-                return [
-                    impDetail(
-                        impCod=row.ImpCod,
-                        sol2Base=row.Sol2Base,
-                        sol2Ali=row.Sol2Ali,
-                        sol2Imp=row.Sol2Imp 
-                    )
-                    for row in rows
-                ]
-            else:
-                raise HTTPException(status_code=404, detail="No taxes found")
+        yield
+    except HTTPException:
+        raise
+    except QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/policyholder/{application_id}/{sumaAseg}/{meses}", response_model=PolicyHolder)
-def get_policyholder(application_id: str, sumaAseg: int, meses: int):
+# Las consultas reciben EmpCod y RamCod como parámetros: el texto es el mismo
+# para todos los ramos y SQL Server reutiliza un único plan por consulta
+
+@app.get("/impDetail/{application_id}/", response_model=list[impDetail])
+async def get_taxes(application_id: str, empresa: int = EMPRESA, ramo: int = RAMO):
+    rm = _ramo(empresa, ramo)
     query = """
-    select p.PerCod as id, p.PerCui as cuit, a.AseNom as name, pro.PrvCod as provinceCode, pro.PrvNom as province,
-    (? * ?) * .20 itemA,
-    0 itemB,
-    (? * ?) * .25 itemC,
-    (? * ?) * .20 itemD,
-    (? * ?) * .35 itemE,
-    c.Sol14TasApl tasaAplicada,
-    c.Sol14CapAse sumaAsegurada
+    select ImpCod, Sol2Base, Sol2Ali, Sol2Imp
+    from SolImp s
+    where s.EmpCod = ? and s.RamCod = ? and s.SolNro = ?
+    """
+    def consulta(cursor):
+        cursor.execute(query, rm.empresa, rm.ramo, application_id)
+        return cursor.fetchall()
+
+    with _errores_http():
+        rows = await db.run(consulta)
+        if rows:
+            return [
+                impDetail(
+                    impCod=row.ImpCod,
+                    sol2Base=row.Sol2Base,
+                    sol2Ali=row.Sol2Ali,
+                    sol2Imp=row.Sol2Imp 
+                )
+                for row in rows
+            ]
+        else:
+            raise HTTPException(status_code=404, detail="No taxes found")
+
+# Perfil del tomador (no depende del monto ni del plazo); los ítems se
+# calculan en tomador.items
+QUERY_TOMADOR = """
+    select p.PerCod as id, p.PerCui as cuit, a.AseNom as name, pro.PrvCod as provinceCode, pro.PrvNom as province
     from solici s
     left join TomCau tc on tc.TCauCod = s.Sol1TomCod
     left join Aseg a on a.AseCod = tc.TCauAseCod
@@ -170,34 +416,46 @@ def get_policyholder(application_id: str, sumaAseg: int, meses: int):
     left join Personas2 p1 on p1.PerCod = p.PerCod
     left join CodPos cp on cp.CPCod = p1.CPCod and cp.CPSub = p1.CPSub
     left join Provin pro on pro.PrvCod = cp.PrvCod
-    left join SolRieCob c on s.EmpCod = c.EmpCod and c.RamCod = s.RamCod and s.SolNro = c.SolNro
-    where s.EmpCod = 1 and s.RamCod = 9 and s.SolNro = ?
+    where s.EmpCod = ? and s.RamCod = ? and s.SolNro = ?
     """
-    try:
-        with pyodbc.connect(conn_str) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, sumaAseg, meses, sumaAseg, meses, sumaAseg, meses, sumaAseg, meses, application_id)
-            row = cursor.fetchone()
-            if row:
-                return PolicyHolder(
-                    id=str(row.id),
-                    cuit=row.cuit,
-                    name=row.name,
-                    provinceCode=row.provinceCode,
-                    province=row.province,
-                    itemA=row.itemA,
-                    itemB=row.itemB,
-                    itemC=row.itemC,
-                    itemD=row.itemD,
-                    itemE=row.itemE
-                )
-            else:
-                raise HTTPException(status_code=404, detail="PolicyHolder not found")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _fetch_tomador(cursor, rm: Ramo, application_id: str) -> PerfilTomador | None:
+    cursor.execute(QUERY_TOMADOR, rm.empresa, rm.ramo, application_id)
+    row = cursor.fetchone()
+    return tomador.perfil_desde_fila(row) if row else None
+
+
+async def _perfil_tomador(rm: Ramo, application_id: str) -> PerfilTomador | None:
+    # Un acierto no toca la base ni el pool (cargar devuelve None: sólo consulta el cache)
+    clave = (rm.empresa, rm.ramo, application_id)
+    perfil = cache_tomadores.obtener(clave, lambda: None)
+    if perfil is None:
+        # Lecturas simultáneas del mismo SolNro comparten una sola consulta
+        perfil = await vuelos.do(("tomador", *clave), db.run, _fetch_tomador, rm, application_id)
+        if perfil is not None:
+            cache_tomadores.guardar(clave, perfil)
+    return perfil
+
+
+def _policyholder(perfil: PerfilTomador, sumaAseg: int, meses: int) -> PolicyHolder:
+    return PolicyHolder(**perfil._asdict(), **tomador.items(sumaAseg, meses, PROPORCIONES_ITEMS))
+
+
+@app.get("/policyholder/{application_id}/{sumaAseg}/{meses}", response_model=PolicyHolder)
+async def get_policyholder(application_id: str, sumaAseg: int, meses: int, empresa: int = EMPRESA,
+                           ramo: int = RAMO):
+    rm = _ramo(empresa, ramo)
+    with _errores_http():
+        perfil = await _perfil_tomador(rm, application_id)
+        if perfil:
+            return _policyholder(perfil, sumaAseg, meses)
+        else:
+            raise HTTPException(status_code=404, detail="PolicyHolder not found")
 
 @app.get("/quote/{application_id}/", response_model=QuoteDetails)
-def get_quote(application_id: str):
+async def get_quote(application_id: str, empresa: int = EMPRESA, ramo: int = RAMO):
+    rm = _ramo(empresa, ramo)
     query = """
     select 
         s.Sol1Pri as primaTarifa, 
@@ -217,60 +475,42 @@ def get_quote(application_id: str):
         c.Sol14CapAse sumaAsegurada     
     from solici s 
     left join SolRieCob c on s.EmpCod = c.EmpCod and c.RamCod = s.RamCod and s.SolNro = c.SolNro
-    where s.EmpCod = 1 and s.RamCod = 9 and s.SolNro = ?
+    where s.EmpCod = ? and s.RamCod = ? and s.SolNro = ?
     """
-    try:
-        with pyodbc.connect(conn_str) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, application_id)
-            row = cursor.fetchone()
-            if row:
-                return QuoteDetails(
-                    primaTarifa=row.primaTarifa,
-                    bonificacion=row.bonificacion,
-                    bonificacionPct=row.bonificacionPct,
-                    primaNeta=row.primaNeta,
-                    recAdministrativo=row.recAdministrativo,
-                    recAdministrativoPct=row.recAdministrativoPct,
-                    recFinanciero=row.recFinanciero,
-                    recFinancieroPct=row.recFinancieroPct,
-                    derEmision=row.derEmision,
-                    gastosEscribania=row.gastosEscribania,
-                    subtotal=row.subtotal,
-                    impuestos=row.impuestos,
-                    premio=row.premio,
-                    tasaAplicada=row.tasaAplicada,
-                    sumaAsegurada=row.sumaAsegurada 
-                )
-            else:
-                raise HTTPException(status_code=404, detail="Quote not found")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
-
-def obtener_derecho(prima: float) -> float:
-    # Filtrar las filas con PRIMA <= prima
-    candidatos = deremi_df[deremi_df["PRIMA"] <= prima]
-
-    if candidatos.empty:
-        # Si no hay ninguna prima menor o igual, devolvemos el mínimo
-        return float(deremi_df["DERECHO"].iloc[0])
-    else:
-        # Elegir la PRIMA más cercana (la máxima que cumpla la condición)
-        fila = candidatos.loc[candidatos["PRIMA"].idxmax()]
-        return float(fila["DERECHO"])
-
-@app.get("/recotizar2/{application_id}/{premioinformado}/{dias}/{sumaTotal}/{cuotas}/{tipo}", response_model=QuoteDetails)
-def get_quote_with_suma_and_cuotas(application_id: str, premioinformado: int, dias: int, sumaTotal: float, cuotas: int, tipo: str):
-    tipo = tipo.upper() if tipo else 'F'
-    # simplemente pasar cuotas al handler; actualmente no se usa en la lógica
-    return _get_quote_internal(application_id, premioinformado, dias, float(sumaTotal), tipo, cuotas)
+    def consulta(cursor):
+        cursor.execute(query, rm.empresa, rm.ramo, application_id)
+        return cursor.fetchone()
 
+    with _errores_http():
+        row = await db.run(consulta)
+        if row:
+            return QuoteDetails(
+                primaTarifa=row.primaTarifa,
+                bonificacion=row.bonificacion,
+                bonificacionPct=row.bonificacionPct,
+                primaNeta=row.primaNeta,
+                recAdministrativo=row.recAdministrativo,
+                recAdministrativoPct=row.recAdministrativoPct,
+                recFinanciero=row.recFinanciero,
+                recFinancieroPct=row.recFinancieroPct,
+                derEmision=row.derEmision,
+                gastosEscribania=row.gastosEscribania,
+                subtotal=row.subtotal,
+                impuestos=row.impuestos,
+                premio=row.premio,
+                tasaAplicada=row.tasaAplicada,
+                sumaAsegurada=row.sumaAsegurada 
+            )
+        else:
+            raise HTTPException(status_code=404, detail="Quote not found")
+    
 
-def _get_quote_internal(application_id: str, premioinformado: int, dias: int, sumaTotal: float | None, tipo: str, cuotas: int | None = None):
-    print(premioinformado, dias, sumaTotal, tipo, cuotas)
-    query = """
-    select 
+# Columnas de la cotización (solici + SolRieCob) con los impuestos de SolImp
+# agregados como JSON en la misma fila: una sola ida y vuelta a la base por
+# cotización. Cada consulta agrega su filtro por SolNro después de EmpCod y RamCod.
+COLUMNAS_COTIZACION = f"""
+        s.SolNro as SolNro,
+        {VERSION_SOLICITUD} as version,
         s.Sol1Pri as primaTarifa, 
         s.Sol1BonPriPor as bonificacionPct, 
         s.Sol1BonPri as bonificacion,
@@ -286,267 +526,435 @@ def _get_quote_internal(application_id: str, premioinformado: int, dias: int, su
         s.Sol1Pre as premio,
         c.Sol14TasApl tasaAplicada,
         c.Sol14CapAse sumaAsegurada,
-        datediff(day, s.Sol1VigDesFac, s.Sol1VigHasFac) diasVigencia
+        datediff(day, s.Sol1VigDesFac, s.Sol1VigHasFac) diasVigencia"""
+
+QUERY_COTIZACION = f"""
+    select {COLUMNAS_COTIZACION},
+        (select i.ImpCod, i.Sol2Base, i.Sol2Ali
+         from SolImp i
+         where i.EmpCod = s.EmpCod and i.RamCod = s.RamCod and i.SolNro = s.SolNro
+         for json path) as impuestosJson
     from solici s 
     left join SolRieCob c on s.EmpCod = c.EmpCod and c.RamCod = s.RamCod and s.SolNro = c.SolNro
-    where s.EmpCod = 1 and s.RamCod = 9 and s.SolNro = ?
-    """
+    where s.EmpCod = ? and s.RamCod = ?"""
+
+# Todo lo que muestra la pantalla de una solicitud en una fila: la cotización
+# (con el importe de cada impuesto), las columnas de /quote que difieren y el
+# tomador de /policyholder
+QUERY_PANTALLA = f"""
+    select {COLUMNAS_COTIZACION},
+        (select i.ImpCod, i.Sol2Base, i.Sol2Ali, i.Sol2Imp
+         from SolImp i
+         where i.EmpCod = s.EmpCod and i.RamCod = s.RamCod and i.SolNro = s.SolNro
+         for json path) as impuestosJson,
+        s.Sol1RFiPor as recFinancieroPctSolicitud,
+        s.Sol1Pri + s.Sol1BonPri + s.Sol1RAdPor + s.Sol1RAd + s.Sol1RFiPor + s.Sol1RFin + s.Sol1DEm as subtotalSolicitud,
+        p.PerCod as holderId, p.PerCui as cuit, a.AseNom as name, pro.PrvCod as provinceCode, pro.PrvNom as province
+    from solici s
+    left join SolRieCob c on s.EmpCod = c.EmpCod and c.RamCod = s.RamCod and s.SolNro = c.SolNro
+    left join TomCau tc on tc.TCauCod = s.Sol1TomCod
+    left join Aseg a on a.AseCod = tc.TCauAseCod
+    left join Personas p on p.PerCod = a.AsePerCod
+    left join Personas2 p1 on p1.PerCod = p.PerCod
+    left join CodPos cp on cp.CPCod = p1.CPCod and cp.CPSub = p1.CPSub
+    left join Provin pro on pro.PrvCod = cp.PrvCod
+    where s.EmpCod = ? and s.RamCod = ? and s.SolNro = ?"""
 
-    query_impuestos = """
-    select ImpCod, Sol2Base, Sol2Ali, Sol2Imp
-    from SolImp s
-    where s.EmpCod = 1 and s.RamCod = 9 and s.SolNro = ?
-    """
+# Sólo la versión, para revalidar una solicitud ya cacheada
+QUERY_VERSION = f"""
+    select {VERSION_SOLICITUD} as version
+    from solici s
+    left join SolRieCob c on s.EmpCod = c.EmpCod and c.RamCod = s.RamCod and s.SolNro = c.SolNro
+    where s.EmpCod = ? and s.RamCod = ? and s.SolNro = ?"""
 
-    # Determinar el premio objetivo: si se envió sumaTotal y tipo, calcular según regla
-    target_premio = float(premioinformado)
-    if sumaTotal is not None:
-        t = (tipo or 'F').upper()
-        if t == 'F':
-            target_premio = (float(sumaTotal) / 100.0) * 4.3
-        elif t == 'C':
-            target_premio = (float(sumaTotal) / 100.0) * 4.8
-        elif t == 'U':
-            target_premio = (float(sumaTotal) / 100.0) * 3.0
-    
-    try:
-        with pyodbc.connect(conn_str) as conn:
-            cursor = conn.cursor()
-
-            # consulta principal
-            cursor.execute(query, application_id)
-            row = cursor.fetchone()
-            if not row:
-                raise HTTPException(status_code=404, detail="Quote not found")
-
-            # consulta impuestos
-            cursor.execute(query_impuestos, application_id)
-            impuestos_rows = cursor.fetchall()
-
-            # Datos base
-            tasa = float(row.tasaAplicada)
-            sumaAseg = float(row.sumaAsegurada)
-            # sumaTotal enviada por el frontend (premio * meses) — si se envió, la usamos para logging
-            if sumaTotal is not None:
-                print(f"Suma total recibida desde servicio: {sumaTotal}")
-                # Usar la suma total enviada como suma asegurada para los cálculos y la respuesta
-                try:
-                    sumaAseg = float(sumaTotal)
-                except Exception:
-                    # si la conversión falla, mantenemos el valor de la DB
-                    pass
-            # valor de base desde la DB (por referencia); puede ser recalculado según cuotas
-            rec_financiero_db = float(row.recFinanciero)
-            prima_tarifa_orig = float(row.primaTarifa)
-            der_emision_orig = float(row.derEmision)
-            rec_adm_monto = float(row.recAdministrativo)
-            # Forzar bonificación a 0 según requerimiento
-            bonificacion = 0.0
-            gastos_escribania = float(row.gastosEscribania)
-
-            # Fijar recargo administrativo en 15% según requerimiento
-            rec_admin_pct = 15.0
-
-            # Determinar incremento sobre el premio según cantidad de cuotas (aumento_pct aplicado al premio final)
-            # Valores solicitados (aplican al premio):
-            # 1 cuota  -> 0%
-            # 3 cuotas -> 10.07%
-            # 6 cuotas -> 15.37%
-            # 9 cuotas -> 20.47%
-            # 12 cuotas-> 25.87%
-            aumento_pct = 0.0
-            rec_financiero_pct = 0.0
-            if cuotas is not None:
-                try:
-                    cuotas_int = int(cuotas)
-                except Exception:
-                    cuotas_int = None
-
-                if cuotas_int == 1:
-                    aumento_pct = 0.0
-                elif cuotas_int == 3:
-                    aumento_pct = 10.07
-                elif cuotas_int == 6:
-                    aumento_pct = 15.37
-                elif cuotas_int == 9:
-                    aumento_pct = 20.47
-                elif cuotas_int == 12:
-                    aumento_pct = 25.87
-                else:
-                    aumento_pct = 0.0
-
-                # El recargo financiero porcentual será igual al aumento por cuotas
-                rec_financiero_pct = float(aumento_pct)
-
-                # Para este modelo, el premio target es el mismo sin importar las cuotas
-                # (luego agregaremos el recargo financiero como un componente adicional)
-                effective_target_premio = float(target_premio)
-                
-                # El recargo financiero inicial es 0, se calculará después de tener el premio base
-                rec_financiero_db = 0.0
-            else:
-                effective_target_premio = float(target_premio)
-                rec_financiero_db = 0.0
-            
-            tasa_original = float(row.tasaAplicada)
-            tasa_min, tasa_max = 0.0, max(tasa_original * 10.0, 1000.0)
-            tasa_actual = tasa_original
-
-            # Subtotal original (para referencia de impuestos) - usar el recargo financiero de la DB como referencia
-            subtotal_orig = prima_tarifa_orig + der_emision_orig + rec_financiero_db + rec_adm_monto + rec_financiero_db
-
-            # Iteración de bisección
-            tolerancia = 0.01
-            max_iter = 100
-            iter_count = 0
-
-            while iter_count < max_iter:
-                # Calcular prima tarifa por días
-                nueva_prima_tarifa = (tasa_actual * sumaAseg) / 1000 / 365 * dias
-
-                # Recargo administrativo fijo
-                nuevo_recargo_adm = nueva_prima_tarifa * (rec_admin_pct / 100)
-
-                # Der. de emisión
-                nuevo_der_emision = obtener_derecho(nueva_prima_tarifa)
-
-                # Recargo financiero: usar el monto fijo de la DB (no se modifica por cuotas)
-                rec_financiero = rec_financiero_db
-
-                # Subtotal provisorio (sin recargo financiero aún)
-                subtotal_base = nueva_prima_tarifa - bonificacion + nuevo_der_emision + nuevo_recargo_adm + gastos_escribania
-
-                # Impuestos: definir una base imponible clara que incluya
-                # la prima tarifa, recargo administrativo y derecho de emisión
-                # (excluimos recargo financiero y gastos de escribanía de la base)
-                detalle_impuestos = []
-                # Base imponible usada para impuestos (sin recargo financiero)
-                base_imponible = nueva_prima_tarifa - bonificacion + nuevo_recargo_adm + nuevo_der_emision
-                
-                base_ori = 0
-                for r in impuestos_rows:
-                    if r.Sol2Base == base_ori or base_ori == 0:
-                        base_ori = r.Sol2Base
-                        ali = float(r.Sol2Ali) if hasattr(r, 'Sol2Ali') else 0.0
-                        # Usamos la misma base imponible para todos los impuestos recogidos
-                        imp_base = round(base_imponible, 2)
-                        imp_importe = round(imp_base * ali / 100.0, 2)
-                        detalle_impuestos.append(ImpuestoDetalle(
-                            impCod=str(r.ImpCod),
-                            base=imp_base,
-                            alicuota=ali,
-                            importe=imp_importe
-                        ))
-                    else:
-                        # Si la base original no coincide, asignar 0 (caso especial)
-                        detalle_impuestos.append(ImpuestoDetalle(
-                            impCod=str(r.ImpCod),
-                            base=0.0,
-                            alicuota=float(r.Sol2Ali) if hasattr(r, 'Sol2Ali') else 0.0,
-                            importe=0.0
-                        ))
-
-                total_impuestos = round(sum(imp.importe for imp in detalle_impuestos), 2) + base_imponible
-
-                for imp in detalle_impuestos:
-                    if imp.base == 0:
-                        imp.base = total_impuestos
-                        imp.importe = round(imp.base * imp.alicuota / 100.0, 2)
-                        total_impuestos += imp.importe
-
-
-                total_impuestos = round(sum(imp.importe for imp in detalle_impuestos), 2)
-
-                # Premio total sin recargo financiero (premio base)
-                nuevo_premio = round(base_imponible + total_impuestos, 2)
-
-                # comparar contra el objetivo efectivo
-                diferencia = nuevo_premio - effective_target_premio
-                if abs(diferencia) <= tolerancia:
-                    break
-
-                # Ajuste por bisección sobre la tasa
-                if nuevo_premio < effective_target_premio:
-                    tasa_min = tasa_actual
-                    tasa_actual = (tasa_actual + tasa_max) / 2.0
-                else:
-                    tasa_max = tasa_actual
-                    tasa_actual = (tasa_actual + tasa_min) / 2.0
-
-                iter_count += 1
-
-            # Redondeos finales
-            nuevo_recargo_adm = round(nueva_prima_tarifa * (rec_admin_pct / 100), 2)
-            
-            # Recalcular base imponible final (sin recargo financiero)
-            base_imponible = round(nueva_prima_tarifa - bonificacion + nuevo_recargo_adm + nuevo_der_emision, 2)
-            
-            # Ahora calculamos el recargo financiero como un porcentaje del nuevo_premio calculado
-            # Si hay cuotas, aplicamos aumento_pct como recargo financiero
-            if aumento_pct and aumento_pct != 0.0:
-                # Calcular recargo financiero como porcentaje del premio base
-                # (no del premio + impuestos, solo de los componentes base)
-                premio_base_componentes = nueva_prima_tarifa - bonificacion + nuevo_recargo_adm + nuevo_der_emision
-                rec_financiero = round(premio_base_componentes * (aumento_pct / 100.0), 2)
-            else:
-                rec_financiero = 0.0
-                
-            # Ahora incluimos el recargo financiero en la base imponible para impuestos
-            base_imponible_con_financiero = round(base_imponible + rec_financiero, 2)
-            
-            # Recalcular impuestos incluyendo el recargo financiero en la base
-            total_impuestos = 0.0
-            base_ori = 0
-            for imp in detalle_impuestos:
-                if imp.base == base_ori or base_ori == 0:
-                    base_ori = imp.base
-                    imp.base = base_imponible_con_financiero
-                    imp.importe = round(imp.base * imp.alicuota / 100.0, 2)
-                    total_impuestos += imp.importe
-                else:
-                    imp.base = 0.0
-                    imp.importe = 0.0
-                    
-            total_impuestos = round(total_impuestos, 2)
-            
-            # Recalcular premio incluyendo el recargo financiero y los impuestos recalculados
-            nuevo_premio = round(base_imponible + rec_financiero + total_impuestos, 2)
-            
-            # Caso especial de impuestos con base=0 
-            # (algunos impuestos se calculan sobre el total, no sobre componentes)
-            for imp in detalle_impuestos:
-                if imp.base == 0:
-                    imp.base = nuevo_premio
-                    imp.importe = round(imp.base * imp.alicuota / 100.0, 2)
-                    total_impuestos += imp.importe
-            
-            # Premio final con todos los componentes e impuestos
-            nuevo_premio = round(base_imponible + rec_financiero + total_impuestos, 2)
-
-            recAdministrativoPct = round(rec_admin_pct, 2)
-            # Aseguramos enviar el recFinancieroPct final en la respuesta
-
-            print(f"Target premio calculado: {effective_target_premio}")
-            print(f"Target premio calculado: {nuevo_premio}")
 
-            return QuoteDetails(
-                primaTarifa=round(nueva_prima_tarifa, 2),
-                bonificacion=0.0,
-                bonificacionPct=0.0,
-                primaNeta=round(nueva_prima_tarifa - 0.0, 2),
-                recAdministrativo=round(nuevo_recargo_adm, 2),
-                recAdministrativoPct=round(rec_admin_pct, 2),
-                recFinanciero=round(rec_financiero, 2),
-                recFinancieroPct=round(rec_financiero_pct, 2),
-                derEmision=round(nuevo_der_emision, 2),
-                gastosEscribania=round(gastos_escribania, 2),
-                subtotal=round(base_imponible + rec_financiero, 2),  # Subtotal incluye recargo financiero
-                impuestos=round(total_impuestos, 2),
-                premio=round(nuevo_premio, 2),
-                tasaAplicada=tasa_actual if 'tasa_actual' in locals() else tasa,
-                sumaAsegurada=sumaAseg,
-                detalleImpuestos=detalle_impuestos
-            )
+@app.get("/recotizar2/{application_id}/{premioinformado}/{dias}/{sumaTotal}/{cuotas}/{tipo}", response_model=QuoteDetails)
+async def get_quote_with_suma_and_cuotas(application_id: str, premioinformado: int, dias: int, sumaTotal: float, cuotas: int, tipo: str,
+                                        empresa: int = EMPRESA, ramo: int = RAMO):
+    rm = _ramo(empresa, ramo)
+    tipo = tipo.upper() if tipo else 'F'
+    # simplemente pasar cuotas al handler; actualmente no se usa en la lógica
+    return await _get_quote_internal(rm, application_id, premioinformado, dias, float(sumaTotal), tipo, cuotas)
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+def _fuente_desde_fila(row, impuestos_rows) -> FuenteCotizacion:
+    fila, impuestos_rows = compactar(row, impuestos_rows)
+    return FuenteCotizacion(row.version, fila, PlanImpuestos.desde_filas(impuestos_rows))
+
+
+def _fetch_cotizacion(cursor, rm: Ramo, application_id: str) -> FuenteCotizacion | None:
+    def cargar():
+        # solici + SolRieCob + SolImp en una sola consulta
+        cursor.execute(QUERY_COTIZACION + " and s.SolNro = ?", rm.empresa, rm.ramo, application_id)
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return _fuente_desde_fila(row, parsear_impuestos(row.impuestosJson))
+
+    def vigente(fuente: FuenteCotizacion) -> bool:
+        cursor.execute(QUERY_VERSION, rm.empresa, rm.ramo, application_id)
+        row = cursor.fetchone()
+        return row is not None and row.version == fuente.version
+
+    return cache_solicitudes.obtener((rm.empresa, rm.ramo, application_id), cargar, vigente)
+
+
+def _clave_resultado(rm: Ramo, application_id: str, fuente: FuenteCotizacion, premioinformado: int, dias: int,
+                     sumaTotal: float | None, tipo: str, cuotas: int | None) -> str:
+    # Ramo + parámetros normalizados + versión de la solicitud, de la tabla de
+    # derechos y de la tarifa: al recargar la tarifa las entradas anteriores
+    # dejan de coincidir y se desalojan solas
+    suma = None if sumaTotal is None else float(sumaTotal)
+    return "|".join(repr(v) for v in (
+        rm.empresa, rm.ramo, application_id, fuente.version, rm.tabla.version, rm.tarifa.version,
+        int(premioinformado), int(dias), suma, (tipo or 'F').upper(), cuotas,
+    ))
+
+
+def _cotizar_y_guardar(rm: Ramo, application_id: str, fuente: FuenteCotizacion, premioinformado: int, dias: int,
+                       sumaTotal: float | None, tipo: str, cuotas: int | None) -> str:
+    """JSON de la cotización: el de ``resultados_cache`` si ya está, si no se calcula y se guarda.
+
+    Corre en el threadpool: la lectura de SQLite tampoco bloquea el event loop.
+    """
+    clave = None
+    if resultados_cache is not None:
+        clave = _clave_resultado(rm, application_id, fuente, premioinformado, dias, sumaTotal, tipo, cuotas)
+        guardado = resultados_cache.get(clave)
+        if guardado is not None:
+            # Ya serializado: se devuelve tal cual, sin validar ni recalcular
+            return guardado
+    quote = calcular_cotizacion(fuente.fila, fuente.plan, premioinformado, dias,
+                                sumaTotal, tipo, cuotas, rm.tabla, rm.tarifa)
+    # Se serializa una sola vez: el mismo JSON va a la respuesta y al cache
+    with metricas.medir("etapa_segundos", etapa="serialize"):
+        contenido = quote.model_dump_json()
+    if clave is not None:
+        resultados_cache.put(clave, contenido)
+    return contenido
+
+
+async def _fuente(rm: Ramo, application_id: str) -> FuenteCotizacion | None:
+    # Lecturas simultáneas del mismo SolNro comparten una sola ida a la base
+    return await vuelos.do(("fuente", rm.empresa, rm.ramo, application_id), db.run, _fetch_cotizacion, rm,
+                           application_id)
+
+
+async def _get_quote_internal(rm: Ramo, application_id: str, premioinformado: int, dias: int, sumaTotal: float | None, tipo: str, cuotas: int | None = None):
+    # Cotizaciones idénticas simultáneas comparten lectura y cálculo
+    clave = ("recotizar2", rm.empresa, rm.ramo, rm.tarifa.version, application_id, premioinformado, dias,
+             sumaTotal, tipo, cuotas)
+    return await vuelos.do(clave, _cotizar, rm, application_id, premioinformado, dias, sumaTotal, tipo, cuotas)
+
+
+async def _cotizar(rm: Ramo, application_id: str, premioinformado: int, dias: int, sumaTotal: float | None, tipo: str, cuotas: int | None = None):
+    log.info("recotizar2", extra={"muestrear": True, "campos": {
+        "empresa": rm.empresa, "ramo": rm.ramo,
+        "application_id": application_id, "premioinformado": premioinformado, "dias": dias,
+        "sumaTotal": sumaTotal, "tipo": tipo, "cuotas": cuotas,
+    }})
+    with _errores_http():
+        fuente = await _fuente(rm, application_id)
+        if not fuente:
+            raise HTTPException(status_code=404, detail="Quote not found")
+
+        # Cache de resultados y cálculo en el threadpool de AnyIO, no en los hilos de la base
+        contenido = await run_in_threadpool(_cotizar_y_guardar, rm, application_id, fuente, premioinformado, dias,
+                                            sumaTotal, tipo, cuotas)
+        return Response(content=contenido, media_type="application/json")
+
+
+def _fetch_pantalla(cursor, rm: Ramo, application_id: str):
+    cursor.execute(QUERY_PANTALLA, rm.empresa, rm.ramo, application_id)
+    row = cursor.fetchone()
+    if not row:
+        return None
+    # La misma fila deja al día los caches de la solicitud y del tomador
+    fuente = _fuente_desde_fila(row, parsear_impuestos(row.impuestosJson))
+    cache_solicitudes.guardar((rm.empresa, rm.ramo, application_id), fuente)
+    perfil = tomador.perfil_desde_fila(row, "holderId")
+    cache_tomadores.guardar((rm.empresa, rm.ramo, application_id), perfil)
+    return row, fuente, perfil
+
+
+@app.get("/pantalla/{application_id}/{sumaAseg}/{meses}", response_model=PantallaSolicitud)
+async def get_pantalla(application_id: str, sumaAseg: int, meses: int, premioinformado: int = 0,
+                       dias: int | None = None, sumaTotal: float | None = None, cuotas: int | None = None,
+                       tipo: str = 'F', empresa: int = EMPRESA, ramo: int = RAMO):
+    # Tomador, cotización guardada, impuestos y (opcional) recotización con una
+    # sola consulta en lugar de /policyholder + /quote + /impDetail + /recotizar2
+    rm = _ramo(empresa, ramo)
+    tipo = tipo.upper() if tipo else 'F'
+    with _errores_http():
+        leido = await vuelos.do(("pantalla", rm.empresa, rm.ramo, application_id), db.run, _fetch_pantalla, rm,
+                                application_id)
+        if not leido:
+            raise HTTPException(status_code=404, detail="Quote not found")
+        row, fuente, perfil = leido
+
+        recotizacion = None
+        if dias is not None and sumaTotal is not None:
+            contenido = await run_in_threadpool(_cotizar_y_guardar, rm, application_id, fuente, premioinformado,
+                                                dias, sumaTotal, tipo, cuotas)
+            recotizacion = QuoteDetails.model_validate_json(contenido)
+
+        holder = _policyholder(perfil, sumaAseg, meses) if perfil.id is not None else None
+        impuestos = json.loads(row.impuestosJson) if row.impuestosJson else []
+        return PantallaSolicitud(
+            policyHolder=holder,
+            quote=QuoteDetails(
+                primaTarifa=row.primaTarifa,
+                bonificacion=row.bonificacion,
+                bonificacionPct=row.bonificacionPct,
+                primaNeta=row.primaNeta,
+                recAdministrativo=row.recAdministrativo,
+                recAdministrativoPct=row.recAdministrativoPct,
+                recFinanciero=row.recFinanciero,
+                recFinancieroPct=row.recFinancieroPctSolicitud,
+                derEmision=row.derEmision,
+                gastosEscribania=row.gastosEscribania,
+                subtotal=row.subtotalSolicitud,
+                impuestos=row.impuestos,
+                premio=row.premio,
+                tasaAplicada=row.tasaAplicada,
+                sumaAsegurada=row.sumaAsegurada
+            ),
+            impuestos=[
+                impDetail(impCod=i.get("ImpCod"), sol2Base=i.get("Sol2Base"), sol2Ali=i.get("Sol2Ali"),
+                          sol2Imp=i.get("Sol2Imp"))
+                for i in impuestos
+            ],
+            recotizacion=recotizacion,
+        )
+
+
+@app.get("/planes/{application_id}/{premioinformado}/{dias}/{sumaTotal}/{tipo}", response_model=List[PlanCuotas])
+async def get_planes_cuotas(application_id: str, premioinformado: int, dias: int, sumaTotal: float, tipo: str,
+                            empresa: int = EMPRESA, ramo: int = RAMO):
+    # Todos los planes de cuotas de una vez: el premio base se resuelve una sola
+    # vez y cada plan sólo agrega su recargo financiero
+    rm = _ramo(empresa, ramo)
+    tipo = tipo.upper() if tipo else 'F'
+    with _errores_http():
+        fuente = await _fuente(rm, application_id)
+        if not fuente:
+            raise HTTPException(status_code=404, detail="Quote not found")
+
+        planes = await run_in_threadpool(calcular_planes, fuente.fila, fuente.plan, premioinformado, dias,
+                                         float(sumaTotal), tipo, rm.tabla, tarifa=rm.tarifa)
+        return [PlanCuotas(cuotas=cuotas, quote=quote) for cuotas, quote in planes]
+
+
+@app.get("/comparar/{application_id}/{premioinformado}/{dias}/{sumaTotal}", response_model=ComparacionTipos)
+async def get_comparacion_tipos(application_id: str, premioinformado: int, dias: int, sumaTotal: float,
+                                empresa: int = EMPRESA, ramo: int = RAMO):
+    # Tipos F/C/U por planes de cuotas con una sola lectura de la solicitud
+    rm = _ramo(empresa, ramo)
+    with _errores_http():
+        fuente = await _fuente(rm, application_id)
+        if not fuente:
+            raise HTTPException(status_code=404, detail="Quote not found")
+
+        return await run_in_threadpool(calcular_comparacion, fuente.fila, fuente.plan, premioinformado, dias,
+                                       float(sumaTotal), rm.tabla, tarifa=rm.tarifa)
+
+
+# Tamaño máximo de la grilla de /grilla (días x sumas)
+GRILLA_MAX_CELDAS = int(os.getenv("GRILLA_MAX_CELDAS", "250000"))
+
+@app.get("/grilla/{application_id}")
+async def get_grilla(application_id: str, dias_desde: int, dias_hasta: int, suma_desde: float, suma_hasta: float,
+                     suma_paso: float, dias_paso: int = 30, tipo: str = 'F', cuotas: int = 1, premioinformado: int = 0,
+                     empresa: int = EMPRESA, ramo: int = RAMO):
+    # Superficie de premios días x suma total en NDJSON: una primera línea con
+    # las sumas y luego una línea por valor de días, a medida que se calculan
+    try:
+        dias = rango(dias_desde, dias_hasta, dias_paso)
+        sumas = rango(suma_desde, suma_hasta, suma_paso)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(dias) * len(sumas) > GRILLA_MAX_CELDAS:
+        raise HTTPException(status_code=400, detail=f"La grilla supera {GRILLA_MAX_CELDAS} celdas")
+    tipo = tipo.upper() if tipo else 'F'
+    rm = _ramo(empresa, ramo)
+
+    with _errores_http():
+        fuente = await _fuente(rm, application_id)
+    if not fuente:
+        raise HTTPException(status_code=404, detail="Quote not found")
+
+    def lineas():
+        yield json.dumps({"tipo": tipo, "cuotas": cuotas, "sumas": sumas.tolist()}) + "\n"
+        for fila in filas_grilla(fuente.fila, fuente.plan, premioinformado, dias, sumas, tipo, cuotas,
+                                 rm.tabla, rm.tarifa):
+            yield json.dumps(fila) + "\n"
+
+    # Generador síncrono: Starlette lo recorre en el threadpool
+    return StreamingResponse(lineas(), media_type="application/x-ndjson")
+
+
+# Máximo de SolNro por consulta IN (SQL Server admite hasta 2100 parámetros)
+BATCH_CHUNK = 1000
+
+def _fetch_cotizaciones(cursor, rm: Ramo, ids: list[str]):
+    """Filas solici/SolRieCob y SolImp de varias solicitudes del ramo, agrupadas por
+    SolNro normalizado (``clave_solicitud``); los ids que no son números se omiten."""
+    filas = {}
+    impuestos = {}
+    ids = list(dict.fromkeys(filter(None, map(clave_solicitud, ids))))
+    for i in range(0, len(ids), BATCH_CHUNK):
+        chunk = ids[i:i + BATCH_CHUNK]
+        marcas = ", ".join("?" * len(chunk))
+        cursor.execute(QUERY_COTIZACION + f" and s.SolNro in ({marcas})", rm.empresa, rm.ramo, *chunk)
+        for row in cursor.fetchall():
+            # Igual que fetchone: si hay varias coberturas nos quedamos con la primera
+            sol = clave_solicitud(row.SolNro)
+            if sol not in filas:
+                filas[sol] = row
+                impuestos[sol] = parsear_impuestos(row.impuestosJson)
+    return filas, impuestos
+
+
+# Últimos SolNro del ramo, para precalentar cache_solicitudes
+QUERY_RECIENTES = """
+    select top (?) s.SolNro
+    from solici s
+    where s.EmpCod = ? and s.RamCod = ?
+    order by s.SolNro desc"""
+
+
+def _precalentar_ramo(cursor, rm: Ramo, cantidad: int) -> int:
+    cursor.execute(QUERY_RECIENTES, cantidad, rm.empresa, rm.ramo)
+    ids = [str(row.SolNro) for row in cursor.fetchall()]
+    filas, impuestos = _fetch_cotizaciones(cursor, rm, ids)
+    for sol, row in filas.items():
+        cache_solicitudes.guardar((rm.empresa, rm.ramo, sol), _fuente_desde_fila(row, impuestos[sol]))
+    return len(filas)
+
+
+async def _precalentar():
+    # De a un ramo por vez y en segundo plano: el servidor atiende mientras tanto,
+    # y un ramo que falla no impide precalentar los demás
+    for rm in ramos_activos.values():
+        try:
+            cargadas = await db.run(_precalentar_ramo, rm, PRECALENTAR_SOLICITUDES)
+            log.info("Cache de solicitudes precalentado", extra={"campos": {
+                "empresa": rm.empresa, "ramo": rm.ramo, "solicitudes": cargadas}})
+        except Exception as e:
+            log.warning("No se pudo precalentar el cache de solicitudes", extra={"campos": {
+                "empresa": rm.empresa, "ramo": rm.ramo, "error": str(e)}})
+
+
+def _recargar_tarifas():
+    global ramos_activos
+    configs = ramos.leer_config(RAMOS_CONFIG)
+    nuevos, ignorados = ramos.actualizar_tarifas(ramos_activos, RAMOS, configs)
+    if ignorados:
+        log.warning("Cambios de RAMOS_CONFIG que requieren reiniciar", extra={"campos": {"cambios": ignorados}})
+    cambiados = [clave for clave, rm in nuevos.items() if rm.tarifa != ramos_activos[clave].tarifa]
+    # Se reemplaza el diccionario entero: cada request ya tomó su Ramo y termina
+    # con la tarifa con la que empezó; los siguientes ven la nueva
+    ramos_activos = nuevos
+    for empresa, ramo in cambiados:
+        log.info("Tarifa recargada", extra={"campos": {
+            "empresa": empresa, "ramo": ramo, "version": nuevos[(empresa, ramo)].tarifa.version}})
+
+
+async def _vigilar_tarifas():
+    global marca_ramos
+    while True:
+        await asyncio.sleep(TARIFAS_REVISAR)
+        marca = ramos.marca(RAMOS_CONFIG)
+        if marca is None or marca == marca_ramos:
+            continue
+        marca_ramos = marca
+        try:
+            _recargar_tarifas()
+        except Exception as e:
+            # Un archivo a medio escribir o inválido no toca las tarifas vigentes
+            log.warning("No se pudo recargar RAMOS_CONFIG", extra={"campos": {"error": str(e)}})
+
+
+@app.post("/recotizar/batch", response_model=List[BatchQuoteResult])
+async def recotizar_batch(items: List[BatchQuoteItem], empresa: int = EMPRESA, ramo: int = RAMO):
+    # Las filas de todas las solicitudes se traen en pocas consultas IN y
+    # los ítems se cotizan en memoria (en paralelo si RECOTIZACION_WORKERS > 1);
+    # los errores se informan por ítem
+    rm = _ramo(empresa, ramo)
+    ids = [item.application_id for item in items]
+    with _errores_http():
+        filas, impuestos = await db.run(_fetch_cotizaciones, rm, ids)
+
+    trabajos = []
+    for item in items:
+        app_id = clave_solicitud(item.application_id)
+        row = filas.get(app_id)
+        fila, imps = compactar(row, impuestos.get(app_id, [])) if row is not None else (None, [])
+        trabajos.append(Trabajo(item.premioinformado, item.dias, item.sumaTotal, item.cuotas, item.tipo, fila, imps))
+
+    resultados = await run_in_threadpool(rm.recotizador.recotizar, trabajos, rm.tarifa)
+    return [
+        BatchQuoteResult(application_id=item.application_id, quote=r.quote, error=r.error)
+        for item, r in zip(items, resultados)
+    ]
+
+
+class _RespuestaDuplex(StreamingResponse):
+    """StreamingResponse que no escucha la desconexión mientras responde: el
+    generador sigue leyendo el cuerpo del pedido, y otro receive() en paralelo
+    se llevaría partes del cuerpo. Un cliente que corta antes de terminar de
+    enviar se detecta al leer (ClientDisconnect)."""
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def _partes_pedido(request: Request) -> Iterator[bytes]:
+    # Corre en un hilo del threadpool: cada parte del cuerpo se pide al event loop
+    partes = request.stream()
+    while True:
+        try:
+            yield anyio.from_thread.run(partes.__anext__)
+        except StopAsyncIteration:
+            return
+
+
+@app.post("/recotizar/archivo")
+async def recotizar_archivo(request: Request, formato: str | None = None, empresa: int = EMPRESA, ramo: int = RAMO):
+    # Archivo CSV o NDJSON de solicitudes en el cuerpo (p. ej. curl --data-binary @cartera.csv).
+    # El cuerpo se lee línea a línea a medida que llega y se cotiza por bloques;
+    # cada bloque se envía apenas está listo, en el mismo formato
+    if formato is None:
+        formato = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    if formato not in masivo.FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato}")
+    rm = _ramo(empresa, ramo)
+
+    texto = masivo.lineas_texto(_partes_pedido(request))
+    pendientes = masivo.bloques(masivo.leer_items(texto, formato), BATCH_CHUNK)
+
+    async def lineas():
+        if encabezado := masivo.encabezado(formato):
+            yield encabezado
+        while True:
+            try:
+                bloque = await run_in_threadpool(next, pendientes, None)
+            except ClientDisconnect:
+                # El cliente cortó antes de terminar de enviar el archivo
+                return
+            if bloque is None:
+                break
+            try:
+                filas, impuestos = await db.run(_fetch_cotizaciones, rm, masivo.ids_bloque(bloque))
+            except Exception as e:
+                # La respuesta ya empezó: el error se informa en cada ítem del bloque
+                yield masivo.lineas_resultado(bloque, [Resultado(None, str(e))] * len(bloque), formato)
+                continue
+            trabajos = masivo.trabajos_bloque(bloque, filas, impuestos)
+            resultados = await run_in_threadpool(rm.recotizador.recotizar, trabajos, rm.tarifa)
+            yield masivo.lineas_resultado(bloque, resultados, formato)
+
+    media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return _RespuestaDuplex(lineas(), media_type=media_type)
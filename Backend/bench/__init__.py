@@ -0,0 +1,14 @@
+"""Benchmarks reproducibles de CotiCau sin el SQL Server de producción.
+
+Desde ``Backend``::
+
+    python -m bench                       # endpoints + solver, compara con baseline.json
+    python -m bench --solo micro          # sólo los microbenchmarks del solver
+    python -m bench --guardar             # registra los resultados como nueva baseline
+
+La base es un SQLite sembrado con solicitudes sintéticas (``standin.py``) que
+se atiende con las mismas consultas de la API, traducidas al vuelo; la carga
+se genera en el mismo proceso con ``httpx`` (``carga.py``). Si una latencia
+p95 o un tiempo de solver empeoran más que la tolerancia respecto de la
+baseline, o las cotizaciones por segundo caen, el comando termina con error.
+"""
@@ -0,0 +1,177 @@
+"""Uso: python -m bench [--solicitudes 2000] [--pedidos 1000] [--concurrencia 16] [--guardar]
+
+Ver ``bench/__init__.py``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(AQUI, "baseline.json")
+
+
+def pedidos_endpoints(ids: list[str], n: int, seed: int) -> dict[str, list]:
+    from bench.carga import Pedido
+
+    rnd = random.Random(seed)
+
+    def parametros():
+        return (rnd.choice(ids), rnd.choice([30, 90, 180, 365, 730]), round(rnd.uniform(1e4, 3e7), 2),
+                rnd.choice([1, 3, 6, 9, 12]), rnd.choice("FCU"))
+
+    pedidos = {nombre: [] for nombre in ("quote", "impDetail", "policyholder", "recotizar2", "planes", "comparar",
+                                         "grilla", "recotizar_batch")}
+    for _ in range(n):
+        sol, dias, suma, cuotas, tipo = parametros()
+        pedidos["quote"].append(Pedido("GET", f"/quote/{sol}/"))
+        pedidos["impDetail"].append(Pedido("GET", f"/impDetail/{sol}/"))
+        pedidos["policyholder"].append(Pedido("GET", f"/policyholder/{sol}/{int(suma)}/{rnd.choice([6, 12, 24])}"))
+        pedidos["recotizar2"].append(Pedido("GET", f"/recotizar2/{sol}/0/{dias}/{suma}/{cuotas}/{tipo}"))
+        pedidos["planes"].append(Pedido("GET", f"/planes/{sol}/0/{dias}/{suma}/{tipo}"))
+        pedidos["comparar"].append(Pedido("GET", f"/comparar/{sol}/0/{dias}/{suma}"))
+    # Pedidos pesados: menos repeticiones
+    for _ in range(max(1, n // 20)):
+        sol, _, _, cuotas, tipo = parametros()
+        pedidos["grilla"].append(Pedido(
+            "GET", f"/grilla/{sol}?dias_desde=30&dias_hasta=300&dias_paso=30"
+                   f"&suma_desde=100000&suma_hasta=1000000&suma_paso=100000&tipo={tipo}&cuotas={cuotas}"))
+        items = []
+        for _ in range(100):
+            sol, dias, suma, cuotas, tipo = parametros()
+            items.append({"application_id": sol, "premioinformado": 0, "dias": dias, "sumaTotal": suma,
+                          "cuotas": cuotas, "tipo": tipo})
+        pedidos["recotizar_batch"].append(Pedido("POST", "/recotizar/batch", items))
+    return pedidos
+
+
+async def correr_endpoints(app, pedidos: dict[str, list], concurrencia: int) -> dict[str, dict]:
+    import httpx
+
+    from bench import carga
+
+    resultados = {}
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=60) as cliente:
+            for nombre, lista in pedidos.items():
+                # Calentamiento (conexiones, caches de solicitudes) fuera de la medición
+                await carga.correr(cliente, lista[:concurrencia], concurrencia)
+                resultados[nombre] = await carga.correr(cliente, lista, concurrencia)
+    return resultados
+
+
+def comparar(actual: dict, baseline: dict, tolerancia: float) -> list[str]:
+    """Regresiones de ``actual`` respecto de ``baseline``."""
+    problemas = []
+    for nombre, r in actual.get("endpoints", {}).items():
+        if r["errores"]:
+            problemas.append(f"{nombre}: {r['errores']} respuestas con error")
+        base = baseline.get("endpoints", {}).get(nombre)
+        if base is None:
+            continue
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerancia):
+            problemas.append(f"{nombre}: p95 {r['p95_ms']:.2f} ms (baseline {base['p95_ms']:.2f} ms)")
+        if r["rps"] < base["rps"] * (1 - tolerancia):
+            problemas.append(f"{nombre}: {r['rps']:.0f} pedidos/s (baseline {base['rps']:.0f})")
+    for nombre, r in actual.get("micro", {}).items():
+        base = baseline.get("micro", {}).get(nombre)
+        if base is not None and r["us"] > base["us"] * (1 + tolerancia):
+            problemas.append(f"{nombre}: {r['us']:.2f} us/op (baseline {base['us']:.2f} us/op)")
+    return problemas
+
+
+def imprimir(resultado: dict):
+    if resultado.get("endpoints"):
+        print(f"{'endpoint':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'pedidos/s':>12}{'errores':>9}")
+        for nombre, r in resultado["endpoints"].items():
+            print(f"{nombre:<18}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+                  f"{r['rps']:>12.1f}{r['errores']:>9}")
+    if resultado.get("micro"):
+        print(f"{'solver':<22}{'us/op':>10}")
+        for nombre, r in resultado["micro"].items():
+            print(f"{nombre:<22}{r['us']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de CotiCau con una base SQLite sintética")
+    parser.add_argument("--solicitudes", type=int, default=2000, help="solicitudes sembradas en la base")
+    parser.add_argument("--impuestos", type=int, default=3, help="impuestos adicionales al IVA por solicitud")
+    parser.add_argument("--tramos", type=int, default=0, help="tramos de una tabla de derechos sintética (0 = deremi.xlsx)")
+    parser.add_argument("--pedidos", type=int, default=1000, help="pedidos por endpoint")
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--operaciones", type=int, default=2000, help="operaciones por microbenchmark")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--solo", choices=("endpoints", "micro"))
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--guardar", action="store_true", help="guardar los resultados como baseline")
+    parser.add_argument("--tolerancia", type=float, default=0.30,
+                        help="empeoramiento admitido respecto de la baseline (0.30 = 30%%)")
+    args = parser.parse_args()
+
+    # Las consultas y la tabla de derechos se resuelven relativas a Backend
+    os.chdir(os.path.dirname(AQUI))
+    sys.path.insert(0, os.getcwd())
+    # Se mide el cálculo: sin cache de resultados ni logs por request, salvo que se pidan
+    os.environ.setdefault("RESULTADOS_CACHE_SIZE", "0")
+    os.environ.setdefault("LOG_MUESTREO", "0")
+
+    from bench import micro, standin
+    from derechos import cargar_tabla
+
+    parametros = {k: getattr(args, k) for k in ("solicitudes", "impuestos", "tramos", "pedidos", "concurrencia",
+                                                "operaciones", "seed")}
+    tabla = standin.tabla_sintetica(args.tramos, args.seed) if args.tramos else cargar_tabla("deremi.xlsx")
+    resultado = {"parametros": parametros}
+
+    if args.solo != "micro":
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "coticau.sqlite")
+            ids = standin.sembrar(path, args.solicitudes, args.impuestos, args.seed)
+            standin.instalar(path)
+            import CotiCau
+
+            clave = (CotiCau.EMPRESA, CotiCau.RAMO)
+            ramo = CotiCau.ramos_activos[clave]
+            ramo.recotizador.tabla = tabla
+            CotiCau.ramos_activos[clave] = ramo._replace(tabla=tabla)
+            pedidos = pedidos_endpoints(ids, args.pedidos, args.seed)
+            resultado["endpoints"] = asyncio.run(correr_endpoints(CotiCau.app, pedidos, args.concurrencia))
+    if args.solo != "endpoints":
+        resultado["micro"] = micro.correr(tabla, args.operaciones, args.seed)
+
+    imprimir(resultado)
+
+    if args.guardar:
+        # Con --solo se conserva la otra sección de la baseline anterior
+        if args.solo and os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                anterior = json.load(f)
+            if anterior.get("parametros") == parametros:
+                resultado = {**anterior, **resultado}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+            f.write("\n")
+        print(f"Baseline guardada en {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("Sin baseline para comparar (usar --guardar)")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("parametros") != parametros:
+        raise SystemExit(f"La baseline se midió con otros parámetros: {baseline.get('parametros')}")
+    problemas = comparar(resultado, baseline, args.tolerancia)
+    if problemas:
+        print(f"\nREGRESIÓN (tolerancia {args.tolerancia:.0%}):")
+        for p in problemas:
+            print(f"  {p}")
+        raise SystemExit(1)
+    print(f"\nSin regresiones respecto de la baseline (tolerancia {args.tolerancia:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Generador de carga concurrente y medición de latencias.
+
+Cada pedido es ``(método, url, cuerpo)``; ``concurrencia`` clientes toman
+pedidos de la misma lista hasta agotarla y se registra la latencia de cada
+uno. Se informan percentiles p50/p95/p99 (en ms), pedidos por segundo y
+cantidad de respuestas con error.
+"""
+import asyncio
+import time
+from typing import Iterable, NamedTuple
+
+import httpx
+
+
+class Pedido(NamedTuple):
+    metodo: str
+    url: str
+    cuerpo: object = None
+
+
+def percentil(ordenados: list[float], p: float) -> float:
+    """Percentil ``p`` (0-100) por rango más cercano de una lista ordenada."""
+    if not ordenados:
+        return 0.0
+    k = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[k]
+
+
+def resumen(latencias: list[float], segundos: float, errores: int) -> dict:
+    ordenadas = sorted(latencias)
+    return {
+        "pedidos": len(latencias),
+        "errores": errores,
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 3),
+        "p95_ms": round(percentil(ordenadas, 95) * 1000, 3),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 3),
+        "rps": round(len(latencias) / segundos, 1) if segundos > 0 else 0.0,
+    }
+
+
+async def correr(cliente: httpx.AsyncClient, pedidos: Iterable[Pedido], concurrencia: int) -> dict:
+    pendientes = iter(pedidos)
+    latencias: list[float] = []
+    errores = 0
+
+    async def cliente_virtual():
+        nonlocal errores
+        # Un iterador compartido: cada pedido lo toma un solo cliente
+        for pedido in pendientes:
+            t0 = time.perf_counter()
+            respuesta = await cliente.request(pedido.metodo, pedido.url, json=pedido.cuerpo)
+            await respuesta.aread()
+            latencias.append(time.perf_counter() - t0)
+            if respuesta.status_code >= 400:
+                errores += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(cliente_virtual() for _ in range(concurrencia)))
+    return resumen(latencias, time.perf_counter() - t0, errores)
@@ -0,0 +1,87 @@
+"""Microbenchmarks del cálculo, sin base de datos ni HTTP.
+
+Cada caso se repite varias veces y se informa el mejor tiempo por operación
+(en microsegundos), que es el menos afectado por el ruido de la máquina.
+"""
+import random
+import time
+from typing import Callable
+
+import numpy as np
+
+import motor
+from cotizacion import AUMENTO_CUOTAS, FACTOR_TIPO, FilaCotizacion, FilaImpuesto, calcular_cotizacion
+from derechos import TablaDerechos
+from impuestos import PlanImpuestos
+from solver import resolver_tasa
+
+REPETICIONES = 5
+
+
+class Caso:
+    def __init__(self, rnd: random.Random):
+        self.fila = FilaCotizacion(
+            SolNro="1", primaTarifa=0.0, recAdministrativo=0.0, recFinanciero=0.0, derEmision=0.0,
+            gastosEscribania=rnd.choice([0.0, 150.0]), tasaAplicada=rnd.choice([0.5, 1.5, 5.0, 20.0]),
+            sumaAsegurada=1e6,
+        )
+        self.impuestos = [FilaImpuesto("IVA", 1000.0, 21.0)]
+        for _ in range(rnd.randint(0, 3)):
+            self.impuestos.append(FilaImpuesto(rnd.choice(["IIBB", "SELL", "TASA"]), rnd.choice([1000.0, 1300.0]),
+                                               rnd.choice([0.6, 1.2, 3.0, 4.5])))
+        self.plan = PlanImpuestos.desde_filas(self.impuestos)
+        self.dias = rnd.choice([30, 90, 180, 365, 730])
+        self.suma = rnd.uniform(1e4, 3e7)
+        self.tipo = rnd.choice("FCU")
+        self.cuotas = rnd.choice(list(AUMENTO_CUOTAS))
+        self.objetivo = self.suma / 100.0 * FACTOR_TIPO[self.tipo]
+
+
+def casos(n: int, seed: int = 1) -> list[Caso]:
+    rnd = random.Random(seed)
+    return [Caso(rnd) for _ in range(n)]
+
+
+def _mejor(fn: Callable[[], None], operaciones: int) -> float:
+    mejor = float("inf")
+    for _ in range(REPETICIONES):
+        t0 = time.perf_counter()
+        fn()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return round(mejor / operaciones * 1e6, 3)
+
+
+def correr(tabla: TablaDerechos, n: int = 2000, seed: int = 1) -> dict[str, dict]:
+    """Microsegundos por operación de cada etapa del cálculo."""
+    lista = casos(n, seed)
+    primas = np.random.default_rng(seed).uniform(0, tabla.primas[-1] * 1.1, n).tolist()
+
+    def derechos():
+        for p in primas:
+            tabla.derecho(p)
+
+    def resolver():
+        for c in lista:
+            resolver_tasa(c.objetivo, c.fila.tasaAplicada, c.suma, c.dias, c.plan, 15.0, tabla)
+
+    def cotizar():
+        for c in lista:
+            calcular_cotizacion(c.fila, c.impuestos, 0, c.dias, c.suma, c.tipo, c.cuotas, tabla)
+
+    alicuotas, en_base = motor.matriz_impuestos([c.plan for c in lista])
+    objetivos = np.array([c.objetivo for c in lista])
+    tasas = np.array([c.fila.tasaAplicada for c in lista])
+    sumas = np.array([c.suma for c in lista])
+    dias = np.array([c.dias for c in lista], dtype=np.float64)
+    aumento = np.array([AUMENTO_CUOTAS[c.cuotas] for c in lista])
+    gastos = np.array([c.fila.gastosEscribania for c in lista])
+
+    def vectorizado():
+        motor.cotizar(objetivos, tasas, sumas, dias, aumento, alicuotas, en_base, tabla, gastos=gastos)
+
+    return {
+        "derecho": {"us": _mejor(derechos, n)},
+        "resolver_tasa": {"us": _mejor(resolver, n)},
+        "calcular_cotizacion": {"us": _mejor(cotizar, n)},
+        "motor_cotizar": {"us": _mejor(vectorizado, n)},
+    }
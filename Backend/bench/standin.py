@@ -0,0 +1,94 @@
+"""SQLite con forma de SQL Server para correr la API sin la base de producción.
+
+``sembrar`` crea las tablas de la réplica local (``replica.py``: solici,
+SolRieCob, SolImp y las del tomador) con datos sintéticos reproducibles, e
+``instalar`` registra un módulo ``pyodbc`` que abre ese archivo con
+``replica.conectar``; las consultas de la API corren sin cambios.
+"""
+import os
+import random
+import sqlite3
+import sys
+import types
+from datetime import date, timedelta
+
+import numpy as np
+
+import replica
+from derechos import TablaDerechos
+
+PROVINCIAS = [("B", "Buenos Aires"), ("C", "CABA"), ("X", "Córdoba"), ("S", "Santa Fe"), ("M", "Mendoza")]
+IMPUESTOS = [("IIBB", 1000.0, (0.6, 1.2, 3.0)), ("SELL", 1300.0, (0.6, 1.2)), ("TASA", 1000.0, (0.5, 4.5))]
+
+# Sucursal y ramo que filtran las consultas
+EMPRESA, RAMO = 1, 9
+
+
+def tabla_sintetica(tramos: int, seed: int = 1) -> TablaDerechos:
+    """Tabla de derechos de emisión con ``tramos`` primas crecientes."""
+    rnd = np.random.default_rng(seed)
+    primas = np.concatenate([[0.0], np.cumsum(rnd.uniform(50.0, 5000.0, tramos - 1))])
+    derechos = np.round(np.cumsum(rnd.uniform(1.0, 40.0, tramos)), 2)
+    return TablaDerechos(primas, derechos)
+
+
+def sembrar(path: str, solicitudes: int, impuestos_max: int = 3, seed: int = 1) -> list[str]:
+    """Crea ``path`` con ``solicitudes`` solicitudes sintéticas y devuelve sus SolNro."""
+    if os.path.exists(path):
+        os.remove(path)
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(replica.ESQUEMA)
+    conn.executemany("insert into Provin values (?, ?)", PROVINCIAS)
+
+    solici, coberturas, impuestos, tomadores = [], [], [], []
+    desde = date(2024, 1, 1)
+    for n in range(1, solicitudes + 1):
+        suma = round(rnd.uniform(1e5, 5e7), 2)
+        tasa = rnd.choice([0.5, 1.5, 5.0, 20.0])
+        dias = rnd.choice([30, 90, 180, 365, 730])
+        prima = round(suma * tasa / 1000 * dias / 365, 2)
+        rad = round(prima * 0.15, 2)
+        rfi_pct = rnd.choice([0.0, 0.0, 2.5])
+        rfi = round((prima + rad) * rfi_pct / 100, 2)
+        dem = round(rnd.uniform(10, 400), 2)
+        gastos = rnd.choice([0.0, 150.0])
+        base = prima + rad + rfi + dem
+
+        imps = [("IVA", 1000.0, 21.0)]
+        for cod, base_cod, alicuotas in rnd.sample(IMPUESTOS, rnd.randint(0, min(impuestos_max, len(IMPUESTOS)))):
+            imps.append((cod, base_cod, rnd.choice(alicuotas)))
+        total_imp = round(sum(base * ali / 100 for _, _, ali in imps), 2)
+        for cod, base_cod, ali in imps:
+            impuestos.append((EMPRESA, RAMO, n, cod, base_cod, ali, round(base * ali / 100, 2)))
+
+        inicio = desde + timedelta(days=rnd.randrange(365))
+        solici.append((EMPRESA, RAMO, n, prima, 0.0, 0.0, 15.0, rad, rfi_pct, rfi, dem, gastos, total_imp,
+                       round(base + gastos + total_imp, 2), inicio.isoformat(),
+                       (inicio + timedelta(days=dias)).isoformat(), n))
+        coberturas.append((EMPRESA, RAMO, n, tasa, suma))
+        tomadores.append(n)
+
+    conn.executemany(f"insert into solici ({', '.join(replica.COLUMNAS['solici'])}) values ({', '.join('?' * 17)})",
+                     solici)
+    conn.executemany("insert into SolRieCob values (?, ?, ?, ?, ?)", coberturas)
+    conn.executemany("insert into SolImp values (?, ?, ?, ?, ?, ?, ?)", impuestos)
+    conn.executemany("insert into TomCau values (?, ?)", [(t, t) for t in tomadores])
+    conn.executemany("insert into Aseg values (?, ?, ?)", [(t, f"Tomador {t}", t) for t in tomadores])
+    conn.executemany("insert into Personas values (?, ?)", [(t, f"30{t:08d}9") for t in tomadores])
+    conn.executemany("insert into Personas2 values (?, ?, 0)", [(t, 1000 + t % len(PROVINCIAS)) for t in tomadores])
+    conn.executemany("insert into CodPos values (?, 0, ?)",
+                     [(1000 + i, cod) for i, (cod, _) in enumerate(PROVINCIAS)])
+    conn.commit()
+    conn.close()
+    return [str(n) for n in range(1, solicitudes + 1)]
+
+
+def instalar(path: str):
+    """Registra un ``pyodbc`` que conecta a ``path``; llamar antes de importar CotiCau."""
+    modulo = types.ModuleType("pyodbc")
+    modulo.connect = lambda *args, **kwargs: replica.conectar(path)
+    modulo.Error = sqlite3.Error
+    sys.modules["pyodbc"] = modulo
+    for variable in ("DB_SERVER", "DB_DATABASE", "DB_USERNAME", "DB_PASSWORD"):
+        os.environ.setdefault(variable, "standin")
@@ -0,0 +1,74 @@
+"""Benchmark de escalamiento de la recotización en paralelo.
+
+Uso:
+    python bench_recotizacion.py [--polizas 20000] [--workers 1,2,4,8] [--chunk 500]
+
+Genera una cartera sintética (sin base de datos) y mide cotizaciones por
+segundo con distinta cantidad de procesos; la aceleración debería ser casi
+lineal hasta la cantidad de núcleos.
+"""
+import argparse
+import os
+import random
+import time
+
+from cotizacion import FilaCotizacion, FilaImpuesto
+from derechos import cargar_tabla
+from recotizacion import Recotizador, Trabajo
+
+
+def cartera_sintetica(n: int, seed: int = 1) -> list[Trabajo]:
+    rnd = random.Random(seed)
+    trabajos = []
+    for i in range(n):
+        fila = FilaCotizacion(
+            SolNro=str(i), primaTarifa=0.0, recAdministrativo=0.0, recFinanciero=0.0, derEmision=0.0,
+            gastosEscribania=rnd.choice([0.0, 150.0]), tasaAplicada=rnd.choice([0.5, 1.5, 5.0, 20.0]),
+            sumaAsegurada=1e6,
+        )
+        impuestos = [FilaImpuesto("IVA", 1000.0, 21.0)]
+        for _ in range(rnd.randint(0, 3)):
+            impuestos.append(FilaImpuesto(rnd.choice(["IIBB", "SELL", "TASA"]), rnd.choice([1000.0, 1300.0]),
+                                          rnd.choice([0.6, 1.2, 3.0, 4.5])))
+        trabajos.append(Trabajo(
+            premioinformado=0, dias=rnd.choice([30, 90, 180, 365, 730]), sumaTotal=rnd.uniform(1e4, 3e7),
+            cuotas=rnd.choice([1, 3, 6, 9, 12]), tipo=rnd.choice("FCU"), fila=fila, impuestos=impuestos,
+        ))
+    return trabajos
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    por_defecto = ",".join(str(w) for w in sorted({1, 2, 4, 8, cpus}) if w <= cpus)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polizas", type=int, default=20000)
+    parser.add_argument("--workers", default=por_defecto)
+    parser.add_argument("--chunk", type=int, default=500)
+    args = parser.parse_args()
+
+    tabla = cargar_tabla(os.path.join(os.path.dirname(os.path.abspath(__file__)), "deremi.xlsx"))
+    trabajos = cartera_sintetica(args.polizas)
+    base = None
+    referencia = None
+    print(f"{args.polizas} pólizas, {cpus} núcleos")
+    for w in (int(x) for x in args.workers.split(",")):
+        recotizador = Recotizador(tabla, workers=w, chunk_size=args.chunk)
+        if w > 1:
+            # Levantar los procesos fuera de la medición
+            recotizador.recotizar(trabajos[:args.chunk * w + 1])
+        t0 = time.perf_counter()
+        resultados = recotizador.recotizar(trabajos)
+        dt = time.perf_counter() - t0
+        recotizador.close()
+
+        premios = [r.quote.premio if r.quote else None for r in resultados]
+        if referencia is None:
+            referencia = premios
+        elif premios != referencia:
+            raise SystemExit(f"Los resultados con {w} workers no coinciden con el de 1 worker")
+        base = base or dt
+        print(f"workers={w:>2}  {dt:7.2f}s  {args.polizas / dt:9.0f} cot/s  x{base / dt:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Cache en memoria LRU con vencimiento, de lectura directa (read-through).
+
+``obtener`` devuelve la entrada vigente si la hay y ``validar`` la acepta; si no,
+la carga con ``cargar`` y la guarda. ``validar`` sólo se consulta cuando pasaron
+``revalidar`` segundos desde la carga o la última validación: antes la entrada se
+da por buena sin ir a la base. Con ``max_size`` alcanzado se desaloja la entrada
+usada hace más tiempo.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class CacheTTL:
+    def __init__(self, max_size: int = 1000, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic,
+                 revalidar: float = 0.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.revalidar = revalidar
+        self._clock = clock
+        self._lock = threading.Lock()
+        # clave -> [momento de carga, momento de la última validación, valor],
+        # de la menos a la más usada
+        self._datos: OrderedDict[Hashable, list] = OrderedDict()
+        self._stats = {"aciertos": 0, "fallos": 0, "desalojos": 0, "expirados": 0, "invalidados": 0}
+
+    def obtener(self, clave: Hashable, cargar: Callable[[], Any], validar: Callable[[Any], bool] | None = None):
+        """Valor de ``clave``; ``cargar()`` lo trae si falta, venció o ``validar`` lo rechaza.
+
+        ``cargar`` y ``validar`` corren fuera del lock. Si ``cargar`` devuelve
+        None no se guarda nada.
+        """
+        entrada = self._vigente(clave)
+        if entrada is not None:
+            valor = entrada[2]
+            if validar is None or self._clock() - entrada[1] < self.revalidar:
+                vigente = True
+            elif vigente := validar(valor):
+                with self._lock:
+                    entrada[1] = self._clock()
+            if vigente:
+                with self._lock:
+                    self._stats["aciertos"] += 1
+                return valor
+            self.invalidar(clave)
+
+        with self._lock:
+            self._stats["fallos"] += 1
+        valor = cargar()
+        if valor is not None:
+            self.guardar(clave, valor)
+        return valor
+
+    def _vigente(self, clave: Hashable):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            if self._clock() - entrada[0] >= self.ttl:
+                del self._datos[clave]
+                self._stats["expirados"] += 1
+                return None
+            self._datos.move_to_end(clave)
+            return entrada
+
+    def guardar(self, clave: Hashable, valor: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            ahora = self._clock()
+            self._datos[clave] = [ahora, ahora, valor]
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_size:
+                self._datos.popitem(last=False)
+                self._stats["desalojos"] += 1
+
+    def invalidar(self, clave: Hashable):
+        with self._lock:
+            if self._datos.pop(clave, None) is not None:
+                self._stats["invalidados"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entradas": len(self._datos), "max": self.max_size, "ttl": self.ttl,
+                "revalidar": self.revalidar}
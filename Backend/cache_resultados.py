@@ -0,0 +1,103 @@
+"""Resultados de cotización memorizados y compartidos entre workers.
+
+Las cotizaciones se guardan como JSON en un archivo SQLite local (modo WAL),
+así todos los procesos de uvicorn de la máquina ven las mismas entradas. La
+clave incluye la versión de la solicitud y de la tabla de derechos, de modo
+que un cambio en los datos nunca devuelve un resultado viejo: las claves
+viejas dejan de pedirse y se podan.
+
+El archivo tiene a lo sumo ``max_entries`` entradas: al superarlas se borran
+las más antiguas (FIFO por inserción), y las que superan ``ttl`` segundos se
+ignoran y se podan. Un error de SQLite nunca rompe la cotización: se cuenta y
+se sigue como si fuera un fallo.
+"""
+import sqlite3
+import threading
+import time
+
+# Cada cuántas inserciones se poda el archivo
+PODAR_CADA = 100
+
+
+class CacheResultados:
+    def __init__(self, path: str, max_entries: int = 100_000, ttl: float = 3600.0, timeout: float = 1.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexiones: list[sqlite3.Connection] = []
+        # Cambia en close(): los hilos reabren su conexión si se vuelve a usar
+        self._generacion = 0
+        self._insertados = 0
+        self._stats = {"aciertos": 0, "fallos": 0, "guardados": 0, "podas": 0, "errores": 0}
+        con = self._conexion()
+        con.execute("create table if not exists resultados ("
+                    "clave text primary key, valor text not null, creado real not null)")
+
+    def _conexion(self) -> sqlite3.Connection:
+        # Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)
+        con = getattr(self._local, "con", None)
+        if con is None or getattr(self._local, "generacion", None) != self._generacion:
+            con = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            con.execute("pragma journal_mode=wal")
+            con.execute("pragma synchronous=normal")
+            self._local.con = con
+            self._local.generacion = self._generacion
+            with self._lock:
+                self._conexiones.append(con)
+        return con
+
+    def _sumar(self, clave: str):
+        with self._lock:
+            self._stats[clave] += 1
+
+    def get(self, clave: str) -> str | None:
+        try:
+            row = self._conexion().execute(
+                "select valor from resultados where clave = ? and creado > ?",
+                (clave, time.time() - self.ttl)).fetchone()
+        except sqlite3.Error:
+            self._sumar("errores")
+            return None
+        self._sumar("aciertos" if row else "fallos")
+        return row[0] if row else None
+
+    def put(self, clave: str, valor: str):
+        try:
+            con = self._conexion()
+            con.execute("insert or replace into resultados (clave, valor, creado) values (?, ?, ?)",
+                        (clave, valor, time.time()))
+            with self._lock:
+                self._stats["guardados"] += 1
+                self._insertados += 1
+                podar = self._insertados % PODAR_CADA == 0
+            if podar:
+                self._podar(con)
+        except sqlite3.Error:
+            self._sumar("errores")
+
+    def _podar(self, con: sqlite3.Connection):
+        con.execute("delete from resultados where creado <= ?", (time.time() - self.ttl,))
+        con.execute("delete from resultados where rowid in "
+                    "(select rowid from resultados order by rowid desc limit -1 offset ?)",
+                    (self.max_entries,))
+        self._sumar("podas")
+
+    def clear(self):
+        self._conexion().execute("delete from resultados")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "max": self.max_entries, "ttl": self.ttl}
+
+    def close(self):
+        with self._lock:
+            conexiones, self._conexiones = self._conexiones, []
+            self._generacion += 1
+        for con in conexiones:
+            try:
+                con.close()
+            except sqlite3.Error:
+                pass
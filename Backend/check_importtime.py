@@ -0,0 +1,53 @@
+"""Verifica el presupuesto de tiempo de importación de CotiCau.
+
+Uso:
+    python check_importtime.py [--budget-ms 800] [--module CotiCau]
+
+Importa el módulo una vez para que exista el snapshot de ``deremi.xlsx`` y
+luego mide con ``python -X importtime``. Falla si el tiempo acumulado supera el
+presupuesto o si el arranque vuelve a importar pandas, openpyxl o turtle/Tk.
+"""
+import argparse
+import subprocess
+import sys
+
+PROHIBIDOS = ("pandas", "openpyxl", "turtle", "tkinter")
+
+
+def medir(modulo: str) -> tuple[float, set[str]]:
+    # Corrida previa: reconstruye el snapshot si hace falta (ésa sí importa pandas)
+    subprocess.run([sys.executable, "-c", f"import {modulo}"], check=True)
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+                         check=True, capture_output=True, text=True)
+    total_us = 0
+    importados = set()
+    for linea in res.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        nombre = nombre.strip()
+        if not acumulado.strip().isdigit():
+            continue
+        importados.add(nombre.split(".")[0])
+        if nombre == modulo:
+            total_us = int(acumulado)
+    return total_us / 1000.0, importados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=800.0)
+    parser.add_argument("--module", default="CotiCau")
+    args = parser.parse_args()
+
+    ms, importados = medir(args.module)
+    prohibidos = sorted(set(PROHIBIDOS) & importados)
+    print(f"import {args.module}: {ms:.1f} ms (presupuesto {args.budget_ms:.0f} ms)")
+    if prohibidos:
+        print(f"Módulos que no deberían importarse al arrancar: {', '.join(prohibidos)}")
+    if ms > args.budget_ms or prohibidos:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
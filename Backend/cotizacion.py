@@ -0,0 +1,323 @@
+"""Cálculo de una cotización a partir de las filas de la base.
+
+No depende de FastAPI ni de la conexión: recibe la fila solici/SolRieCob, las
+filas de SolImp y la tabla de derechos, de modo que puede correr en el
+proceso de la API o en workers de recotización.
+"""
+import json
+import logging
+import time
+from typing import Any, List, NamedTuple
+
+from pydantic import BaseModel
+
+from derechos import TablaDerechos
+from impuestos import PlanImpuestos
+from metricas import metricas
+from solver import calcular_base_imponible, calcular_prima, resolver_tasa
+
+log = logging.getLogger("coticau.cotizacion")
+
+
+class ImpuestoDetalle(BaseModel):
+    impCod: str
+    base: float
+    alicuota: float
+    importe: float
+
+
+class QuoteDetails(BaseModel):
+    primaTarifa: float
+    bonificacion: float
+    bonificacionPct: float
+    primaNeta: float
+    recAdministrativo: float
+    recAdministrativoPct: float
+    recFinanciero: float
+    recFinancieroPct: float
+    derEmision: float
+    gastosEscribania: float
+    subtotal: float
+    impuestos: float
+    # nueva sublista de impuestos
+    detalleImpuestos: List[ImpuestoDetalle] = []
+    premio: float
+    tasaAplicada: float
+    sumaAsegurada: float
+
+
+class FilaCotizacion(NamedTuple):
+    """Columnas de solici/SolRieCob que usa el cálculo (picklable, a diferencia de pyodbc.Row)."""
+    SolNro: str
+    primaTarifa: float
+    recAdministrativo: float
+    recFinanciero: float
+    derEmision: float
+    gastosEscribania: float
+    tasaAplicada: float
+    sumaAsegurada: float
+
+
+class FilaImpuesto(NamedTuple):
+    ImpCod: str
+    Sol2Base: float
+    Sol2Ali: float
+
+
+class FuenteCotizacion(NamedTuple):
+    """Datos de una solicitud que usa la cotización, con los impuestos ya compilados."""
+    version: Any               # rowversion (o checksum) de la solicitud al leerla
+    fila: FilaCotizacion
+    plan: PlanImpuestos
+
+
+def clave_solicitud(application_id) -> str | None:
+    """SolNro normalizado como lo devuelve la base (``" 00123"`` -> ``"123"``); None si no es un número."""
+    texto = str(application_id).strip()
+    if not (texto.isascii() and texto.isdigit()):
+        return None
+    return str(int(texto))
+
+
+def parsear_impuestos(texto: str | None) -> list[FilaImpuesto]:
+    """Impuestos de la columna ``impuestosJson`` (``FOR JSON PATH``) como tuplas.
+
+    FOR JSON omite las propiedades nulas y devuelve NULL si no hay filas.
+    """
+    if not texto:
+        return []
+    return [FilaImpuesto(str(i.get("ImpCod")), i.get("Sol2Base"), i.get("Sol2Ali"))
+            for i in json.loads(texto)]
+
+
+def compactar(row, impuestos_rows) -> tuple[FilaCotizacion, list[FilaImpuesto]]:
+    """Copia las columnas necesarias de las filas de pyodbc a tuplas livianas."""
+    fila = FilaCotizacion(
+        SolNro=str(row.SolNro),
+        primaTarifa=row.primaTarifa,
+        recAdministrativo=row.recAdministrativo,
+        recFinanciero=row.recFinanciero,
+        derEmision=row.derEmision,
+        gastosEscribania=row.gastosEscribania,
+        tasaAplicada=row.tasaAplicada,
+        sumaAsegurada=row.sumaAsegurada,
+    )
+    return fila, [FilaImpuesto(str(r.ImpCod), r.Sol2Base, r.Sol2Ali) for r in impuestos_rows]
+
+
+# Premio objetivo según tipo, en % de la suma total
+FACTOR_TIPO = {'F': 4.3, 'C': 4.8, 'U': 3.0}
+
+# Incremento sobre el premio según cantidad de cuotas (aplicado como recargo financiero)
+# Valores solicitados (aplican al premio):
+# 1 cuota  -> 0%
+# 3 cuotas -> 10.07%
+# 6 cuotas -> 15.37%
+# 9 cuotas -> 20.47%
+# 12 cuotas-> 25.87%
+AUMENTO_CUOTAS = {1: 0.0, 3: 10.07, 6: 15.37, 9: 20.47, 12: 25.87}
+
+
+class Tarifa(NamedTuple):
+    """Parámetros comerciales de un ramo."""
+    factor_tipo: dict[str, float]
+    aumento_cuotas: dict[int, float]
+    # Recargo administrativo fijo, en % de la prima
+    rec_admin_pct: float = 15.0
+    # Huella del contenido (ramos.versionar): entra en la clave del cache de resultados
+    version: str = ""
+
+
+# Tarifa de caución (EmpCod 1, RamCod 9); recargo administrativo en 15% según requerimiento
+TARIFA = Tarifa(FACTOR_TIPO, AUMENTO_CUOTAS, 15.0)
+
+
+class CotizacionBase(NamedTuple):
+    """Premio base resuelto (sin recargo financiero); no depende de las cuotas."""
+    objetivo: float
+    tasa_informada: float
+    prima_tarifa: float
+    der_emision: float
+    bases: list[float]          # bases de cada impuesto en el premio base
+    suma_asegurada: float
+    gastos_escribania: float
+    rec_admin_pct: float
+    bonificacion: float
+    plan: PlanImpuestos
+    aumento_cuotas: dict[int, float] = AUMENTO_CUOTAS
+
+
+def resolver_base(row, impuestos_rows, premioinformado: int, dias: int, sumaTotal: float | None, tipo: str,
+                  tabla: TablaDerechos, tarifa: Tarifa = TARIFA) -> CotizacionBase:
+    """Resuelve la tasa que lleva el premio base al objetivo del ``tipo``."""
+    # Determinar el premio objetivo: si se envió sumaTotal y tipo, calcular según regla
+    target_premio = float(premioinformado)
+    if sumaTotal is not None:
+        t = (tipo or 'F').upper()
+        if t in tarifa.factor_tipo:
+            target_premio = (float(sumaTotal) / 100.0) * tarifa.factor_tipo[t]
+
+    # Datos base
+    sumaAseg = float(row.sumaAsegurada)
+    # sumaTotal enviada por el frontend (premio * meses) — si se envió, la usamos para logging
+    if sumaTotal is not None:
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Suma total recibida desde servicio", extra={"campos": {"sumaTotal": sumaTotal}})
+        # Usar la suma total enviada como suma asegurada para los cálculos y la respuesta
+        try:
+            sumaAseg = float(sumaTotal)
+        except Exception:
+            # si la conversión falla, mantenemos el valor de la DB
+            pass
+    # Forzar bonificación a 0 según requerimiento
+    bonificacion = 0.0
+    gastos_escribania = float(row.gastosEscribania)
+
+    # Recargo administrativo fijo de la tarifa del ramo
+    rec_admin_pct = tarifa.rec_admin_pct
+
+    # Para este modelo, el premio target es el mismo sin importar las cuotas
+    # (luego se agrega el recargo financiero como un componente adicional)
+    effective_target_premio = float(target_premio)
+    tasa_original = float(row.tasaAplicada)
+
+    # Plan de impuestos: se compila una vez por solicitud (o llega ya compilado)
+    if isinstance(impuestos_rows, PlanImpuestos):
+        plan = impuestos_rows
+    else:
+        plan = PlanImpuestos.desde_filas(impuestos_rows)
+
+    # Resolver la tasa (bisección original, evaluando el premio exacto sólo cerca del objetivo)
+    t0 = time.perf_counter()
+    solucion = resolver_tasa(
+        effective_target_premio, tasa_original, sumaAseg, dias,
+        plan, rec_admin_pct, tabla, bonificacion,
+    )
+    metricas.observar("etapa_segundos", time.perf_counter() - t0, etapa="solve")
+
+    # Estado final con la tasa encontrada
+    nueva_prima_tarifa = calcular_prima(solucion.tasa, sumaAseg, dias)
+    nuevo_der_emision = tabla.derecho(nueva_prima_tarifa)
+    _, bases, _ = plan.evaluar(calcular_base_imponible(nueva_prima_tarifa, nuevo_der_emision, rec_admin_pct, bonificacion))
+
+    return CotizacionBase(
+        objetivo=effective_target_premio,
+        tasa_informada=solucion.tasa_informada,
+        prima_tarifa=nueva_prima_tarifa,
+        der_emision=nuevo_der_emision,
+        bases=bases,
+        suma_asegurada=sumaAseg,
+        gastos_escribania=gastos_escribania,
+        rec_admin_pct=rec_admin_pct,
+        bonificacion=bonificacion,
+        plan=plan,
+        aumento_cuotas=tarifa.aumento_cuotas,
+    )
+
+
+def aplicar_cuotas(base: CotizacionBase, cuotas: int | None) -> QuoteDetails:
+    """Cotización final de ``base`` con el recargo financiero del plan de ``cuotas``."""
+    aumento_pct = 0.0
+    if cuotas is not None:
+        try:
+            aumento_pct = base.aumento_cuotas.get(int(cuotas), 0.0)
+        except Exception:
+            aumento_pct = 0.0
+    # El recargo financiero porcentual será igual al aumento por cuotas
+    rec_financiero_pct = float(aumento_pct)
+
+    nueva_prima_tarifa = base.prima_tarifa
+    nuevo_der_emision = base.der_emision
+    bonificacion = base.bonificacion
+    rec_admin_pct = base.rec_admin_pct
+
+    # Redondeos finales
+    nuevo_recargo_adm = round(nueva_prima_tarifa * (rec_admin_pct / 100), 2)
+    
+    # Recalcular base imponible final (sin recargo financiero)
+    base_imponible = round(nueva_prima_tarifa - bonificacion + nuevo_recargo_adm + nuevo_der_emision, 2)
+    
+    # Ahora calculamos el recargo financiero como un porcentaje del nuevo_premio calculado
+    # Si hay cuotas, aplicamos aumento_pct como recargo financiero
+    if aumento_pct and aumento_pct != 0.0:
+        # Calcular recargo financiero como porcentaje del premio base
+        # (no del premio + impuestos, solo de los componentes base)
+        premio_base_componentes = nueva_prima_tarifa - bonificacion + nuevo_recargo_adm + nuevo_der_emision
+        rec_financiero = round(premio_base_componentes * (aumento_pct / 100.0), 2)
+    else:
+        rec_financiero = 0.0
+        
+    # Ahora incluimos el recargo financiero en la base imponible para impuestos
+    base_imponible_con_financiero = round(base_imponible + rec_financiero, 2)
+    
+    # Recalcular impuestos incluyendo el recargo financiero en la base (y los
+    # de cascada sobre el premio resultante)
+    plan = base.plan
+    total_impuestos, nuevo_premio, bases, importes = plan.aplicar_financiero(
+        base.bases, base_imponible_con_financiero, base_imponible, rec_financiero)
+    detalle_impuestos = [
+        ImpuestoDetalle(impCod=cod, base=b, alicuota=ali, importe=imp)
+        for cod, ali, b, imp in zip(plan.codigos, plan.alicuotas, bases, importes)
+    ]
+
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Target premio calculado", extra={"campos": {
+            "objetivo": base.objetivo, "premio": nuevo_premio, "cuotas": cuotas, "tasa": base.tasa_informada,
+        }})
+
+    return QuoteDetails(
+        primaTarifa=round(nueva_prima_tarifa, 2),
+        bonificacion=0.0,
+        bonificacionPct=0.0,
+        primaNeta=round(nueva_prima_tarifa - 0.0, 2),
+        recAdministrativo=round(nuevo_recargo_adm, 2),
+        recAdministrativoPct=round(rec_admin_pct, 2),
+        recFinanciero=round(rec_financiero, 2),
+        recFinancieroPct=round(rec_financiero_pct, 2),
+        derEmision=round(nuevo_der_emision, 2),
+        gastosEscribania=round(base.gastos_escribania, 2),
+        subtotal=round(base_imponible + rec_financiero, 2),  # Subtotal incluye recargo financiero
+        impuestos=round(total_impuestos, 2),
+        premio=round(nuevo_premio, 2),
+        tasaAplicada=base.tasa_informada,
+        sumaAsegurada=base.suma_asegurada,
+        detalleImpuestos=detalle_impuestos
+    )
+
+
+def calcular_cotizacion(row, impuestos_rows, premioinformado: int, dias: int, sumaTotal: float | None, tipo: str,
+                        cuotas: int | None, tabla: TablaDerechos, tarifa: Tarifa = TARIFA) -> QuoteDetails:
+    """Cotización a partir de la fila solici/SolRieCob y las filas de SolImp."""
+    base = resolver_base(row, impuestos_rows, premioinformado, dias, sumaTotal, tipo, tabla, tarifa)
+    return aplicar_cuotas(base, cuotas)
+
+
+def calcular_planes(row, impuestos_rows, premioinformado: int, dias: int, sumaTotal: float | None, tipo: str,
+                    tabla: TablaDerechos, planes=None, tarifa: Tarifa = TARIFA) -> list[tuple[int, QuoteDetails]]:
+    """Cotización de cada plan de cuotas (todos los de la tarifa si ``planes`` es None)."""
+    if planes is None:
+        planes = tuple(tarifa.aumento_cuotas)
+    base = resolver_base(row, impuestos_rows, premioinformado, dias, sumaTotal, tipo, tabla, tarifa)
+    return [(cuotas, aplicar_cuotas(base, cuotas)) for cuotas in planes]
+
+
+def calcular_comparacion(row, impuestos_rows, premioinformado: int, dias: int, sumaTotal: float | None,
+                         tabla: TablaDerechos, tipos=None, planes=None, tarifa: Tarifa = TARIFA) -> dict:
+    """Matriz tipo x cuotas: un premio base por tipo y todos los planes de cada uno."""
+    if tipos is None:
+        tipos = tuple(tarifa.factor_tipo)
+    if planes is None:
+        planes = tuple(tarifa.aumento_cuotas)
+    if not isinstance(impuestos_rows, PlanImpuestos):
+        impuestos_rows = PlanImpuestos.desde_filas(impuestos_rows)
+    resultado = {"tipos": list(tipos), "cuotas": list(planes), "tasaAplicada": [], "primaTarifa": [],
+                 "derEmision": [], "subtotal": [], "impuestos": [], "recFinanciero": [], "premio": []}
+    for tipo in tipos:
+        base = resolver_base(row, impuestos_rows, premioinformado, dias, sumaTotal, tipo, tabla, tarifa)
+        quotes = [aplicar_cuotas(base, cuotas) for cuotas in planes]
+        resultado["tasaAplicada"].append(base.tasa_informada)
+        resultado["primaTarifa"].append(round(base.prima_tarifa, 2))
+        resultado["derEmision"].append(round(base.der_emision, 2))
+        for campo in ("subtotal", "impuestos", "recFinanciero", "premio"):
+            resultado[campo].append([getattr(q, campo) for q in quotes])
+    return resultado
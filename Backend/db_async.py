@@ -0,0 +1,93 @@
+"""Ejecución de consultas desde endpoints ``async``.
+
+pyodbc es bloqueante, así que las consultas corren en un pool de hilos propio
+y dimensionado para la base (separado del threadpool de AnyIO, donde corre el
+cálculo). Cada consulta tiene un timeout: si vence, o si el request se cancela,
+se cancela la sentencia en el servidor con ``cursor.cancel()`` y el hilo queda
+libre para el siguiente request.
+"""
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from metricas import metricas
+from pool import ConnectionPool
+
+
+class QueryTimeout(Exception):
+    """La consulta superó su tiempo máximo y fue cancelada."""
+
+
+class DBExecutor:
+    def __init__(self, pool: ConnectionPool, max_workers: int, timeout: float = 15.0):
+        self.pool = pool
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._stats = {"consultas": 0, "en_curso": 0, "timeouts": 0, "canceladas": 0}
+
+    def _sumar(self, clave: str, n: int = 1):
+        with self._lock:
+            self._stats[clave] += n
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: float | None = None):
+        """Ejecuta ``fn(cursor, *args)`` con una conexión del pool y devuelve su resultado."""
+        timeout = self.timeout if timeout is None else timeout
+        estado: dict[str, Any] = {"cancelado": False, "cursor": None}
+
+        def tarea():
+            t0 = time.perf_counter()
+            with self.pool.connection() as conn:
+                metricas.observar("etapa_segundos", time.perf_counter() - t0, etapa="pool")
+                # Timeout del lado del driver, por si el cancel no llega a tiempo
+                try:
+                    conn.timeout = max(1, math.ceil(timeout))
+                except AttributeError:
+                    pass
+                cursor = conn.cursor()
+                estado["cursor"] = cursor
+                if estado["cancelado"]:
+                    raise asyncio.CancelledError()
+                try:
+                    with metricas.medir("etapa_segundos", etapa="query"):
+                        return fn(cursor, *args)
+                finally:
+                    estado["cursor"] = None
+
+        self._sumar("consultas")
+        self._sumar("en_curso")
+        futuro = asyncio.get_running_loop().run_in_executor(self._executor, tarea)
+        try:
+            return await asyncio.wait_for(futuro, timeout)
+        except asyncio.TimeoutError:
+            self._sumar("timeouts")
+            self._cancelar(estado)
+            raise QueryTimeout(f"La consulta superó {timeout:g}s y fue cancelada")
+        except asyncio.CancelledError:
+            # El cliente cortó el request: no seguir ocupando la conexión
+            self._sumar("canceladas")
+            self._cancelar(estado)
+            raise
+        finally:
+            self._sumar("en_curso", -1)
+
+    @staticmethod
+    def _cancelar(estado: dict):
+        estado["cancelado"] = True
+        cursor = estado["cursor"]
+        if cursor is not None:
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "hilos": self.max_workers}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
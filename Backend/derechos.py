@@ -0,0 +1,165 @@
+"""Tabla de derechos de emisión compilada para búsquedas rápidas.
+
+La planilla ``deremi.xlsx`` se compila una sola vez en dos arreglos ordenados
+por prima; cada consulta es una búsqueda binaria sin crear objetos de pandas.
+Las columnas leídas se guardan en un snapshot ``.npz`` junto a la planilla para
+que el arranque no tenga que importar pandas ni parsear el xlsx.
+"""
+import hashlib
+import os
+from bisect import bisect_right
+
+import numpy as np
+
+
+class TablaDerechos:
+    def __init__(self, primas, derechos):
+        """``primas``/``derechos`` en el orden original de la planilla."""
+        primas = np.asarray(primas, dtype=np.float64)
+        derechos = np.asarray(derechos, dtype=np.float64)
+        if len(primas) == 0:
+            raise ValueError("La tabla de derechos está vacía")
+
+        # Por debajo del primer tramo se usa la primera fila de la planilla (iloc[0])
+        self.minimo = float(derechos[0])
+
+        # Ordenar por prima sin perder el orden original entre repetidos, y
+        # quedarse con la primera fila de cada prima (la que elige idxmax)
+        validas = ~np.isnan(primas)
+        primas, derechos = primas[validas], derechos[validas]
+        orden = np.argsort(primas, kind="stable")
+        primas, derechos = primas[orden], derechos[orden]
+        primera = np.ones(len(primas), dtype=bool)
+        primera[1:] = primas[1:] != primas[:-1]
+
+        self.primas_arr = np.ascontiguousarray(primas[primera])
+        self.derechos_arr = np.ascontiguousarray(derechos[primera])
+        # Listas de floats nativos: bisect sobre listas es más rápido que
+        # np.searchsorted para una sola prima
+        self.primas = self.primas_arr.tolist()
+        self.derechos = self.derechos_arr.tolist()
+        # Identifica el contenido de la tabla (p. ej. en claves de cache)
+        h = hashlib.sha1(self.primas_arr.tobytes())
+        h.update(self.derechos_arr.tobytes())
+        h.update(np.float64(self.minimo).tobytes())
+        self.version = h.hexdigest()[:16]
+        # Derecho no decreciente con la prima (incluido el mínimo por debajo
+        # del primer tramo): la base imponible crece con la prima y el solver
+        # puede despejarla por tramo (ver :meth:`prima_para_base`)
+        self.creciente = bool(self.minimo <= self.derechos_arr[0] and np.all(np.diff(self.derechos_arr) >= 0))
+        # factor -> inicio de cada tramo en ``factor * prima + derecho``
+        self._inicios = {}
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        return cls(df["PRIMA"].to_numpy(dtype=np.float64), df["DERECHO"].to_numpy(dtype=np.float64))
+
+    def __len__(self):
+        return len(self.primas)
+
+    def derecho(self, prima: float) -> float:
+        """Derecho del tramo con la mayor prima <= ``prima``."""
+        i = bisect_right(self.primas, prima) - 1
+        if i < 0 or prima != prima:
+            return self.minimo
+        return self.derechos[i]
+
+    def derechos_vector(self, primas) -> np.ndarray:
+        """Versión vectorizada de :meth:`derecho` para un arreglo de primas."""
+        primas = np.asarray(primas, dtype=np.float64)
+        idx = np.searchsorted(self.primas_arr, primas, side="right") - 1
+        fuera = (idx < 0) | np.isnan(primas)
+        out = self.derechos_arr[np.where(fuera, 0, idx)]
+        out[fuera] = self.minimo
+        return out
+
+
+    def _inicios_tramos(self, factor: float):
+        inicios = self._inicios.get(factor)
+        if inicios is None:
+            arr = factor * self.primas_arr + self.derechos_arr
+            inicios = self._inicios[factor] = (arr, arr.tolist())
+        return inicios
+
+    def prima_para_base(self, base: float, factor: float) -> float:
+        """Prima en la que ``factor * prima + derecho(prima)`` alcanza ``base``.
+
+        Sólo para tablas crecientes: por debajo de la prima devuelta el valor
+        queda bajo ``base`` y por encima, sobre ``base``. Si ``base`` cae en el
+        salto de derecho entre dos tramos, devuelve la prima del tramo siguiente.
+        """
+        i = bisect_right(self._inicios_tramos(factor)[1], base) - 1
+        if i < 0:
+            return min((base - self.minimo) / factor, self.primas[0])
+        limite = self.primas[i + 1] if i + 1 < len(self.primas) else float("inf")
+        return min((base - self.derechos[i]) / factor, limite)
+
+    def primas_para_base(self, bases, factor: float) -> np.ndarray:
+        """Versión vectorizada de :meth:`prima_para_base`."""
+        bases = np.asarray(bases, dtype=np.float64)
+        idx = np.searchsorted(self._inicios_tramos(factor)[0], bases, side="right") - 1
+        derecho = np.where(idx < 0, self.minimo, self.derechos_arr[np.maximum(idx, 0)])
+        siguiente = np.append(self.primas_arr[1:], np.inf)[np.maximum(idx, 0)]
+        limite = np.where(idx < 0, self.primas_arr[0], siguiente)
+        return np.minimum((bases - derecho) / factor, limite)
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _leer_excel(xlsx_path: str):
+    # Import diferido: pandas/openpyxl sólo hacen falta para reconstruir el snapshot
+    import pandas as pd
+
+    df = pd.read_excel(xlsx_path)
+    # Asegurarse que los nombres de columnas estén limpios
+    df.columns = df.columns.str.strip()
+    return df["PRIMA"].to_numpy(dtype=np.float64), df["DERECHO"].to_numpy(dtype=np.float64)
+
+
+def _guardar_snapshot(cache_path: str, primas, derechos, st: os.stat_result, sha: str):
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            np.savez(f, primas=primas, derechos=derechos,
+                     mtime_ns=np.int64(st.st_mtime_ns), size=np.int64(st.st_size), sha256=np.str_(sha))
+        # Reemplazo atómico: otros workers nunca leen un snapshot a medio escribir
+        os.replace(tmp, cache_path)
+    except OSError:
+        # Directorio de sólo lectura: seguimos sin snapshot
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def cargar_tabla(xlsx_path: str, cache_path: str | None = None) -> TablaDerechos:
+    """Carga la tabla desde el snapshot si sigue vigente, o la reconstruye del xlsx.
+
+    El snapshot se considera vigente si coinciden mtime y tamaño de la planilla;
+    si sólo cambió el mtime se compara el hash antes de releer el Excel.
+    """
+    cache_path = cache_path or os.path.splitext(xlsx_path)[0] + ".npz"
+    st = os.stat(xlsx_path)
+    snap = None
+    try:
+        with np.load(cache_path, allow_pickle=False) as f:
+            snap = {k: f[k] for k in ("primas", "derechos", "mtime_ns", "size", "sha256")}
+    except (OSError, KeyError, ValueError):
+        pass
+
+    sha = None
+    if snap is not None:
+        if int(snap["mtime_ns"]) == st.st_mtime_ns and int(snap["size"]) == st.st_size:
+            return TablaDerechos(snap["primas"], snap["derechos"])
+        sha = _sha256(xlsx_path)
+        if str(snap["sha256"]) == sha:
+            # Sólo cambió el mtime (checkout, copia): refrescar la marca y seguir
+            _guardar_snapshot(cache_path, snap["primas"], snap["derechos"], st, sha)
+            return TablaDerechos(snap["primas"], snap["derechos"])
+
+    primas, derechos = _leer_excel(xlsx_path)
+    _guardar_snapshot(cache_path, primas, derechos, st, sha or _sha256(xlsx_path))
+    return TablaDerechos(primas, derechos)
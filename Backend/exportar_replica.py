@@ -0,0 +1,46 @@
+"""Exporta o actualiza la réplica local de solicitudes (ver replica.py).
+
+Uso:
+    python exportar_replica.py [replica.sqlite] [--completa]
+                               [--cursor s.Sol1RowVer,c.Sol14RowVer,i.Sol2RowVer]
+
+Lee de SQL Server con la configuración de .env (DB_*), aunque la API esté
+configurada con REPLICA_PATH. Sin ``--completa`` copia sólo lo que cambió
+desde la última exportación: con ``--cursor`` (o REPLICA_CURSOR) según esas
+columnas de solici, SolRieCob y SolImp, si no comparando la versión de cada
+solicitud. Se exportan
+todos los ramos de RAMOS_CONFIG; se imprime una línea JSON por ramo.
+"""
+import argparse
+import json
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("replica", nargs="?", help="archivo SQLite (por defecto REPLICA_PATH o replica.sqlite)")
+    parser.add_argument("--completa", action="store_true", help="volver a copiar todo")
+    parser.add_argument("--cursor", help="columnas de solici, SolRieCob y SolImp que crecen con cada cambio "
+                                         "(rowversion o fecha), separadas por comas")
+    args = parser.parse_args()
+
+    # Import diferido: CotiCau lee .env (conexión y versión de las solicitudes)
+    import CotiCau
+    import replica
+
+    path = args.replica or CotiCau.REPLICA_PATH or "replica.sqlite"
+    cursor = [c.strip() for c in (args.cursor or os.getenv("REPLICA_CURSOR") or "").split(",") if c.strip()]
+    if cursor and len(cursor) != len(replica.TABLAS_CURSOR):
+        parser.error("--cursor: una columna por tabla (solici, SolRieCob, SolImp)")
+    origen = CotiCau.conectar()
+    try:
+        for config in CotiCau.RAMOS:
+            resultado = replica.exportar(origen, path, CotiCau.VERSION_ORIGEN, cursor or None, args.completa,
+                                         config.empresa, config.ramo)
+            print(json.dumps({"replica": path, "empresa": config.empresa, "ramo": config.ramo, **resultado}))
+    finally:
+        origen.close()
+
+
+if __name__ == "__main__":
+    main()
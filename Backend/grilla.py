@@ -0,0 +1,66 @@
+"""Superficie de premios de una solicitud sobre días x suma asegurada.
+
+Cada celda es la cotización de ``/recotizar2`` con esos días y esa suma total,
+calculada con el motor vectorizado (``motor.py``) en bloques de filas: los
+derechos de emisión se buscan en bloque sobre la tabla compilada y cada
+bloque se puede enviar apenas está listo.
+"""
+from typing import Iterator
+
+import numpy as np
+
+import motor
+from cotizacion import TARIFA, FilaCotizacion, Tarifa
+from derechos import TablaDerechos
+from impuestos import PlanImpuestos
+
+# Celdas por bloque de cálculo
+CELDAS_POR_BLOQUE = 10000
+
+
+def rango(desde: float, hasta: float, paso: float) -> np.ndarray:
+    """Valores de ``desde`` a ``hasta`` inclusive cada ``paso``."""
+    if paso <= 0:
+        raise ValueError("El paso debe ser positivo")
+    if hasta < desde:
+        raise ValueError("El rango está invertido")
+    n = int(np.floor((hasta - desde) / paso + 1e-9)) + 1
+    return desde + paso * np.arange(n)
+
+
+def filas_grilla(fila: FilaCotizacion, plan: PlanImpuestos, premioinformado: int, dias: np.ndarray,
+                 sumas: np.ndarray, tipo: str, cuotas: int | None, tabla: TablaDerechos,
+                 tarifa: Tarifa = TARIFA) -> Iterator[dict]:
+    """Una fila por valor de ``dias`` con premio, impuestos y tasa para cada suma."""
+    tipo = (tipo or 'F').upper()
+    sumas = np.asarray(sumas, dtype=np.float64)
+    if tipo in tarifa.factor_tipo:
+        objetivos = (sumas / 100.0) * tarifa.factor_tipo[tipo]
+    else:
+        objetivos = np.full(len(sumas), float(premioinformado))
+    aumento = tarifa.aumento_cuotas.get(int(cuotas), 0.0) if cuotas is not None else 0.0
+    alicuotas, en_base = motor.matriz_impuestos([plan])
+
+    por_bloque = max(1, CELDAS_POR_BLOQUE // max(1, len(sumas)))
+    for inicio in range(0, len(dias), por_bloque):
+        bloque = np.asarray(dias[inicio:inicio + por_bloque], dtype=np.float64)
+        n = len(bloque) * len(sumas)
+        resultado = motor.cotizar(
+            np.tile(objetivos, len(bloque)),
+            np.full(n, float(fila.tasaAplicada)),
+            np.tile(sumas, len(bloque)),
+            np.repeat(bloque, len(sumas)),
+            np.full(n, aumento),
+            np.repeat(alicuotas, n, axis=0),
+            np.repeat(en_base, n, axis=0),
+            tabla,
+            gastos=np.full(n, float(fila.gastosEscribania)),
+            rec_admin_pct=tarifa.rec_admin_pct,
+        )
+        forma = (len(bloque), len(sumas))
+        premio = resultado["premio"].reshape(forma)
+        impuestos = resultado["impuestos"].reshape(forma)
+        tasa = resultado["tasaAplicada"].reshape(forma)
+        for i, d in enumerate(bloque):
+            yield {"dias": int(d), "premio": premio[i].tolist(), "impuestos": impuestos[i].tolist(),
+                   "tasaAplicada": tasa[i].tolist()}
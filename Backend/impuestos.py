@@ -0,0 +1,129 @@
+"""Plan de impuestos precompilado de una solicitud.
+
+Las filas de SolImp se clasifican una sola vez: los impuestos que comparten la
+base original van sobre la base imponible y el resto se calcula en cascada
+sobre el total. El plan es inmutable y se evalúa con floats; los
+``ImpuestoDetalle`` de la respuesta se arman recién al final.
+"""
+from typing import NamedTuple
+
+
+class PlanImpuestos(NamedTuple):
+    codigos: tuple[str, ...]
+    alicuotas: tuple[float, ...]
+    en_base: tuple[bool, ...]
+    # Alícuotas sobre la base imponible, en orden, y su suma
+    alicuotas_base: tuple[float, ...]
+    alicuota_base: float
+    # Alícuotas en cascada sobre el total, en orden
+    alicuotas_cascada: tuple[float, ...]
+    # premio ~= base_imponible * multiplicador (sin redondeos)
+    multiplicador: float
+    # True si todos los impuestos sobre la base preceden a los de cascada:
+    # permite sumar importes sin armar la lista completa
+    ordenado: bool
+
+    @classmethod
+    def compilar(cls, codigos, alicuotas, en_base) -> "PlanImpuestos":
+        codigos = tuple(str(c) for c in codigos)
+        alicuotas = tuple(float(a) for a in alicuotas)
+        en_base = tuple(bool(b) for b in en_base)
+        alicuotas_base = tuple(a for a, b in zip(alicuotas, en_base) if b)
+        alicuotas_cascada = tuple(a for a, b in zip(alicuotas, en_base) if not b)
+        alicuota_base = sum(alicuotas_base)
+        multiplicador = 1.0 + alicuota_base / 100.0
+        cascada = 1.0
+        for a in alicuotas_cascada:
+            cascada *= 1.0 + a / 100.0
+        multiplicador *= cascada
+        primera_cascada = en_base.index(False) if False in en_base else len(en_base)
+        ordenado = all(en_base[:primera_cascada]) and not any(en_base[primera_cascada:])
+        return cls(codigos, alicuotas, en_base, alicuotas_base, alicuota_base,
+                   alicuotas_cascada, multiplicador, ordenado)
+
+    @classmethod
+    def desde_filas(cls, impuestos_rows) -> "PlanImpuestos":
+        """Clasifica filas con ``ImpCod``, ``Sol2Base`` y ``Sol2Ali``."""
+        codigos, alicuotas, en_base = [], [], []
+        base_ori = 0
+        for r in impuestos_rows:
+            codigos.append(r.ImpCod)
+            alicuotas.append(r.Sol2Ali)
+            if r.Sol2Base == base_ori or base_ori == 0:
+                base_ori = r.Sol2Base
+                en_base.append(True)
+            else:
+                en_base.append(False)
+        return cls.compilar(codigos, alicuotas, en_base)
+
+    def premio(self, base_imponible: float) -> float:
+        """Premio base (sin recargo financiero) con las reglas de redondeo vigentes."""
+        imp_base = round(base_imponible, 2)
+        if imp_base == 0 or not self.ordenado:
+            # Con base 0 los impuestos sobre la base también pasan a cascada
+            return self.evaluar(base_imponible)[0]
+        suma = 0.0
+        for a in self.alicuotas_base:
+            suma += round(imp_base * a / 100.0, 2)
+        if self.alicuotas_cascada:
+            total = round(suma, 2) + base_imponible
+            for a in self.alicuotas_cascada:
+                importe = round(total * a / 100.0, 2)
+                suma += importe
+                total += importe
+        return round(base_imponible + round(suma, 2), 2)
+
+    def evaluar(self, base_imponible: float):
+        """Como :meth:`premio`, pero devuelve ``(premio, bases, importes)`` por impuesto."""
+        imp_base = round(base_imponible, 2)
+        bases = []
+        importes = []
+        for a, b in zip(self.alicuotas, self.en_base):
+            if b:
+                bases.append(imp_base)
+                importes.append(round(imp_base * a / 100.0, 2))
+            else:
+                bases.append(0.0)
+                importes.append(0.0)
+
+        total = round(sum(importes), 2) + base_imponible
+        for i, a in enumerate(self.alicuotas):
+            if bases[i] == 0:
+                bases[i] = total
+                importes[i] = round(total * a / 100.0, 2)
+                total += importes[i]
+
+        total_impuestos = round(sum(importes), 2)
+        return round(base_imponible + total_impuestos, 2), bases, importes
+
+    def aplicar_financiero(self, bases, base_con_financiero: float, base_imponible: float, rec_financiero: float):
+        """Recalcula los impuestos con el recargo financiero en la base.
+
+        ``bases`` son las del premio base (:meth:`evaluar`). Devuelve
+        ``(total_impuestos, premio, bases, importes)``.
+        """
+        bases = list(bases)
+        importes = [0.0] * len(bases)
+        total = 0.0
+        base_ori = 0
+        for i, a in enumerate(self.alicuotas):
+            if bases[i] == base_ori or base_ori == 0:
+                base_ori = bases[i]
+                bases[i] = base_con_financiero
+                importes[i] = round(base_con_financiero * a / 100.0, 2)
+                total += importes[i]
+            else:
+                bases[i] = 0.0
+                importes[i] = 0.0
+        total = round(total, 2)
+        premio = round(base_imponible + rec_financiero + total, 2)
+
+        # Caso especial de impuestos con base=0
+        # (algunos impuestos se calculan sobre el total, no sobre componentes)
+        for i, a in enumerate(self.alicuotas):
+            if bases[i] == 0:
+                bases[i] = premio
+                importes[i] = round(premio * a / 100.0, 2)
+                total += importes[i]
+        premio = round(base_imponible + rec_financiero + total, 2)
+        return total, premio, bases, importes
@@ -0,0 +1,140 @@
+"""Recotización de archivos CSV / NDJSON de solicitudes, por bloques.
+
+El archivo se recorre línea a línea y se cotiza de a bloques (una consulta IN
+por bloque), así la memoria no depende del tamaño del archivo y cada bloque
+se puede devolver apenas está listo. Lo usan ``POST /recotizar/archivo`` y la
+línea de comandos ``recotizar_archivo.py``.
+
+Columnas (o claves NDJSON): application_id, premioinformado, dias, sumaTotal,
+cuotas y tipo (opcional, 'F' por defecto). Una línea inválida se informa como
+error en su resultado y no corta el proceso.
+"""
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+from typing import Iterable, Iterator, NamedTuple
+
+from cotizacion import QuoteDetails, clave_solicitud, compactar
+from recotizacion import Resultado, Trabajo
+
+FORMATOS = ("csv", "ndjson")
+
+# Columnas de salida en CSV: identificación, error y los importes de QuoteDetails
+COLUMNAS_CSV = ["application_id", "error"] + [c for c in QuoteDetails.model_fields if c != "detalleImpuestos"]
+
+
+class Item(NamedTuple):
+    application_id: str
+    premioinformado: int
+    dias: int
+    sumaTotal: float
+    cuotas: int
+    tipo: str
+    error: str | None = None
+
+
+def _item(datos: dict) -> Item:
+    application_id = str(datos.get("application_id") or "").strip()
+    try:
+        return Item(
+            application_id,
+            int(datos.get("premioinformado") or 0),
+            int(datos["dias"]),
+            float(datos["sumaTotal"]),
+            int(datos["cuotas"]),
+            (str(datos.get("tipo") or "F")).strip().upper(),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        return Item(application_id, 0, 0, 0.0, 0, "F", f"Línea inválida: {e!r}")
+
+
+def leer_items(lineas: Iterable[str], formato: str) -> Iterator[Item]:
+    """Ítems del archivo, de a uno; ``lineas`` puede ser un archivo abierto en modo texto."""
+    if formato == "csv":
+        for datos in csv.DictReader(lineas):
+            yield _item(datos)
+    else:
+        for linea in lineas:
+            if not linea.strip():
+                continue
+            try:
+                datos = json.loads(linea)
+            except ValueError as e:
+                yield Item("", 0, 0, 0.0, 0, "F", f"Línea inválida: {e}")
+                continue
+            if not isinstance(datos, dict):
+                yield Item("", 0, 0, 0.0, 0, "F",
+                           f"Línea inválida: se esperaba un objeto JSON, no {type(datos).__name__}")
+                continue
+            yield _item(datos)
+
+
+def lineas_texto(partes: Iterable[bytes]) -> Iterator[str]:
+    """Líneas de texto (UTF-8, con o sin BOM) de un cuerpo que llega por partes,
+    sin juntarlo entero; cada línea conserva su fin de línea, como un archivo."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    resto = ""
+    for parte in partes:
+        resto += decoder.decode(parte)
+        if "\n" not in resto:
+            continue
+        *completas, resto = resto.split("\n")
+        for linea in completas:
+            yield linea + "\n"
+    resto += decoder.decode(b"", final=True)
+    if resto:
+        yield resto
+
+
+def bloques(items: Iterable[Item], tamaño: int) -> Iterator[list[Item]]:
+    items = iter(items)
+    while bloque := list(islice(items, tamaño)):
+        yield bloque
+
+
+def ids_bloque(bloque: list[Item]) -> list[str]:
+    return list(dict.fromkeys(i.application_id for i in bloque if i.error is None and i.application_id))
+
+
+def trabajos_bloque(bloque: list[Item], filas: dict, impuestos: dict) -> list[Trabajo]:
+    """Trabajos de recotización del bloque con las filas ya leídas de la base
+    (``_fetch_cotizaciones``: por SolNro normalizado)."""
+    trabajos = []
+    for item in bloque:
+        sol = clave_solicitud(item.application_id)
+        row = filas.get(sol) if item.error is None else None
+        fila, imps = compactar(row, impuestos.get(sol, [])) if row is not None else (None, [])
+        trabajos.append(Trabajo(item.premioinformado, item.dias, item.sumaTotal, item.cuotas, item.tipo, fila, imps))
+    return trabajos
+
+
+def encabezado(formato: str) -> str:
+    if formato != "csv":
+        return ""
+    return _linea_csv(COLUMNAS_CSV)
+
+
+def _linea_csv(valores) -> str:
+    salida = io.StringIO()
+    csv.writer(salida, lineterminator="\n").writerow(valores)
+    return salida.getvalue()
+
+
+def lineas_resultado(bloque: list[Item], resultados: list[Resultado], formato: str) -> str:
+    """Resultados del bloque serializados, en el orden del archivo."""
+    partes = []
+    for item, r in zip(bloque, resultados):
+        error = item.error or r.error
+        quote = r.quote if item.error is None else None
+        if formato == "csv":
+            datos = quote.model_dump(exclude={"detalleImpuestos"}) if quote else {}
+            partes.append(_linea_csv([item.application_id, error or ""] + [datos.get(c, "") for c in COLUMNAS_CSV[2:]]))
+        else:
+            partes.append(json.dumps({
+                "application_id": item.application_id,
+                "quote": quote.model_dump() if quote else None,
+                "error": error,
+            }) + "\n")
+    return "".join(partes)
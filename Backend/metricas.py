@@ -0,0 +1,136 @@
+"""Contadores e histogramas de latencia en formato de texto de Prometheus.
+
+Cada hilo escribe en sus propios contadores (``threading.local``), así medir
+no toma locks; el lock sólo se usa la primera vez que un hilo mide algo y al
+exportar se suman los de todos los hilos. Los valores son por proceso: con
+varios workers de uvicorn cada uno expone los suyos.
+
+Uso::
+
+    from metricas import metricas
+
+    with metricas.medir("etapa_segundos", etapa="query"):
+        ...
+    metricas.sumar("solver_evaluaciones_total", 12)
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+PREFIJO = "coticau_"
+
+# Límites superiores (segundos) de los histogramas
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _clave(nombre: str, etiquetas: dict) -> tuple:
+    return (nombre, tuple(sorted(etiquetas.items())) if etiquetas else ())
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+def _etiquetas(pares, extra: str = "") -> str:
+    partes = [f'{k}="{v}"' for k, v in pares]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class Metricas:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # (contadores, histogramas) de cada hilo que midió algo
+        self._hilos: list[tuple[dict, dict]] = []
+        # Un fork (workers de recotizacion) mientras otro hilo tenía el lock lo
+        # dejaría tomado para siempre en el hijo
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reiniciar_lock)
+
+    def _reiniciar_lock(self):
+        self._lock = threading.Lock()
+
+    def _datos(self) -> tuple[dict, dict]:
+        try:
+            return self._local.datos
+        except AttributeError:
+            datos = ({}, {})
+            self._local.datos = datos
+            with self._lock:
+                self._hilos.append(datos)
+            return datos
+
+    def sumar(self, nombre: str, valor: float = 1, **etiquetas):
+        contadores = self._datos()[0]
+        clave = _clave(nombre, etiquetas)
+        contadores[clave] = contadores.get(clave, 0) + valor
+
+    def observar(self, nombre: str, segundos: float, **etiquetas):
+        histogramas = self._datos()[1]
+        clave = _clave(nombre, etiquetas)
+        h = histogramas.get(clave)
+        if h is None:
+            # cuentas por bucket (sin acumular) + [+Inf, suma]
+            h = histogramas[clave] = [0] * (len(self.buckets) + 1) + [0.0]
+        h[bisect_left(self.buckets, segundos)] += 1
+        h[-1] += segundos
+
+    @contextmanager
+    def medir(self, nombre: str, **etiquetas):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - t0, **etiquetas)
+
+    def exportar(self, medidores: dict[str, float] | None = None) -> str:
+        """Texto para ``/metrics``; ``medidores`` agrega gauges con su valor actual."""
+        contadores: dict[tuple, float] = {}
+        histogramas: dict[tuple, list] = {}
+        with self._lock:
+            hilos = list(self._hilos)
+        for c, h in hilos:
+            # list(d.items()) copia el dict sin soltar el GIL
+            for clave, valor in list(c.items()):
+                contadores[clave] = contadores.get(clave, 0) + valor
+            for clave, cuentas in list(h.items()):
+                total = histogramas.setdefault(clave, [0] * len(cuentas))
+                for i, v in enumerate(list(cuentas)):
+                    total[i] += v
+
+        lineas = []
+        tipos_vistos = set()
+
+        def tipo(nombre, t):
+            if nombre not in tipos_vistos:
+                tipos_vistos.add(nombre)
+                lineas.append(f"# TYPE {PREFIJO}{nombre} {t}")
+
+        for (nombre, pares), valor in sorted(contadores.items()):
+            tipo(nombre, "counter")
+            lineas.append(f"{PREFIJO}{nombre}{_etiquetas(pares)} {_numero(valor)}")
+        for (nombre, pares), cuentas in sorted(histogramas.items()):
+            tipo(nombre, "histogram")
+            acumulado = 0
+            for limite, n in zip(self.buckets, cuentas):
+                acumulado += n
+                le = f'le="{limite:g}"'
+                lineas.append(f"{PREFIJO}{nombre}_bucket{_etiquetas(pares, le)} {acumulado}")
+            acumulado += cuentas[len(self.buckets)]
+            le = 'le="+Inf"'
+            lineas.append(f"{PREFIJO}{nombre}_bucket{_etiquetas(pares, le)} {acumulado}")
+            lineas.append(f"{PREFIJO}{nombre}_sum{_etiquetas(pares)} {cuentas[-1]:.6f}")
+            lineas.append(f"{PREFIJO}{nombre}_count{_etiquetas(pares)} {acumulado}")
+        for nombre, valor in sorted((medidores or {}).items()):
+            tipo(nombre, "gauge")
+            lineas.append(f"{PREFIJO}{nombre} {_numero(valor)}")
+        return "\n".join(lineas) + "\n"
+
+
+# Registro del proceso
+metricas = Metricas()
@@ -0,0 +1,301 @@
+"""Motor vectorizado de cotización para carteras completas.
+
+Reproduce con NumPy, para N pólizas a la vez, el cálculo de
+:func:`cotizacion.calcular_cotizacion`: resolución de la tasa objetivo, prima
+tarifa, recargo administrativo, derecho de emisión, recargo financiero,
+impuestos y premio. Cada paso usa el mismo orden de operaciones y los mismos redondeos que
+el camino escalar, de modo que el resultado coincide al centavo.
+
+Los impuestos se pasan como matriz N x T de alícuotas (``NaN`` donde la
+solicitud tiene menos de T impuestos) y una matriz booleana ``en_base`` que
+indica cuáles van sobre la base imponible (ver :func:`matriz_impuestos`).
+"""
+from typing import Sequence
+
+import numpy as np
+
+from derechos import TablaDerechos
+from impuestos import PlanImpuestos
+from metricas import metricas
+from solver import MAX_ITER, TOLERANCIA
+
+
+def _round2(x: np.ndarray) -> np.ndarray:
+    """Equivalente vectorizado de ``round(x, 2)`` de Python."""
+    x = np.asarray(x, dtype=np.float64)
+    y = x * 100.0
+    r = np.rint(y)
+    # x * 100 redondea, pero sólo importa cuando y quedó justo en ,5: ahí el
+    # error exacto del producto (división de Veltkamp) dice de qué lado estaba
+    # x * 100 y si era un empate real (que se resuelve a par, como round())
+    piso = np.floor(y)
+    empate = (y - piso) == 0.5
+    if empate.any():
+        c = x * 134217729.0
+        alto = c - (c - x)
+        error = (alto * 100.0 - y) + (x - alto) * 100.0
+        r = np.where(empate & (error > 0), piso + 1.0, np.where(empate & (error < 0), piso, r))
+    r = r / 100.0
+    # Fuera del rango de enteros exactos se deja a Python
+    grandes = np.abs(y) >= 2.0 ** 52
+    if grandes.any():
+        idx = np.flatnonzero(grandes)
+        r.flat[idx] = [round(float(v), 2) for v in x.flat[idx]]
+    return r
+
+
+def matriz_impuestos(planes: Sequence[PlanImpuestos]):
+    """Convierte los planes de impuestos de cada póliza en matrices N x T."""
+    n = len(planes)
+    t = max((len(p.alicuotas) for p in planes), default=0)
+    alicuotas = np.full((n, t), np.nan)
+    en_base = np.zeros((n, t), dtype=bool)
+    for i, p in enumerate(planes):
+        alicuotas[i, :len(p.alicuotas)] = p.alicuotas
+        en_base[i, :len(p.en_base)] = p.en_base
+    return alicuotas, en_base
+
+
+def calcular_prima(tasa, suma, dias):
+    return (tasa * suma) / 1000 / 365 * dias
+
+
+def premio_base(prima, derecho, alicuotas, en_base, rec_admin_pct: float, bonificacion: float = 0.0):
+    """Versión vectorizada de :meth:`impuestos.PlanImpuestos.evaluar`; devuelve ``(premio, bases, importes)``."""
+    presente = ~np.isnan(alicuotas)
+    ali = np.where(presente, alicuotas, 0.0)
+    base_imponible = prima - bonificacion + prima * (rec_admin_pct / 100) + derecho
+    imp_base = _round2(base_imponible)
+
+    sobre_base = en_base & presente
+    bases = np.where(sobre_base, imp_base[:, None], 0.0)
+    importes = np.where(sobre_base, _round2(bases * ali / 100.0), 0.0)
+
+    # Sumas columna a columna, en el mismo orden que sum() sobre la lista
+    acumulado = np.zeros_like(base_imponible)
+    for j in range(ali.shape[1]):
+        acumulado = acumulado + importes[:, j]
+    total = _round2(acumulado) + base_imponible
+    for j in range(ali.shape[1]):
+        cascada = presente[:, j] & (bases[:, j] == 0)
+        if cascada.any():
+            importe = _round2(total * ali[:, j] / 100.0)
+            bases[:, j] = np.where(cascada, total, bases[:, j])
+            importes[:, j] = np.where(cascada, importe, importes[:, j])
+            total = np.where(cascada, total + importe, total)
+
+    acumulado = np.zeros_like(base_imponible)
+    for j in range(ali.shape[1]):
+        acumulado = acumulado + importes[:, j]
+    premio = _round2(base_imponible + _round2(acumulado))
+    return premio, bases, importes
+
+
+def multiplicador(alicuotas, en_base):
+    presente = ~np.isnan(alicuotas)
+    suma_base = np.zeros(alicuotas.shape[0])
+    cascada = np.ones(alicuotas.shape[0])
+    for j in range(alicuotas.shape[1]):
+        suma_base = suma_base + np.where(presente[:, j] & en_base[:, j], alicuotas[:, j], 0.0)
+        cascada = np.where(presente[:, j] & ~en_base[:, j], cascada * (1.0 + alicuotas[:, j] / 100.0), cascada)
+    return (1.0 + suma_base / 100.0) * cascada
+
+
+def biseccion(objetivos, tasas_originales, evaluar, aproximar=None, cotas=None, bandas=None):
+    """Versión vectorizada de :func:`solver.biseccion`; devuelve ``(tasa, tasa_informada)``.
+
+    ``evaluar(sel, tasa)`` devuelve el premio de las filas ``sel`` con esas tasas;
+    ``aproximar(sel, tasa)``, uno a menos de ``cotas[sel]`` del exacto.
+    ``bandas`` es el par ``(desde, hasta)`` de :func:`bandas_cerradas`.
+    """
+    n = len(objetivos)
+    tasa_min = np.zeros(n)
+    tasa_max = np.maximum(tasas_originales * 10.0, 1000.0)
+    tasa_actual = tasas_originales.astype(np.float64, copy=True)
+    tasa_evaluada = tasa_actual.copy()
+    tasa = np.full(n, np.nan)
+    tasa_informada = np.full(n, np.nan)
+    activas = np.arange(n)
+    for _ in range(MAX_ITER):
+        if not len(activas):
+            break
+        t = tasa_actual[activas]
+        tasa_evaluada[activas] = t
+        objetivo = objetivos[activas]
+        # Fuera de la banda el paso ya se conoce: el premio va a uno u otro infinito
+        nuevo_premio = np.full(len(activas), np.nan)
+        if bandas is not None:
+            nuevo_premio[t < bandas[0][activas]] = -np.inf
+            nuevo_premio[t > bandas[1][activas]] = np.inf
+        dentro = np.flatnonzero(np.isnan(nuevo_premio))
+        if len(dentro):
+            if aproximar is None:
+                nuevo_premio[dentro] = evaluar(activas[dentro], t[dentro])
+            else:
+                nuevo_premio[dentro] = aproximar(activas[dentro], t[dentro])
+                cerca = dentro[np.abs(nuevo_premio[dentro] - objetivo[dentro]) <= TOLERANCIA + cotas[activas[dentro]]]
+                if len(cerca):
+                    nuevo_premio[cerca] = evaluar(activas[cerca], t[cerca])
+        ok = np.abs(nuevo_premio - objetivo) <= TOLERANCIA
+        tasa[activas[ok]] = t[ok]
+        tasa_informada[activas[ok]] = t[ok]
+        sube = ~ok & (nuevo_premio < objetivo)
+        baja = ~ok & ~sube
+        a_sube, a_baja = activas[sube], activas[baja]
+        tasa_min[a_sube] = t[sube]
+        tasa_actual[a_sube] = (t[sube] + tasa_max[a_sube]) / 2.0
+        tasa_max[a_baja] = t[baja]
+        tasa_actual[a_baja] = (t[baja] + tasa_min[a_baja]) / 2.0
+        activas = activas[~ok]
+    # Sin converger: se evaluó la última tasa pero se informa la siguiente
+    tasa[activas] = tasa_evaluada[activas]
+    tasa_informada[activas] = tasa_actual[activas]
+    return tasa, tasa_informada
+
+
+def bandas_cerradas(objetivos, sumas, dias, m, cotas, tabla: TablaDerechos,
+                    rec_admin_pct: float = 15.0, bonificacion: float = 0.0):
+    """Versión vectorizada de :func:`solver.banda_cerrada`; ``None`` si la
+    tabla no es creciente. Las filas que no se pueden despejar quedan con la
+    banda ``(-inf, inf)``."""
+    if not tabla.creciente:
+        return None
+    k = sumas / 1000 / 365 * dias
+    factor = 1 + rec_admin_pct / 100
+    validas = (k > 0) & (m > 0) & (factor > 0)
+    k_seguro = np.where(validas, k, 1.0)
+    m_seguro = np.where(validas, m, 1.0)
+    bajo = (objetivos - (TOLERANCIA + cotas)) / m_seguro + bonificacion
+    alto = (objetivos + (TOLERANCIA + cotas)) / m_seguro + bonificacion
+    holgura = 1e-9 * (np.abs(alto) + abs(bonificacion) + 1.0)
+    with np.errstate(invalid="ignore"):
+        desde = tabla.primas_para_base(bajo - holgura, factor) / k_seguro
+        hasta = tabla.primas_para_base(alto + holgura, factor) / k_seguro
+        desde = desde - np.abs(desde) * 1e-12
+        hasta = hasta + np.abs(hasta) * 1e-12
+    return np.where(validas, desde, -np.inf), np.where(validas, hasta, np.inf)
+
+
+def resolver_tasas(objetivos, tasas_originales, sumas, dias, alicuotas, en_base,
+                   tabla: TablaDerechos, rec_admin_pct: float = 15.0, bonificacion: float = 0.0):
+    """Resuelve en simultáneo la tasa objetivo de todas las filas.
+
+    Sigue los mismos pasos que :func:`solver.resolver_tasa`: la bisección
+    original, decidida por la banda en forma cerrada y con el premio exacto
+    sólo en los pasos cercanos al objetivo.
+    Devuelve ``(tasa, tasa_informada)``.
+    """
+    objetivos = np.asarray(objetivos, dtype=np.float64)
+    tasas_originales = np.asarray(tasas_originales, dtype=np.float64)
+    sumas = np.asarray(sumas, dtype=np.float64)
+    dias = np.asarray(dias, dtype=np.float64)
+    m = multiplicador(alicuotas, en_base)
+    # solver.cota_redondeo por fila
+    cotas = 0.01 * ((~np.isnan(alicuotas)).sum(axis=1) + 3) * m
+
+    def evaluar(filas, tasa):
+        metricas.sumar("solver_evaluaciones_total", len(filas))
+        metricas.sumar("derechos_busquedas_total", len(filas))
+        prima = calcular_prima(tasa, sumas[filas], dias[filas])
+        return premio_base(prima, tabla.derechos_vector(prima), alicuotas[filas], en_base[filas],
+                           rec_admin_pct, bonificacion)[0]
+
+    def aproximar(filas, tasa):
+        metricas.sumar("derechos_busquedas_total", len(filas))
+        prima = calcular_prima(tasa, sumas[filas], dias[filas])
+        base = prima - bonificacion + prima * (rec_admin_pct / 100) + tabla.derechos_vector(prima)
+        return base * m[filas]
+
+    bandas = bandas_cerradas(objetivos, sumas, dias, m, cotas, tabla, rec_admin_pct, bonificacion)
+    metricas.sumar("solver_resoluciones_total", len(objetivos))
+    return biseccion(objetivos, tasas_originales, evaluar, aproximar, cotas, bandas)
+
+
+def cotizar(objetivos, tasas_originales, sumas, dias, aumento_pct, alicuotas, en_base,
+            tabla: TablaDerechos, gastos=None, rec_admin_pct: float = 15.0) -> dict:
+    """Desglose completo de ``QuoteDetails`` para N pólizas, como arreglos.
+
+    ``aumento_pct`` es el recargo por cuotas de cada fila (0 para una cuota).
+    Las claves del resultado son los campos de ``QuoteDetails``; además
+    ``impuestosAlicuota``, ``impuestosBase`` e ``impuestosImporte`` traen el
+    detalle N x T.
+    """
+    bonificacion = 0.0
+    objetivos = np.asarray(objetivos, dtype=np.float64)
+    sumas = np.asarray(sumas, dtype=np.float64)
+    dias = np.asarray(dias, dtype=np.float64)
+    aumento_pct = np.asarray(aumento_pct, dtype=np.float64)
+    alicuotas = np.asarray(alicuotas, dtype=np.float64).reshape(len(objetivos), -1)
+    en_base = np.asarray(en_base, dtype=bool).reshape(alicuotas.shape)
+    gastos = np.zeros(len(objetivos)) if gastos is None else np.asarray(gastos, dtype=np.float64)
+    presente = ~np.isnan(alicuotas)
+    ali = np.where(presente, alicuotas, 0.0)
+
+    tasa, tasa_informada = resolver_tasas(objetivos, tasas_originales, sumas, dias, alicuotas, en_base,
+                                          tabla, rec_admin_pct, bonificacion)
+    prima = calcular_prima(tasa, sumas, dias)
+    derecho = tabla.derechos_vector(prima)
+    _, bases, importes = premio_base(prima, derecho, alicuotas, en_base, rec_admin_pct, bonificacion)
+
+    rec_adm = _round2(prima * (rec_admin_pct / 100))
+    base_imponible = _round2(prima - bonificacion + rec_adm + derecho)
+    rec_financiero = np.where(aumento_pct != 0.0,
+                              _round2((prima - bonificacion + rec_adm + derecho) * (aumento_pct / 100.0)), 0.0)
+    base_con_financiero = _round2(base_imponible + rec_financiero)
+
+    # Impuestos sobre la base con recargo financiero (mismo recorrido que el escalar)
+    total = np.zeros(len(objetivos))
+    base_ori = np.zeros(len(objetivos))
+    for j in range(ali.shape[1]):
+        coincide = presente[:, j] & ((bases[:, j] == base_ori) | (base_ori == 0))
+        base_ori = np.where(coincide, bases[:, j], base_ori)
+        importe = _round2(base_con_financiero * ali[:, j] / 100.0)
+        bases[:, j] = np.where(coincide, base_con_financiero, np.where(presente[:, j], 0.0, np.nan))
+        importes[:, j] = np.where(coincide, importe, np.where(presente[:, j], 0.0, np.nan))
+        total = np.where(coincide, total + importe, total)
+    total = _round2(total)
+    premio = _round2(base_imponible + rec_financiero + total)
+
+    # Impuestos que van sobre el total
+    for j in range(ali.shape[1]):
+        sobre_total = presente[:, j] & (bases[:, j] == 0)
+        importe = _round2(premio * ali[:, j] / 100.0)
+        bases[:, j] = np.where(sobre_total, premio, bases[:, j])
+        importes[:, j] = np.where(sobre_total, importe, importes[:, j])
+        total = np.where(sobre_total, total + importe, total)
+    premio = _round2(base_imponible + rec_financiero + total)
+
+    n = len(objetivos)
+    return {
+        "primaTarifa": _round2(prima),
+        "bonificacion": np.zeros(n),
+        "bonificacionPct": np.zeros(n),
+        "primaNeta": _round2(prima - 0.0),
+        "recAdministrativo": _round2(rec_adm),
+        "recAdministrativoPct": np.full(n, round(rec_admin_pct, 2)),
+        "recFinanciero": _round2(rec_financiero),
+        "recFinancieroPct": _round2(aumento_pct),
+        "derEmision": _round2(derecho),
+        "gastosEscribania": _round2(gastos),
+        "subtotal": _round2(base_imponible + rec_financiero),
+        "impuestos": _round2(total),
+        "premio": _round2(premio),
+        "tasaAplicada": tasa_informada,
+        "sumaAsegurada": sumas,
+        "impuestosAlicuota": alicuotas,
+        "impuestosBase": bases,
+        "impuestosImporte": importes,
+    }
+
+
+def fila(resultado: dict, i: int, impcods: Sequence[str] = ()) -> dict:
+    """Fila ``i`` del resultado con la forma de ``QuoteDetails`` (incluido el detalle)."""
+    datos = {k: float(v[i]) for k, v in resultado.items() if v.ndim == 1}
+    alicuotas = resultado["impuestosAlicuota"][i]
+    bases, importes = resultado["impuestosBase"][i], resultado["impuestosImporte"][i]
+    datos["detalleImpuestos"] = [
+        {"impCod": impcods[j] if j < len(impcods) else str(j), "base": float(bases[j]),
+         "alicuota": float(alicuotas[j]), "importe": float(importes[j])}
+        for j in range(len(bases)) if not np.isnan(bases[j])
+    ]
+    return datos
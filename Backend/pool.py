@@ -0,0 +1,195 @@
+"""Pool de conexiones a SQL Server.
+
+Mantiene conexiones abiertas entre requests para no pagar el handshake TCP y
+el login en cada cotización. ``connect`` es cualquier callable que devuelva
+una conexión DB-API (``pyodbc.connect`` en producción, ``sqlite3.connect``
+para pruebas locales).
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable
+
+
+class PoolTimeout(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera."""
+
+
+class _Entry:
+    __slots__ = ("conn", "creada", "usada")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.creada = time.monotonic()
+        self.usada = self.creada
+
+
+class ConnectionPool:
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1, max_size: int = 10,
+                 timeout: float = 5.0, recycle: float = 1800.0, ping_after: float = 30.0,
+                 ping_query: str = "SELECT 1"):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Tamaños de pool inválidos")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        # Segundos de vida de una conexión antes de reemplazarla
+        self.recycle = recycle
+        # Se valida la conexión si estuvo ociosa más de estos segundos (0 = siempre)
+        self.ping_after = ping_after
+        self.ping_query = ping_query
+
+        self._lock = threading.Condition()
+        self._idle: deque[_Entry] = deque()
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            "creadas": 0,
+            "cerradas": 0,
+            "prestamos": 0,
+            "esperas": 0,
+            "timeouts": 0,
+            "descartadas": 0,
+        }
+
+    # ------------------------------------------------------------------
+    def warm(self):
+        """Abre conexiones hasta llegar a ``min_size``."""
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = self._crear()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._idle.append(entry)
+                self._lock.notify()
+
+    def acquire(self, timeout: float | None = None):
+        """Presta una conexión validada; espera hasta ``timeout`` si el pool está lleno."""
+        espera = self.timeout if timeout is None else timeout
+        limite = time.monotonic() + espera
+        while True:
+            entry = None
+            crear = False
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("El pool está cerrado")
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        crear = True
+                        break
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"Sin conexiones libres tras {espera:.1f}s")
+                    self._stats["esperas"] += 1
+                    self._lock.wait(restante)
+
+            if crear:
+                try:
+                    entry = self._crear()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+            elif not self._sana(entry):
+                self._descartar(entry, vencida=True)
+                continue
+
+            with self._lock:
+                self._stats["prestamos"] += 1
+            return entry
+
+    def release(self, entry: _Entry, descartar: bool = False):
+        if descartar or self._closed:
+            self._descartar(entry, vencida=descartar)
+            return
+        entry.usada = time.monotonic()
+        with self._lock:
+            self._idle.append(entry)
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout: float | None = None):
+        entry = self.acquire(timeout)
+        try:
+            yield entry.conn
+        except BaseException:
+            # Dejar la conexión limpia; si ni siquiera acepta un rollback, se descarta
+            try:
+                entry.conn.rollback()
+                rota = False
+            except Exception:
+                rota = True
+            self.release(entry, descartar=rota)
+            raise
+        else:
+            self.release(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "min": self.min_size,
+                "max": self.max_size,
+                "abiertas": self._size,
+                "libres": len(self._idle),
+                "en_uso": self._size - len(self._idle),
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._lock.notify_all()
+        for entry in idle:
+            self._descartar(entry)
+
+    # ------------------------------------------------------------------
+    def _crear(self) -> _Entry:
+        entry = _Entry(self._connect())
+        with self._lock:
+            self._stats["creadas"] += 1
+        return entry
+
+    def _sana(self, entry: _Entry) -> bool:
+        ahora = time.monotonic()
+        if self.recycle and ahora - entry.creada > self.recycle:
+            return False
+        if ahora - entry.usada < self.ping_after:
+            return True
+        try:
+            cursor = entry.conn.cursor()
+            cursor.execute(self.ping_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _descartar(self, entry: _Entry, vencida: bool = False):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._stats["cerradas"] += 1
+            if vencida:
+                self._stats["descartadas"] += 1
+            self._lock.notify()
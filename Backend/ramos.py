@@ -0,0 +1,108 @@
+"""Ramos (EmpCod, RamCod) que atiende el proceso, cada uno con su tabla de
+derechos de emisión y su tarifa.
+
+``RAMOS_CONFIG`` apunta a un JSON con una entrada por ramo; las claves de la
+tarifa que falten toman los valores de caución (``cotizacion.TARIFA``)::
+
+    [
+      {"empresa": 1, "ramo": 9, "deremi": "deremi.xlsx"},
+      {"empresa": 1, "ramo": 12, "deremi": "deremi_12.xlsx",
+       "factor_tipo": {"F": 4.0, "C": 4.5, "U": 2.8},
+       "aumento_cuotas": {"1": 0, "3": 9.5, "6": 14.0}, "rec_admin_pct": 12}
+    ]
+
+Sin archivo se atiende sólo caución (1, 9) con ``deremi.xlsx``. El primer ramo
+de la lista es el que usan los endpoints si no se indica otro.
+
+Las tarifas se pueden cambiar sin reiniciar: ``actualizar_tarifas`` arma un
+nuevo juego de ramos con las tarifas del archivo releído, que reemplaza al
+anterior de una vez. Agregar o quitar ramos o cambiar su planilla requiere
+reiniciar.
+"""
+import hashlib
+import json
+import os
+from typing import NamedTuple
+
+from cotizacion import TARIFA, Tarifa
+from derechos import TablaDerechos
+
+
+class ConfigRamo(NamedTuple):
+    empresa: int
+    ramo: int
+    deremi: str
+    tarifa: Tarifa
+
+
+class Ramo(NamedTuple):
+    """Recursos de un ramo ya cargados."""
+    empresa: int
+    ramo: int
+    tabla: TablaDerechos
+    tarifa: Tarifa
+    recotizador: object     # recotizacion.Recotizador
+
+
+def versionar(tarifa: Tarifa) -> Tarifa:
+    """``tarifa`` con ``version`` = huella de su contenido."""
+    contenido = json.dumps([sorted(tarifa.factor_tipo.items()), sorted(tarifa.aumento_cuotas.items()),
+                            tarifa.rec_admin_pct])
+    return tarifa._replace(version=hashlib.sha1(contenido.encode()).hexdigest()[:12])
+
+
+CAUCION = ConfigRamo(1, 9, "deremi.xlsx", versionar(TARIFA))
+
+
+def _tarifa(datos: dict) -> Tarifa:
+    return versionar(Tarifa(
+        factor_tipo={str(k).upper(): float(v) for k, v in datos.get("factor_tipo", TARIFA.factor_tipo).items()},
+        aumento_cuotas={int(k): float(v) for k, v in datos.get("aumento_cuotas", TARIFA.aumento_cuotas).items()},
+        rec_admin_pct=float(datos.get("rec_admin_pct", TARIFA.rec_admin_pct)),
+    ))
+
+
+def leer_config(path: str | None) -> list[ConfigRamo]:
+    if not path:
+        return [CAUCION]
+    with open(path, encoding="utf-8") as f:
+        entradas = json.load(f)
+    ramos = []
+    for datos in entradas:
+        ramos.append(ConfigRamo(int(datos["empresa"]), int(datos["ramo"]), datos.get("deremi", "deremi.xlsx"),
+                                _tarifa(datos)))
+    claves = [(r.empresa, r.ramo) for r in ramos]
+    if not ramos or len(set(claves)) != len(claves):
+        raise ValueError(f"{path}: la lista de ramos está vacía o tiene ramos repetidos")
+    return ramos
+
+
+def marca(path: str | None) -> tuple[int, int] | None:
+    """Fecha de modificación y tamaño de ``path``, para detectar cambios."""
+    try:
+        estado = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return estado.st_mtime_ns, estado.st_size
+
+
+def actualizar_tarifas(activos: dict[tuple[int, int], Ramo], iniciales: list[ConfigRamo],
+                       configs: list[ConfigRamo]) -> tuple[dict[tuple[int, int], Ramo], list[str]]:
+    """Copia de ``activos`` con las tarifas de ``configs`` y los cambios que no se aplicaron.
+
+    ``iniciales`` es la configuración con la que arrancó el proceso.
+    """
+    nuevos = dict(activos)
+    ignorados = []
+    planillas = {(c.empresa, c.ramo): c.deremi for c in iniciales}
+    for config in configs:
+        clave = (config.empresa, config.ramo)
+        if clave not in nuevos:
+            ignorados.append(f"ramo {clave[0]}/{clave[1]} nuevo")
+        elif planillas[clave] != config.deremi:
+            ignorados.append(f"ramo {clave[0]}/{clave[1]}: planilla {config.deremi}")
+        elif nuevos[clave].tarifa != config.tarifa:
+            nuevos[clave] = nuevos[clave]._replace(tarifa=config.tarifa)
+    quitados = set(nuevos) - {(c.empresa, c.ramo) for c in configs}
+    ignorados.extend(f"ramo {e}/{r} quitado" for e, r in sorted(quitados))
+    return nuevos, ignorados
@@ -0,0 +1,121 @@
+"""Recotización masiva en paralelo con un pool de procesos.
+
+El cálculo de cada cotización es CPU puro (ver ``cotizacion.py``), así que un
+solo worker de uvicorn queda limitado a un núcleo por el GIL. ``Recotizador``
+reparte bloques de solicitudes ya leídas de la base entre procesos y devuelve
+los resultados en el orden de entrada.
+
+La tabla de derechos y la tarifa llegan a cada proceso una sola vez, en el
+initializer del worker: con ``fork`` (el método por defecto donde existe) se
+heredan del proceso padre sin serializarlas y con ``spawn``/``forkserver`` se
+envían al arrancarlo. Los impuestos de cada solicitud viajan con su bloque
+como tuplas livianas (``FilaCotizacion``/``FilaImpuesto``). Si la tarifa se
+recargó después de arrancar el pool, la vigente viaja con cada bloque.
+
+El servidor tiene otros hilos al momento del fork; el worker sólo calcula, y
+los locks que toca (``logging``, ``metricas``) se reinician en el hijo.
+"""
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import NamedTuple, Sequence
+
+from cotizacion import TARIFA, FilaCotizacion, FilaImpuesto, QuoteDetails, Tarifa, calcular_cotizacion
+from derechos import TablaDerechos
+
+# Tabla de derechos y tarifa del proceso worker
+_tabla: TablaDerechos | None = None
+_tarifa: Tarifa = TARIFA
+
+
+class Trabajo(NamedTuple):
+    premioinformado: int
+    dias: int
+    sumaTotal: float
+    cuotas: int
+    tipo: str
+    fila: FilaCotizacion | None          # None si la solicitud no existe
+    impuestos: Sequence[FilaImpuesto]
+
+
+class Resultado(NamedTuple):
+    quote: QuoteDetails | None
+    error: str | None
+
+
+def _init_worker(tabla: TablaDerechos, tarifa: Tarifa = TARIFA):
+    global _tabla, _tarifa
+    _tabla = tabla
+    _tarifa = tarifa
+
+
+def cotizar_trabajos(trabajos: Sequence[Trabajo], tabla: TablaDerechos | None = None,
+                     tarifa: Tarifa | None = None) -> list[Resultado]:
+    """Cotiza un bloque en el proceso actual, con errores por ítem."""
+    if tabla is None:
+        tabla = _tabla
+    if tarifa is None:
+        tarifa = _tarifa
+    resultados = []
+    for t in trabajos:
+        if t.fila is None:
+            resultados.append(Resultado(None, "Quote not found"))
+            continue
+        try:
+            tipo = t.tipo.upper() if t.tipo else 'F'
+            quote = calcular_cotizacion(t.fila, t.impuestos, t.premioinformado, t.dias,
+                                        float(t.sumaTotal), tipo, t.cuotas, tabla, tarifa)
+            resultados.append(Resultado(quote, None))
+        except Exception as e:
+            resultados.append(Resultado(None, str(e)))
+    return resultados
+
+
+class Recotizador:
+    def __init__(self, tabla: TablaDerechos, workers: int | None = None, chunk_size: int = 500,
+                 start_method: str | None = None, tarifa: Tarifa = TARIFA):
+        self.tabla = tabla
+        self.tarifa = tarifa
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        if start_method is None:
+            start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        self.start_method = start_method
+        self._executor: ProcessPoolExecutor | None = None
+        # Dos primeros lotes simultáneos no deben crear cada uno su pool
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._crear_pool()
+            return self._executor
+
+    def _crear_pool(self) -> ProcessPoolExecutor:
+        # Con fork los argumentos del initializer se heredan sin serializar; se
+        # pasan igual (y no por variables globales del padre) porque puede
+        # haber un Recotizador por ramo, cada uno con su tabla
+        ctx = mp.get_context(self.start_method)
+        return ProcessPoolExecutor(self.workers, mp_context=ctx,
+                                   initializer=_init_worker, initargs=(self.tabla, self.tarifa))
+
+    def recotizar(self, trabajos: Sequence[Trabajo], tarifa: Tarifa | None = None) -> list[Resultado]:
+        """Resultados en el mismo orden que ``trabajos``, con ``tarifa`` o la del recotizador."""
+        if tarifa is None:
+            tarifa = self.tarifa
+        if self.workers <= 1 or len(trabajos) <= self.chunk_size:
+            return cotizar_trabajos(trabajos, self.tabla, tarifa)
+        bloques = [trabajos[i:i + self.chunk_size] for i in range(0, len(trabajos), self.chunk_size)]
+        cotizar = cotizar_trabajos if tarifa == self.tarifa else partial(cotizar_trabajos, tarifa=tarifa)
+        resultados = []
+        for parcial in self._pool().map(cotizar, bloques):
+            resultados.extend(parcial)
+        return resultados
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
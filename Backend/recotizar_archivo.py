@@ -0,0 +1,61 @@
+"""Recotiza un archivo CSV / NDJSON de solicitudes desde la línea de comandos.
+
+Uso:
+    python recotizar_archivo.py cartera.csv [--salida resultados.csv] [--formato csv|ndjson]
+                                [--empresa 1 --ramo 9]
+
+Usa la misma configuración (.env) y el mismo cálculo que ``POST /recotizar/archivo``;
+lee el archivo por bloques y escribe cada bloque apenas está cotizado. Con
+``-`` como archivo lee de la entrada estándar.
+"""
+import argparse
+import sys
+
+import masivo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("archivo", help="CSV o NDJSON de solicitudes ('-' para stdin)")
+    parser.add_argument("--salida", help="archivo de resultados (por defecto stdout)")
+    parser.add_argument("--formato", choices=masivo.FORMATOS,
+                        help="formato de entrada y salida (por defecto según la extensión)")
+    parser.add_argument("--empresa", type=int, help="EmpCod (por defecto el primer ramo de RAMOS_CONFIG)")
+    parser.add_argument("--ramo", type=int, help="RamCod (por defecto el primer ramo de RAMOS_CONFIG)")
+    args = parser.parse_args()
+
+    formato = args.formato or ("csv" if args.archivo.lower().endswith(".csv") else "ndjson")
+
+    # Import diferido: CotiCau lee .env y arma el pool de conexiones
+    import CotiCau
+
+    try:
+        clave = (args.empresa if args.empresa is not None else CotiCau.EMPRESA,
+                 args.ramo if args.ramo is not None else CotiCau.RAMO)
+        if clave not in CotiCau.ramos_activos:
+            parser.error(f"Ramo {clave[0]}/{clave[1]} no configurado")
+        rm = CotiCau.ramos_activos[clave]
+
+        entrada = sys.stdin if args.archivo == "-" else open(args.archivo, encoding="utf-8-sig", newline="")
+        salida = sys.stdout if not args.salida else open(args.salida, "w", encoding="utf-8", newline="")
+        try:
+            salida.write(masivo.encabezado(formato))
+            for bloque in masivo.bloques(masivo.leer_items(entrada, formato), CotiCau.BATCH_CHUNK):
+                with CotiCau.db_pool.connection() as conn:
+                    filas, impuestos = CotiCau._fetch_cotizaciones(conn.cursor(), rm, masivo.ids_bloque(bloque))
+                resultados = rm.recotizador.recotizar(masivo.trabajos_bloque(bloque, filas, impuestos))
+                salida.write(masivo.lineas_resultado(bloque, resultados, formato))
+                salida.flush()
+        finally:
+            if entrada is not sys.stdin:
+                entrada.close()
+            if salida is not sys.stdout:
+                salida.close()
+    finally:
+        # Procesos, hilos y conexiones de la base y el hilo del registro, aun
+        # si el ramo no existe o la recotización falla
+        CotiCau.cerrar()
+
+
+if __name__ == "__main__":
+    main()
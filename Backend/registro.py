@@ -0,0 +1,84 @@
+"""Logging estructurado sin bloquear los hilos que atienden requests.
+
+Los registros del logger ``coticau`` se encolan con un ``QueueHandler`` y un
+``QueueListener`` en su propio hilo les da formato (una línea JSON por
+evento) y los escribe. En el hilo del request sólo queda armar el registro.
+
+Los campos de cada evento van en ``extra={"campos": {...}}``. Los eventos de
+mucho volumen se marcan con ``"muestrear": True`` y sólo pasa una fracción
+(``muestreo``). Las trazas de depuración se protegen con
+``log.isEnabledFor(logging.DEBUG)`` para que no cuesten nada si están apagadas.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+RAIZ = "coticau"
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class FormatoJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        datos.update(getattr(record, "campos", None) or {})
+        if record.exc_info:
+            datos["exc"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class Muestreo(logging.Filter):
+    """Deja pasar una fracción ``tasa`` de los registros marcados con ``muestrear``."""
+
+    def __init__(self, tasa: float):
+        super().__init__()
+        self.tasa = tasa
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "muestrear", False):
+            return True
+        return self.tasa >= 1.0 or random.random() < self.tasa
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # La cola no sale del proceso: el formato queda para el hilo del listener
+        return record
+
+
+def configurar(nivel: str | int = "INFO", muestreo: float = 0.01, stream=None) -> logging.Logger:
+    """Configura el logger ``coticau`` (una sola vez por proceso) y lo devuelve."""
+    global _listener
+    log = logging.getLogger(RAIZ)
+    if _listener is not None:
+        return log
+
+    salida = logging.StreamHandler(stream or sys.stdout)
+    salida.setFormatter(FormatoJSON())
+    cola: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(cola)
+    handler.addFilter(Muestreo(muestreo))
+
+    log.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+    log.addHandler(handler)
+    log.propagate = False
+    _listener = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+    return log
+
+
+def detener():
+    """Vacía la cola y detiene el hilo del listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
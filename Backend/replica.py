@@ -0,0 +1,393 @@
+"""Réplica local (SQLite) de las solicitudes de caución para cotizar sin SQL Server.
+
+``exportar`` copia la porción de un ramo (``EmpCod``, ``RamCod``) de solici,
+SolRieCob y SolImp, más las filas del tomador que alcanza el join de
+/policyholder, a un archivo SQLite indexado por SolNro; varios ramos pueden
+compartir el archivo, cada uno con su propio estado de exportación. ``conectar`` abre ese archivo con la forma
+de una conexión de pyodbc: las consultas de la API corren sin cambios, porque
+``traducir`` reescribe las construcciones de T-SQL que usan (``datediff``,
+``for json path``, ``top (?)`` y las funciones de checksum).
+
+Las actualizaciones son incrementales: con columnas cursor (rowversion o
+fecha de modificación de solici, SolRieCob y SolImp) sólo se leen las
+solicitudes con alguna fila modificada desde la última exportación y se
+borran las que ya no están; sin cursor se compara la versión de cada
+solicitud (``VERSION_ORIGEN`` de CotiCau: rowversion o checksum) y se copian
+sólo las que cambiaron o se borraron. La escritura es una transacción en modo
+WAL, así la API sigue leyendo la copia anterior hasta que termina.
+"""
+import re
+import sqlite3
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable
+
+ESQUEMA = """
+create table if not exists solici (
+    EmpCod integer, RamCod integer, SolNro integer,
+    Sol1Pri real, Sol1BonPriPor real, Sol1BonPri real, Sol1RAdPor real, Sol1RAd real,
+    Sol1RFiPor real, Sol1RFin real, Sol1DEm real, Sol1OtrCar real, Sol1Imp real, Sol1Pre real,
+    Sol1VigDesFac text, Sol1VigHasFac text, Sol1TomCod integer,
+    ReplicaVersion,
+    primary key (EmpCod, RamCod, SolNro)
+);
+create table if not exists SolRieCob (
+    EmpCod integer, RamCod integer, SolNro integer, Sol14TasApl real, Sol14CapAse real
+);
+create index if not exists SolRieCob_sol on SolRieCob (EmpCod, RamCod, SolNro);
+create table if not exists SolImp (
+    EmpCod integer, RamCod integer, SolNro integer, ImpCod text, Sol2Base real, Sol2Ali real, Sol2Imp real
+);
+create index if not exists SolImp_sol on SolImp (EmpCod, RamCod, SolNro);
+create table if not exists TomCau (TCauCod integer primary key, TCauAseCod integer);
+create table if not exists Aseg (AseCod integer primary key, AseNom text, AsePerCod integer);
+create table if not exists Personas (PerCod integer primary key, PerCui text);
+create table if not exists Personas2 (PerCod integer primary key, CPCod integer, CPSub integer);
+create table if not exists CodPos (CPCod integer, CPSub integer, PrvCod text, primary key (CPCod, CPSub));
+create table if not exists Provin (PrvCod text primary key, PrvNom text);
+create table if not exists replica_estado (clave text primary key, valor);
+"""
+
+# Columnas copiadas de cada tabla (las que leen las consultas de la API)
+COLUMNAS = {
+    "solici": ["EmpCod", "RamCod", "SolNro", "Sol1Pri", "Sol1BonPriPor", "Sol1BonPri", "Sol1RAdPor", "Sol1RAd",
+               "Sol1RFiPor", "Sol1RFin", "Sol1DEm", "Sol1OtrCar", "Sol1Imp", "Sol1Pre", "Sol1VigDesFac",
+               "Sol1VigHasFac", "Sol1TomCod"],
+    "SolRieCob": ["EmpCod", "RamCod", "SolNro", "Sol14TasApl", "Sol14CapAse"],
+    "SolImp": ["EmpCod", "RamCod", "SolNro", "ImpCod", "Sol2Base", "Sol2Ali", "Sol2Imp"],
+    "TomCau": ["TCauCod", "TCauAseCod"],
+    "Aseg": ["AseCod", "AseNom", "AsePerCod"],
+    "Personas": ["PerCod", "PerCui"],
+    "Personas2": ["PerCod", "CPCod", "CPSub"],
+    "CodPos": ["CPCod", "CPSub", "PrvCod"],
+    "Provin": ["PrvCod", "PrvNom"],
+}
+
+# Parámetros: EmpCod y RamCod del ramo que se exporta
+FILTRO = "s.EmpCod = ? and s.RamCod = ?"
+
+# Alias y joins desde solici con los que se alcanza cada tabla
+_TOMADOR = [
+    ("TomCau", "tc", "join TomCau tc on tc.TCauCod = s.Sol1TomCod"),
+    ("Aseg", "a", "join Aseg a on a.AseCod = tc.TCauAseCod"),
+    ("Personas", "p", "join Personas p on p.PerCod = a.AsePerCod"),
+    ("Personas2", "p1", "join Personas2 p1 on p1.PerCod = p.PerCod"),
+    ("CodPos", "cp", "join CodPos cp on cp.CPCod = p1.CPCod and cp.CPSub = p1.CPSub"),
+    ("Provin", "pro", "join Provin pro on pro.PrvCod = cp.PrvCod"),
+]
+CAMINOS = {
+    "SolRieCob": ("c", "join SolRieCob c on s.EmpCod = c.EmpCod and c.RamCod = s.RamCod and s.SolNro = c.SolNro"),
+    "SolImp": ("i", "join SolImp i on i.EmpCod = s.EmpCod and i.RamCod = s.RamCod and i.SolNro = s.SolNro"),
+}
+for _n, (_tabla, _alias, _) in enumerate(_TOMADOR):
+    CAMINOS[_tabla] = (_alias, " ".join(j for _, _, j in _TOMADOR[:_n + 1]))
+
+# SolNro por consulta IN
+BLOQUE = 1000
+
+# Tablas con columna cursor, en el orden de ``cursor_columnas``
+TABLAS_CURSOR = [("solici", "s"), ("SolRieCob", "c"), ("SolImp", "i")]
+
+
+def version_rowversion(solici: str, cobertura: str, impuestos: str) -> str:
+    """Expresión de versión con las columnas rowversion de solici (``s``), SolRieCob (``c``) y SolImp (``i``).
+
+    Es la mayor de las tres: cambia con cualquier alta o modificación de la
+    solicitud, incluso si sólo se editó un impuesto o la cobertura. Un impuesto
+    borrado sin tocar nada más no la cambia (rowversion no registra bajas).
+    """
+    return f"""(select max(v) from (
+            select {solici} as v
+            union all select {cobertura}
+            union all select max({impuestos}) from SolImp i
+                where i.EmpCod = s.EmpCod and i.RamCod = s.RamCod and i.SolNro = s.SolNro) as versiones)"""
+
+
+# ----------------------------------------------------------------------
+# Lectura: conexión con la forma de pyodbc
+
+_DATEDIFF = re.compile(r"datediff\(\s*day\s*,\s*([^,()]+?)\s*,\s*([^,()]+?)\s*\)", re.I)
+_TOP = re.compile(r"(\s*select\s+)top\s*\(\s*\?\s*\)\s*", re.I)
+_FOR_JSON = re.compile(r"\(\s*select\s+([\w.,\s]+?)\s+from\s+([^()]+?)\s+for\s+json\s+path\s*\)", re.I)
+
+
+def _json_path(m: re.Match) -> str:
+    columnas = [c.strip() for c in m.group(1).split(",")]
+    pares = ", ".join(f"'{c.split('.')[-1]}', {c}" for c in columnas)
+    # FOR JSON PATH devuelve NULL si no hay filas
+    return (f"(select case when count(*) > 0 then json_group_array(json_object({pares})) end "
+            f"from {m.group(2)})")
+
+
+def _top(sql: str) -> str:
+    # "select top (?) ..." -> "select ... limit ?1": el límite es el primer
+    # parámetro, así que los demás se numeran desde ?2 en el orden del texto
+    m = _TOP.match(sql)
+    if not m:
+        return sql
+    numeros = iter(range(2, sql.count("?") + 1))
+    return m.group(1) + re.sub(r"\?", lambda _: f"?{next(numeros)}", sql[m.end():]) + " limit ?1"
+
+
+@lru_cache(maxsize=256)
+def traducir(sql: str) -> str:
+    """La consulta de T-SQL en el dialecto de SQLite."""
+    sql = _DATEDIFF.sub(r"cast(julianday(\2) - julianday(\1) as integer)", sql)
+    sql = _FOR_JSON.sub(_json_path, sql)
+    return _top(sql)
+
+
+def _checksum(*valores) -> int:
+    c = zlib.crc32(repr(valores).encode())
+    return c - (1 << 32) if c >= 1 << 31 else c
+
+
+class _ChecksumAgg:
+    def __init__(self):
+        self.valor = 0
+
+    def step(self, v):
+        if v is not None:
+            self.valor ^= v
+
+    def finalize(self):
+        return self.valor
+
+
+_tipos_fila: dict[tuple, type] = {}
+
+
+def _fila(cursor, valores):
+    # Filas con acceso por atributo, como pyodbc.Row
+    columnas = tuple(d[0] for d in cursor.description)
+    tipo = _tipos_fila.get(columnas)
+    if tipo is None:
+        tipo = _tipos_fila[columnas] = namedtuple("Fila", columnas, rename=True)
+    return tipo(*valores)
+
+
+class Cursor:
+    """Lo que la API usa de un cursor de pyodbc."""
+
+    def __init__(self, conexion: "Conexion"):
+        self._conexion = conexion
+        self._cursor = conexion._conn.cursor()
+
+    def execute(self, sql: str, *params):
+        self._cursor.execute(traducir(sql), params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, n: int):
+        return self._cursor.fetchmany(n)
+
+    def cancel(self):
+        self._conexion._conn.interrupt()
+
+    def close(self):
+        self._cursor.close()
+
+
+class Conexion:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = _fila
+        self._conn.create_function("checksum", -1, _checksum, deterministic=True)
+        self._conn.create_function("binary_checksum", -1, _checksum, deterministic=True)
+        self._conn.create_aggregate("checksum_agg", 1, _ChecksumAgg)
+        self.timeout = 0
+
+    def cursor(self) -> Cursor:
+        return Cursor(self)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def conectar(path: str) -> Conexion:
+    return Conexion(path)
+
+
+# ----------------------------------------------------------------------
+# Exportación desde SQL Server
+
+def _consulta(tabla: str, ids: list | None, extra: str = "") -> str:
+    if tabla == "solici":
+        alias, joins = "s", ""
+    else:
+        alias, joins = CAMINOS[tabla]
+    columnas = ", ".join(f"{alias}.{c}" for c in COLUMNAS[tabla])
+    distinct = "distinct " if tabla not in ("solici", "SolRieCob", "SolImp") else ""
+    filtro = FILTRO if ids is None else f"{FILTRO} and s.SolNro in ({', '.join('?' * len(ids))})"
+    return f"select {distinct}{columnas}{extra} from solici s {joins} where {filtro}"
+
+
+def _bloques(ids: list, tamaño: int = BLOQUE) -> Iterable[list]:
+    for i in range(0, len(ids), tamaño):
+        yield ids[i:i + tamaño]
+
+
+def _copiar(origen, destino: sqlite3.Connection, ids: list | None, version: str, empresa: int, ramo: int) -> int:
+    """Copia las filas de ``ids`` (todas si es None); devuelve las solicitudes copiadas."""
+    copiadas = 0
+    for tabla in COLUMNAS:
+        marcas = ", ".join("?" * (len(COLUMNAS[tabla]) + (tabla == "solici")))
+        # solici no tiene duplicados por SolNro: la versión sale del join con SolRieCob
+        # y con varias coberturas se queda la primera, como fetchone en la API
+        verbo = "insert or ignore" if tabla == "solici" else (
+            "insert" if tabla in ("SolRieCob", "SolImp") else "insert or replace")
+        insertar = f"{verbo} into {tabla} values ({marcas})"
+        extra = ""
+        if tabla == "solici":
+            extra = f", {version} as ReplicaVersion"
+        for bloque in ([None] if ids is None else _bloques(ids)):
+            sql = _consulta(tabla, bloque, extra)
+            if tabla == "solici":
+                sql = sql.replace("from solici s ", "from solici s left join SolRieCob c on s.EmpCod = c.EmpCod "
+                                                    "and c.RamCod = s.RamCod and s.SolNro = c.SolNro ", 1)
+            cursor = origen.cursor()
+            cursor.execute(sql, empresa, ramo, *(bloque or ()))
+            while filas := cursor.fetchmany(BLOQUE):
+                destino.executemany(insertar, [tuple(f) for f in filas])
+                if tabla == "solici":
+                    copiadas += len(filas)
+    return copiadas
+
+
+def _borrar(destino: sqlite3.Connection, empresa: int, ramo: int, ids: list | None):
+    """Borra las solicitudes ``ids`` del ramo (todas si es None)."""
+    for bloque in ([None] if ids is None else _bloques(ids)):
+        filtro = "" if bloque is None else f" and SolNro in ({', '.join('?' * len(bloque))})"
+        for tabla in ("solici", "SolRieCob", "SolImp"):
+            destino.execute(f"delete from {tabla} where EmpCod = ? and RamCod = ?{filtro}",
+                            (empresa, ramo, *(bloque or ())))
+
+
+def _valor_cursor(valor):
+    # Fechas como texto que SQL Server vuelve a convertir (al milisegundo: a lo
+    # sumo se copia de nuevo alguna fila); rowversion queda como bytes
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=" ", timespec="milliseconds")
+    return valor
+
+
+def _estado(destino: sqlite3.Connection, clave: str, valor=None, guardar: bool = False):
+    if guardar:
+        destino.execute("insert or replace into replica_estado values (?, ?)", (clave, valor))
+        return valor
+    fila = destino.execute("select valor from replica_estado where clave = ?", (clave,)).fetchone()
+    return fila[0] if fila else None
+
+
+def _consulta_cursor(columnas: list[str]) -> str:
+    """Mayor valor de las columnas cursor de solici, SolRieCob y SolImp del ramo."""
+    partes = [f"select max({columna}) as v from {tabla} {alias} where {alias}.EmpCod = ? and {alias}.RamCod = ?"
+              for columna, (tabla, alias) in zip(columnas, TABLAS_CURSOR)]
+    return f"select max(v) from ({' union all '.join(partes)}) as cursores"
+
+
+def _consulta_modificadas(columnas: list[str]) -> str:
+    """SolNro con alguna fila de solici, SolRieCob o SolImp posterior al cursor."""
+    return " union ".join(
+        f"select {alias}.SolNro from {tabla} {alias} where {alias}.EmpCod = ? and {alias}.RamCod = ? and {columna} > ?"
+        for columna, (tabla, alias) in zip(columnas, TABLAS_CURSOR))
+
+
+def exportar(origen, path: str, version: str, cursor_columnas: list[str] | None = None, completa: bool = False,
+             empresa: int = 1, ramo: int = 9) -> dict:
+    """Crea o actualiza en ``path`` la réplica del ramo desde la conexión ``origen``.
+
+    ``version`` es la expresión de versión de la solicitud (``VERSION_SOLICITUD``);
+    ``cursor_columnas``, las columnas de solici, SolRieCob y SolImp que crecen
+    con cada modificación (p. ej. ``["s.Sol1RowVer", "c.Sol14RowVer",
+    "i.Sol2RowVer"]``). Con cursor, las solicitudes que ya no están en el origen
+    se borran comparando sólo los SolNro. Las filas del tomador se reemplazan,
+    no se borran.
+    """
+    t0 = time.perf_counter()
+    prefijo = f"{empresa}/{ramo}/"
+    cursor_clave = ",".join(cursor_columnas) if cursor_columnas else None
+    destino = sqlite3.connect(path, isolation_level=None)
+    try:
+        destino.execute("pragma journal_mode=wal")
+        destino.executescript(ESQUEMA)
+        destino.execute("begin")
+        completa = completa or _estado(destino, prefijo + "exportada") is None
+        # El cursor anterior sólo sirve si se calculó con las mismas columnas
+        if _estado(destino, prefijo + "cursor_columnas") != cursor_clave:
+            completa = True
+        borradas = 0
+
+        nuevo_cursor = None
+        if cursor_columnas:
+            # Se lee antes de copiar: lo que cambie durante la copia entra en la próxima
+            c = origen.cursor()
+            c.execute(_consulta_cursor(cursor_columnas), *(empresa, ramo) * len(TABLAS_CURSOR))
+            nuevo_cursor = _valor_cursor(c.fetchone()[0])
+
+        if completa:
+            _borrar(destino, empresa, ramo, None)
+            ids = None
+            modo = "completa"
+        elif cursor_columnas:
+            anterior = _estado(destino, prefijo + "cursor")
+            c = origen.cursor()
+            c.execute(_consulta_modificadas(cursor_columnas), *(empresa, ramo, anterior) * len(TABLAS_CURSOR))
+            ids = [f[0] for f in c.fetchall()]
+            # Las bajas no dejan rastro en el cursor: se comparan los SolNro
+            c = origen.cursor()
+            c.execute(f"select s.SolNro from solici s where {FILTRO}", empresa, ramo)
+            remotas = {f[0] for f in c.fetchall()}
+            quitadas = [sol for (sol,) in destino.execute(f"select SolNro from solici s where {FILTRO}",
+                                                          (empresa, ramo)) if sol not in remotas]
+            _borrar(destino, empresa, ramo, quitadas)
+            borradas = len(quitadas)
+            modo = "cursor"
+        else:
+            # Sin cursor: versión de cada solicitud contra la de la réplica
+            c = origen.cursor()
+            c.execute(f"select s.SolNro, {version} as version from solici s left join SolRieCob c "
+                      f"on s.EmpCod = c.EmpCod and c.RamCod = s.RamCod and s.SolNro = c.SolNro where {FILTRO}",
+                      empresa, ramo)
+            remotas = {}
+            for sol, v in c.fetchall():
+                remotas.setdefault(sol, v)
+            locales = dict(destino.execute(f"select SolNro, ReplicaVersion from solici s where {FILTRO}",
+                                           (empresa, ramo)))
+            ids = [sol for sol, v in remotas.items() if locales.get(sol) != v]
+            quitadas = [sol for sol in locales if sol not in remotas]
+            _borrar(destino, empresa, ramo, quitadas)
+            borradas = len(quitadas)
+            modo = "versiones"
+
+        if ids is not None:
+            _borrar(destino, empresa, ramo, ids)
+        copiadas = _copiar(origen, destino, ids, version, empresa, ramo) if ids is None or ids else 0
+
+        _estado(destino, prefijo + "cursor_columnas", cursor_clave, guardar=True)
+        if nuevo_cursor is not None:
+            _estado(destino, prefijo + "cursor", nuevo_cursor, guardar=True)
+        _estado(destino, prefijo + "exportada", time.time(), guardar=True)
+        destino.execute("commit")
+    except BaseException:
+        if destino.in_transaction:
+            destino.execute("rollback")
+        raise
+    finally:
+        destino.close()
+    return {"modo": modo, "copiadas": copiadas, "borradas": borradas,
+            "segundos": round(time.perf_counter() - t0, 3)}
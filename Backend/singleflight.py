@@ -0,0 +1,40 @@
+"""Coalescencia de requests idénticos en curso (single-flight).
+
+Si llegan a la vez varios pedidos con la misma clave, sólo el primero ejecuta
+la corrutina; el resto espera ese mismo resultado (o excepción). La clave se
+libera apenas termina, así que no se sirve nada viejo: un pedido posterior
+vuelve a ejecutar.
+
+Vive en el event loop del worker y no usa locks.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._vuelos: dict[Hashable, asyncio.Future] = {}
+        self._stats = {"ejecutadas": 0, "coalescidas": 0}
+
+    async def do(self, clave: Hashable, fn: Callable[..., Awaitable[Any]], *args):
+        """Resultado de ``await fn(*args)``, compartido con los pedidos simultáneos de ``clave``."""
+        tarea = self._vuelos.get(clave)
+        if tarea is None:
+            # Tarea aparte: si el primer pedido se cancela, los demás siguen esperando
+            tarea = asyncio.ensure_future(fn(*args))
+            self._vuelos[clave] = tarea
+            tarea.add_done_callback(lambda t: self._terminar(clave, t))
+            self._stats["ejecutadas"] += 1
+        else:
+            self._stats["coalescidas"] += 1
+        return await asyncio.shield(tarea)
+
+    def _terminar(self, clave: Hashable, tarea: asyncio.Future):
+        if self._vuelos.get(clave) is tarea:
+            del self._vuelos[clave]
+        # Marca la excepción como leída aunque nadie la espere (todos cancelados)
+        if not tarea.cancelled():
+            tarea.exception()
+
+    def stats(self) -> dict:
+        return {**self._stats, "en_curso": len(self._vuelos)}
@@ -0,0 +1,155 @@
+"""Resolución de la tasa que lleva el premio base al premio objetivo.
+
+La tasa es la que encuentra la bisección original, paso por paso (incluido el
+resultado cuando no converge). Lo que se evita es evaluar el premio en cada
+paso: entre redondeos el premio base es ``base_imponible * multiplicador``, y
+los redondeos a centavos lo apartan de ese valor a lo sumo ``cota_redondeo``.
+
+Entre dos tramos de ``deremi.xlsx`` el derecho es constante y ese premio es
+lineal en la tasa, así que se despeja en forma cerrada el intervalo de tasas
+(:func:`banda_cerrada`) donde el premio exacto puede quedar a ``TOLERANCIA``
+del objetivo. Los pasos de la bisección fuera del intervalo se deciden con una
+comparación y sólo los de adentro evalúan el premio con los redondeos vigentes.
+Si la tabla no es creciente (o la suma, los días o el multiplicador no son
+positivos) cada paso compara la aproximación del premio y sólo evalúa el
+exacto cerca del objetivo.
+"""
+from typing import Callable, NamedTuple
+
+from derechos import TablaDerechos
+from impuestos import PlanImpuestos
+from metricas import metricas
+
+TOLERANCIA = 0.01
+MAX_ITER = 100
+
+
+class Solucion(NamedTuple):
+    tasa: float            # tasa con la que se evaluó el premio final
+    tasa_informada: float  # tasa que se informa (difiere sólo si la bisección no converge)
+    iteraciones: int
+
+
+def calcular_prima(tasa: float, suma: float, dias: int) -> float:
+    # Mismo orden de operaciones que el cálculo original para no mover centavos
+    return (tasa * suma) / 1000 / 365 * dias
+
+
+def calcular_base_imponible(prima: float, derecho: float, rec_admin_pct: float, bonificacion: float = 0.0) -> float:
+    return prima - bonificacion + prima * (rec_admin_pct / 100) + derecho
+
+
+def premio_base(prima: float, derecho: float, plan: PlanImpuestos,
+                rec_admin_pct: float, bonificacion: float = 0.0) -> float:
+    """Premio base (sin recargo financiero) con las reglas de redondeo vigentes."""
+    return plan.premio(calcular_base_imponible(prima, derecho, rec_admin_pct, bonificacion))
+
+
+def cota_redondeo(plan: PlanImpuestos) -> float:
+    """Cota de ``|plan.premio(base) - base * plan.multiplicador|``.
+
+    Cada importe, la suma de impuestos y el premio se redondean a centavos (medio
+    centavo de error cada uno, amplificado por los impuestos en cascada); se
+    toma el doble como margen.
+    """
+    return 0.01 * (len(plan.alicuotas) + 3) * plan.multiplicador
+
+
+def banda_cerrada(objetivo: float, suma: float, dias: int, plan: PlanImpuestos, rec_admin_pct: float,
+                  tabla: TablaDerechos, bonificacion: float = 0.0) -> tuple[float, float] | None:
+    """Tasas ``(desde, hasta)`` fuera de las cuales el premio exacto queda a más
+    de ``TOLERANCIA`` del objetivo: por debajo de ``desde`` es menor y por
+    encima de ``hasta``, mayor.
+
+    Despeja la prima del tramo donde ``base_imponible * multiplicador`` está a
+    ``TOLERANCIA + cota_redondeo`` del objetivo; si el objetivo cae en un salto
+    de derecho el borde es la prima del tramo siguiente. Los bordes se abren un
+    poco para cubrir los redondeos de punto flotante. ``None`` si no se puede
+    despejar.
+    """
+    k = suma / 1000 / 365 * dias
+    factor = 1 + rec_admin_pct / 100
+    multiplicador = plan.multiplicador
+    if not (tabla.creciente and k > 0 and multiplicador > 0 and factor > 0):
+        return None
+    margen = TOLERANCIA + cota_redondeo(plan)
+    bajo = (objetivo - margen) / multiplicador + bonificacion
+    alto = (objetivo + margen) / multiplicador + bonificacion
+    holgura = 1e-9 * (abs(alto) + abs(bonificacion) + 1.0)
+    desde = tabla.prima_para_base(bajo - holgura, factor) / k
+    hasta = tabla.prima_para_base(alto + holgura, factor) / k
+    return desde - abs(desde) * 1e-12, hasta + abs(hasta) * 1e-12
+
+
+def biseccion(objetivo: float, tasa_original: float, evaluar: Callable[[float], float],
+              aproximar: Callable[[float], float] | None = None, cota: float = 0.0,
+              banda: tuple[float, float] | None = None) -> Solucion:
+    """Bisección original, incluido el caso en que no converge: la tasa informada
+    es la siguiente de la secuencia y no la última evaluada.
+
+    Con ``banda`` (ver :func:`banda_cerrada`) los pasos fuera del intervalo se
+    deciden sin llamar a nada. Con ``aproximar`` (premio a menos de ``cota``
+    del exacto) los pasos lejos del objetivo se deciden sin llamar a
+    ``evaluar``: dentro de la banda sólo pasa junto a un salto de derecho, donde
+    la bisección de las que no convergen se queda. La secuencia de tasas no cambia.
+    """
+    tasa_min, tasa_max = 0.0, max(tasa_original * 10.0, 1000.0)
+    tasa_actual = tasa_original
+    tasa_evaluada = tasa_actual
+    iter_count = 0
+    while iter_count < MAX_ITER:
+        tasa_evaluada = tasa_actual
+        if banda is not None and tasa_actual < banda[0]:
+            sube = True
+        elif banda is not None and tasa_actual > banda[1]:
+            sube = False
+        else:
+            nuevo_premio = None
+            if aproximar is not None:
+                aproximado = aproximar(tasa_actual)
+                # Fuera de la tolerancia aun corrido en ``cota``: el exacto queda del mismo lado
+                if abs(aproximado - objetivo) > TOLERANCIA + cota:
+                    nuevo_premio = aproximado
+            if nuevo_premio is None:
+                nuevo_premio = evaluar(tasa_actual)
+            if abs(nuevo_premio - objetivo) <= TOLERANCIA:
+                return Solucion(tasa_actual, tasa_actual, iter_count)
+            sube = nuevo_premio < objetivo
+        if sube:
+            tasa_min = tasa_actual
+            tasa_actual = (tasa_actual + tasa_max) / 2.0
+        else:
+            tasa_max = tasa_actual
+            tasa_actual = (tasa_actual + tasa_min) / 2.0
+        iter_count += 1
+    return Solucion(tasa_evaluada, tasa_actual, iter_count)
+
+
+def resolver_tasa(objetivo: float, tasa_original: float, suma: float, dias: int,
+                  plan: PlanImpuestos, rec_admin_pct: float,
+                  tabla: TablaDerechos, bonificacion: float = 0.0) -> Solucion:
+    """Tasa de la bisección original cuyo premio base queda a ``TOLERANCIA`` del objetivo."""
+    evaluaciones = 0
+    pasos = 0
+    multiplicador = plan.multiplicador
+
+    def evaluar(tasa: float) -> float:
+        nonlocal evaluaciones
+        evaluaciones += 1
+        prima = calcular_prima(tasa, suma, dias)
+        return premio_base(prima, tabla.derecho(prima), plan, rec_admin_pct, bonificacion)
+
+    def aproximar(tasa: float) -> float:
+        nonlocal pasos
+        pasos += 1
+        prima = calcular_prima(tasa, suma, dias)
+        return calcular_base_imponible(prima, tabla.derecho(prima), rec_admin_pct, bonificacion) * multiplicador
+
+    banda = banda_cerrada(objetivo, suma, dias, plan, rec_admin_pct, tabla, bonificacion)
+    solucion = biseccion(objetivo, tasa_original, evaluar, aproximar, cota_redondeo(plan), banda)
+    # Con la banda sólo los pasos cercanos al objetivo buscan un derecho; sin
+    # ella cada paso lo busca para aproximar el premio
+    metricas.sumar("solver_evaluaciones_total", evaluaciones)
+    metricas.sumar("derechos_busquedas_total", pasos + evaluaciones)
+    metricas.sumar("solver_resoluciones_total")
+    return solucion
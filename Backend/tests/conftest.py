@@ -0,0 +1,32 @@
+"""Los módulos del backend se importan planos (``import solver``), como en CotiCau.
+
+``api`` levanta CotiCau contra una base SQLite sintética (``bench/standin.py``)
+con las mismas consultas que en SQL Server.
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+SOLICITUDES = 200
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    from bench import standin
+
+    path = str(tmp_path_factory.mktemp("base") / "coticau.sqlite")
+    standin.sembrar(path, SOLICITUDES)
+    standin.instalar(path)
+    os.environ.update(RESULTADOS_CACHE_SIZE="0", LOG_MUESTREO="0", PRECALENTAR_SOLICITUDES="0")
+    # La tabla de derechos se resuelve relativa a Backend
+    os.chdir(BACKEND)
+    import CotiCau
+    from fastapi.testclient import TestClient
+
+    with TestClient(CotiCau.app) as cliente:
+        yield SimpleNamespace(modulo=CotiCau, cliente=cliente, path=path)
@@ -0,0 +1,36 @@
+from cotizacion import clave_solicitud
+
+
+def _item(application_id):
+    return {"application_id": application_id, "premioinformado": 0, "dias": 180, "sumaTotal": 1500000,
+            "cuotas": 3, "tipo": "C"}
+
+
+def test_clave_solicitud():
+    assert clave_solicitud("00123") == clave_solicitud(" 123 ") == clave_solicitud(123) == "123"
+    assert clave_solicitud("12a") is None
+    assert clave_solicitud("") is None
+    assert clave_solicitud("-5") is None
+
+
+def test_batch_normaliza_los_ids(api):
+    ids = ["7", "007", " 7", "7 ", "abc", "99999"]
+    respuesta = api.cliente.post("/recotizar/batch", json=[_item(i) for i in ids])
+    assert respuesta.status_code == 200
+    resultados = respuesta.json()
+    assert [r["application_id"] for r in resultados] == ids
+    individual = api.cliente.get("/recotizar2/7/0/180/1500000/3/C").json()
+    for r in resultados[:4]:
+        assert r["error"] is None
+        assert r["quote"] == individual
+    for r in resultados[4:]:
+        assert r["quote"] is None and r["error"] == "Quote not found"
+
+
+def test_archivo_normaliza_los_ids(api):
+    cuerpo = "application_id,premioinformado,dias,sumaTotal,cuotas,tipo\n007,0,180,1500000,3,C\n7,0,180,1500000,3,C\n"
+    respuesta = api.cliente.post("/recotizar/archivo?formato=csv", content=cuerpo)
+    lineas = respuesta.text.splitlines()
+    assert len(lineas) == 3
+    assert lineas[1].split(",")[1:] == lineas[2].split(",")[1:]
+    assert lineas[1].split(",")[1] == ""
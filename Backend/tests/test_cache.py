@@ -0,0 +1,75 @@
+from cache import CacheTTL
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_vencimiento():
+    reloj = Reloj()
+    cache = CacheTTL(max_size=10, ttl=60, clock=reloj)
+    cargas = []
+
+    def cargar():
+        cargas.append(reloj.ahora)
+        return len(cargas)
+
+    assert cache.obtener("a", cargar) == 1
+    reloj.ahora = 59.9
+    assert cache.obtener("a", cargar) == 1
+    reloj.ahora = 60.0
+    assert cache.obtener("a", cargar) == 2
+    assert cargas == [0.0, 60.0]
+    stats = cache.stats()
+    assert (stats["aciertos"], stats["fallos"], stats["expirados"]) == (1, 2, 1)
+
+
+def test_desaloja_la_menos_usada():
+    cache = CacheTTL(max_size=2, ttl=60, clock=Reloj())
+    cache.guardar("a", 1)
+    cache.guardar("b", 2)
+    assert cache.obtener("a", lambda: None) == 1
+    cache.guardar("c", 3)
+    assert cache.obtener("b", lambda: None) is None
+    assert cache.obtener("a", lambda: None) == 1
+    assert cache.stats()["desalojos"] == 1
+
+
+def test_none_no_se_guarda():
+    cache = CacheTTL(max_size=2, ttl=60, clock=Reloj())
+    assert cache.obtener("a", lambda: None) is None
+    assert len(cache) == 0
+
+
+def test_revalida_solo_pasado_el_plazo():
+    reloj = Reloj()
+    cache = CacheTTL(max_size=10, ttl=300, clock=reloj, revalidar=30)
+    validaciones = []
+
+    def validar(valor):
+        validaciones.append(reloj.ahora)
+        return True
+
+    cache.guardar("a", "v1")
+    reloj.ahora = 29
+    assert cache.obtener("a", lambda: "v2", validar) == "v1"
+    assert validaciones == []
+    reloj.ahora = 31
+    assert cache.obtener("a", lambda: "v2", validar) == "v1"
+    # La validación reinicia el plazo
+    reloj.ahora = 60
+    assert cache.obtener("a", lambda: "v2", validar) == "v1"
+    assert validaciones == [31]
+
+
+def test_validacion_rechazada_recarga():
+    reloj = Reloj()
+    cache = CacheTTL(max_size=10, ttl=300, clock=reloj)
+    cache.guardar("a", "v1")
+    assert cache.obtener("a", lambda: "v2", lambda valor: False) == "v2"
+    assert cache.obtener("a", lambda: "v3") == "v2"
+    assert cache.stats()["invalidados"] == 1
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+import cache_resultados
+from cache_resultados import CacheResultados
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1_000_000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(cache_resultados.time, "time", reloj)
+    return reloj
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CacheResultados(str(tmp_path / "resultados.sqlite"), max_entries=5, ttl=60)
+    yield cache
+    cache.close()
+
+
+def test_vencimiento(cache, reloj):
+    cache.put("a", '{"premio": 1}')
+    reloj.ahora += 59.9
+    assert cache.get("a") == '{"premio": 1}'
+    reloj.ahora += 0.1
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["aciertos"], stats["fallos"], stats["guardados"]) == (1, 1, 1)
+
+
+def test_poda_las_mas_viejas(cache, reloj, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "PODAR_CADA", 10)
+    for n in range(10):
+        reloj.ahora += 1
+        cache.put(str(n), str(n))
+    assert [cache.get(str(n)) for n in range(10)] == [None] * 5 + [str(n) for n in range(5, 10)]
+    assert cache.stats()["podas"] == 1
+
+
+def test_compartido_entre_instancias(cache):
+    cache.put("a", "1")
+    otro = CacheResultados(cache.path, ttl=60)
+    try:
+        assert otro.get("a") == "1"
+    finally:
+        otro.close()
+
+
+def test_reabre_despues_de_close(cache):
+    cache.put("a", "1")
+    cache.close()
+    assert cache.get("a") == "1"
+
+
+class CacheEspia:
+    """Registra si cada lectura corrió en el event loop."""
+
+    def __init__(self):
+        self.datos = {}
+        self.en_loop = []
+
+    def get(self, clave):
+        try:
+            asyncio.get_running_loop()
+            self.en_loop.append(True)
+        except RuntimeError:
+            self.en_loop.append(False)
+        return self.datos.get(clave)
+
+    def put(self, clave, valor):
+        self.datos[clave] = valor
+
+
+def test_la_lectura_no_corre_en_el_event_loop(api, monkeypatch):
+    espia = CacheEspia()
+    monkeypatch.setattr(api.modulo, "resultados_cache", espia)
+    url = "/recotizar2/12/0/180/1500000/3/C"
+    primera = api.cliente.get(url)
+    segunda = api.cliente.get(url)
+    assert primera.status_code == segunda.status_code == 200
+    assert primera.content == segunda.content
+    assert len(espia.datos) == 1
+    assert espia.en_loop == [False, False]
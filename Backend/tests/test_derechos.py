@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+import derechos
+from derechos import TablaDerechos, cargar_tabla
+
+pd = pytest.importorskip("pandas")
+
+
+def _original(df, prima):
+    # La búsqueda con pandas que hacía el endpoint
+    candidatos = df[df["PRIMA"] <= prima]
+    if candidatos.empty:
+        return float(df["DERECHO"].iloc[0])
+    return float(candidatos.loc[candidatos["PRIMA"].idxmax()]["DERECHO"])
+
+
+@pytest.fixture
+def planilla():
+    rnd = np.random.default_rng(3)
+    primas = np.round(rnd.uniform(0, 1e5, 300), 0)
+    primas[::17] = primas[5]          # primas repetidas: gana la primera fila
+    primas[40] = np.nan
+    rnd.shuffle(primas)
+    return pd.DataFrame({"PRIMA": primas, "DERECHO": np.round(rnd.uniform(1, 500, 300), 2)})
+
+
+def test_igual_a_la_busqueda_con_pandas(planilla):
+    tabla = TablaDerechos.desde_dataframe(planilla)
+    consultas = np.concatenate([planilla["PRIMA"].dropna().to_numpy(), [-1.0, 0.0, 1e9, np.nan],
+                                np.random.default_rng(4).uniform(-100, 1.1e5, 2000)])
+    esperados = [_original(planilla, p) for p in consultas]
+    assert [tabla.derecho(p) for p in consultas] == esperados
+    assert tabla.derechos_vector(consultas).tolist() == esperados
+
+
+def test_version():
+    a = TablaDerechos([0, 10, 20], [1, 2, 3])
+    assert a.version == TablaDerechos([0, 20, 10], [1, 3, 2]).version
+    assert a.version != TablaDerechos([0, 10, 20], [1, 2, 4]).version
+    # El mínimo es la primera fila de la planilla aunque no sea la menor prima
+    assert a.version != TablaDerechos([10, 0, 20], [2, 1, 3]).version
+
+
+def test_tabla_vacia():
+    with pytest.raises(ValueError):
+        TablaDerechos([], [])
+
+
+def test_snapshot(tmp_path, monkeypatch):
+    pytest.importorskip("openpyxl")
+    xlsx = str(tmp_path / "deremi.xlsx")
+    pd.DataFrame({" PRIMA ": [0.0, 100.0, 200.0], "DERECHO": [5.0, 6.0, 7.0]}).to_excel(xlsx, index=False)
+    lecturas = []
+    leer_excel = derechos._leer_excel
+    monkeypatch.setattr(derechos, "_leer_excel", lambda path: lecturas.append(path) or leer_excel(path))
+
+    tabla = cargar_tabla(xlsx)
+    assert os.path.exists(str(tmp_path / "deremi.npz"))
+    assert tabla.derecho(150) == 6.0
+    assert cargar_tabla(xlsx).version == tabla.version
+    # Sólo cambia el mtime: se compara el hash y no se relee la planilla
+    os.utime(xlsx, ns=(0, os.stat(xlsx).st_mtime_ns + 10**9))
+    assert cargar_tabla(xlsx).version == tabla.version
+    assert len(lecturas) == 1
+
+    pd.DataFrame({"PRIMA": [0.0, 100.0], "DERECHO": [5.0, 9.0]}).to_excel(xlsx, index=False)
+    assert cargar_tabla(xlsx).derecho(150) == 9.0
+    assert len(lecturas) == 2
@@ -0,0 +1,42 @@
+"""Códigos de error de los endpoints: una solicitud inexistente es un 404, no un 500."""
+import pytest
+
+from db_async import QueryTimeout
+from pool import PoolTimeout
+
+INEXISTENTE = "99999"
+
+
+@pytest.mark.parametrize("url", [
+    f"/planes/{INEXISTENTE}/0/180/1500000/C",
+    f"/comparar/{INEXISTENTE}/0/180/1500000",
+    f"/recotizar2/{INEXISTENTE}/0/180/1500000/3/C",
+    f"/pantalla/{INEXISTENTE}/1500000/6",
+    f"/grilla/{INEXISTENTE}?dias_desde=30&dias_hasta=90&suma_desde=100000&suma_hasta=200000&suma_paso=50000",
+])
+def test_solicitud_inexistente(api, url):
+    respuesta = api.cliente.get(url)
+    assert respuesta.status_code == 404
+    assert respuesta.json()["detail"] == "Quote not found"
+
+
+@pytest.mark.parametrize("url, detalle", [
+    (f"/quote/{INEXISTENTE}/", "Quote not found"),
+    (f"/impDetail/{INEXISTENTE}/", "No taxes found"),
+    (f"/policyholder/{INEXISTENTE}/1500000/6", "PolicyHolder not found"),
+])
+def test_datos_guardados_inexistentes(api, url, detalle):
+    respuesta = api.cliente.get(url)
+    assert respuesta.status_code == 404
+    assert respuesta.json()["detail"] == detalle
+
+
+@pytest.mark.parametrize("error, codigo", [(QueryTimeout("lenta"), 504), (PoolTimeout("sin conexiones"), 503),
+                                           (RuntimeError("otro"), 500)])
+def test_errores_de_la_base(api, monkeypatch, error, codigo):
+    async def fallar(*args):
+        raise error
+    monkeypatch.setattr(api.modulo, "_fuente", fallar)
+    respuesta = api.cliente.get("/planes/7/0/180/1500000/C")
+    assert respuesta.status_code == codigo
+    assert respuesta.json()["detail"] == str(error)
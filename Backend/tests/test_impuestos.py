@@ -0,0 +1,95 @@
+"""PlanImpuestos contra el cálculo de impuestos original, fila por fila."""
+import random
+
+import pytest
+
+from cotizacion import FilaImpuesto
+from impuestos import PlanImpuestos
+
+
+def _original(filas, base_imponible):
+    # El cálculo del premio base tal como estaba en el endpoint
+    detalle = []
+    base_ori = 0
+    for r in filas:
+        if r.Sol2Base == base_ori or base_ori == 0:
+            base_ori = r.Sol2Base
+            imp_base = round(base_imponible, 2)
+            detalle.append([imp_base, r.Sol2Ali, round(imp_base * r.Sol2Ali / 100.0, 2)])
+        else:
+            detalle.append([0.0, r.Sol2Ali, 0.0])
+    total = round(sum(d[2] for d in detalle), 2) + base_imponible
+    for d in detalle:
+        if d[0] == 0:
+            d[0] = total
+            d[2] = round(d[0] * d[1] / 100.0, 2)
+            total += d[2]
+    total = round(sum(d[2] for d in detalle), 2)
+    return round(base_imponible + total, 2), [d[0] for d in detalle], [d[2] for d in detalle]
+
+
+def _original_financiero(bases, alicuotas, base_con_financiero, base_imponible, rec_financiero):
+    # La segunda pasada del endpoint, con el recargo financiero en la base
+    detalle = [[b, a, 0.0] for b, a in zip(bases, alicuotas)]
+    total = 0.0
+    base_ori = 0
+    for d in detalle:
+        if d[0] == base_ori or base_ori == 0:
+            base_ori = d[0]
+            d[0] = base_con_financiero
+            d[2] = round(d[0] * d[1] / 100.0, 2)
+            total += d[2]
+        else:
+            d[0], d[2] = 0.0, 0.0
+    total = round(total, 2)
+    premio = round(base_imponible + rec_financiero + total, 2)
+    for d in detalle:
+        if d[0] == 0:
+            d[0] = premio
+            d[2] = round(d[0] * d[1] / 100.0, 2)
+            total += d[2]
+    return total, round(base_imponible + rec_financiero + total, 2), [d[0] for d in detalle], [d[2] for d in detalle]
+
+
+def _filas(rnd):
+    bases = [1000.0, 1000.0, 1300.0, 0.0]
+    return [FilaImpuesto(f"I{n}", rnd.choice(bases), rnd.choice([0.0, 0.6, 1.2, 3.0, 10.5, 21.0]))
+            for n in range(rnd.randint(0, 5))]
+
+
+def test_clasifica_las_filas():
+    filas = [FilaImpuesto("IVA", 1000.0, 21.0), FilaImpuesto("IIBB", 1000.0, 3.0),
+             FilaImpuesto("SELL", 1300.0, 1.2), FilaImpuesto("TASA", 1000.0, 0.5)]
+    plan = PlanImpuestos.desde_filas(filas)
+    assert plan.codigos == ("IVA", "IIBB", "SELL", "TASA")
+    assert plan.en_base == (True, True, False, True)
+    assert plan.alicuotas_base == (21.0, 3.0, 0.5)
+    assert plan.alicuotas_cascada == (1.2,)
+    assert plan.alicuota_base == pytest.approx(24.5)
+    assert plan.multiplicador == pytest.approx(1.245 * 1.012)
+    assert not plan.ordenado
+    assert PlanImpuestos.desde_filas(filas[:3]).ordenado
+
+
+def test_sin_impuestos():
+    plan = PlanImpuestos.desde_filas([])
+    assert plan.multiplicador == 1.0
+    assert plan.premio(1234.567) == 1234.57
+    assert plan.evaluar(1234.567) == (1234.57, [], [])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_igual_al_calculo_original(seed):
+    rnd = random.Random(seed)
+    for _ in range(2000):
+        filas = _filas(rnd)
+        plan = PlanImpuestos.desde_filas(filas)
+        base = rnd.choice([0.0, 0.004, round(rnd.uniform(0, 1e6), 2), rnd.uniform(0, 1e6)])
+        premio, bases, importes = _original(filas, base)
+        assert plan.evaluar(base) == (premio, bases, importes)
+        assert plan.premio(base) == premio
+
+        rec_financiero = round(base * rnd.choice([0.0, 10.07, 25.87]) / 100.0, 2)
+        base_con_financiero = round(round(base, 2) + rec_financiero, 2)
+        esperado = _original_financiero(bases, plan.alicuotas, base_con_financiero, round(base, 2), rec_financiero)
+        assert plan.aplicar_financiero(bases, base_con_financiero, round(base, 2), rec_financiero) == esperado
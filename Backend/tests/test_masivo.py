@@ -0,0 +1,45 @@
+import json
+
+import masivo
+
+
+def _partes(texto: bytes, tamaño: int):
+    return [texto[i:i + tamaño] for i in range(0, len(texto), tamaño)]
+
+
+def test_lineas_texto_por_partes():
+    texto = "\ufeffaño,ñandú\r\nsegunda\n\núltima sin fin".encode("utf-8")
+    for tamaño in (1, 2, 3, 7, len(texto)):
+        assert list(masivo.lineas_texto(_partes(texto, tamaño))) == [
+            "año,ñandú\r\n", "segunda\n", "\n", "última sin fin"]
+
+
+def test_csv_con_campos_de_varias_lineas():
+    texto = b'application_id,premioinformado,dias,sumaTotal,cuotas,tipo\n"7\n",0,180,1500000,3,c\n8,0,90,1000,1,\n'
+    items = list(masivo.leer_items(masivo.lineas_texto(_partes(texto, 5)), "csv"))
+    assert items == [masivo.Item("7", 0, 180, 1500000.0, 3, "C"), masivo.Item("8", 0, 90, 1000.0, 1, "F")]
+
+
+def test_linea_ndjson_que_no_es_un_objeto():
+    lineas = ['[1, 2]\n', '"7"\n', '{"application_id": "7", "sumaTotal": 1}\n', 'no es json\n']
+    items = list(masivo.leer_items(lineas, "ndjson"))
+    assert items[0].error == "Línea inválida: se esperaba un objeto JSON, no list"
+    assert items[1].error == "Línea inválida: se esperaba un objeto JSON, no str"
+    assert items[2].application_id == "7" and items[2].error.startswith("Línea inválida: KeyError")
+    assert items[3].application_id == "" and items[3].error.startswith("Línea inválida:")
+
+
+def test_archivo_por_partes(api):
+    lineas = [json.dumps({"application_id": str(n), "premioinformado": 0, "dias": 180, "sumaTotal": 1500000,
+                          "cuotas": 3, "tipo": "C"}) + "\n" for n in range(1, 41)]
+    lineas[5] = "[]\n"
+    cuerpo = "".join(lineas).encode()
+    respuesta = api.cliente.post("/recotizar/archivo", content=iter(_partes(cuerpo, 333)),
+                                 headers={"content-type": "application/x-ndjson"})
+    assert respuesta.status_code == 200
+    resultados = [json.loads(linea) for linea in respuesta.text.splitlines()]
+    assert len(resultados) == 40
+    assert resultados[5] == {"application_id": "", "quote": None,
+                             "error": "Línea inválida: se esperaba un objeto JSON, no list"}
+    individual = api.cliente.get("/recotizar2/7/0/180/1500000/3/C").json()
+    assert resultados[6]["error"] is None and resultados[6]["quote"] == individual
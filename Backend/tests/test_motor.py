@@ -0,0 +1,41 @@
+"""El motor vectorizado contra el cálculo escalar de cada cotización."""
+import random
+
+import numpy as np
+import pytest
+
+import motor
+from bench import micro, standin
+from cotizacion import TARIFA, calcular_cotizacion
+
+
+def test_round2_igual_a_round():
+    rnd = random.Random(2)
+    valores = [rnd.uniform(-1e7, 1e7) for _ in range(20000)]
+    # Empates y casi empates en ,xx5
+    valores += [n / 1000 for n in range(-20000, 20000, 5)]
+    valores += [round(rnd.uniform(0, 1e6), 2) + 0.005 for _ in range(20000)]
+    valores += [0.0, -0.0, 1e16, -1e16, 2.0 ** 52 / 100, 1.005, 2.675]
+    esperados = [round(v, 2) for v in valores]
+    assert motor._round2(np.array(valores)).tolist() == esperados
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_cotizar_igual_al_escalar(seed):
+    tabla = standin.tabla_sintetica(400, seed)
+    casos = micro.casos(1500, seed)
+    objetivos = np.array([c.suma / 100.0 * TARIFA.factor_tipo[c.tipo] for c in casos])
+    alicuotas, en_base = motor.matriz_impuestos([c.plan for c in casos])
+    resultado = motor.cotizar(
+        objetivos,
+        np.array([c.fila.tasaAplicada for c in casos]),
+        np.array([c.suma for c in casos]),
+        np.array([c.dias for c in casos], dtype=np.float64),
+        np.array([TARIFA.aumento_cuotas[c.cuotas] for c in casos]),
+        alicuotas, en_base, tabla,
+        gastos=np.array([c.fila.gastosEscribania for c in casos]),
+        rec_admin_pct=TARIFA.rec_admin_pct,
+    )
+    for i, c in enumerate(casos):
+        escalar = calcular_cotizacion(c.fila, c.plan, 0, c.dias, c.suma, c.tipo, c.cuotas, tabla).model_dump()
+        assert motor.fila(resultado, i, c.plan.codigos) == escalar, i
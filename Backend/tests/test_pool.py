@@ -0,0 +1,46 @@
+import time
+
+from pool import ConnectionPool
+
+
+class Conexion:
+    def __init__(self):
+        self.consultas = 0
+        self.cerrada = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.consultas += 1
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        self.cerrada = True
+
+    def rollback(self):
+        pass
+
+
+def test_no_valida_conexiones_usadas_recien():
+    pool = ConnectionPool(Conexion, min_size=1, max_size=1)
+    pool.warm()
+    for _ in range(5):
+        with pool.connection() as conn:
+            pass
+    assert conn.consultas == 0
+    pool.close()
+
+
+def test_valida_la_conexion_ociosa():
+    pool = ConnectionPool(Conexion, min_size=1, max_size=1, ping_after=0.01)
+    pool.warm()
+    with pool.connection() as conn:
+        pass
+    time.sleep(0.02)
+    with pool.connection() as otra:
+        pass
+    assert otra is conn and conn.consultas == 1
+    pool.close()
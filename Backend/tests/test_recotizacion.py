@@ -0,0 +1,47 @@
+import multiprocessing as mp
+import threading
+
+import pytest
+
+from bench.standin import tabla_sintetica
+from bench_recotizacion import cartera_sintetica
+from recotizacion import Recotizador, cotizar_trabajos
+
+
+@pytest.mark.parametrize("start_method", [None, "spawn"])
+def test_pool_paralelo_igual_al_secuencial(start_method):
+    tabla = tabla_sintetica(200)
+    trabajos = cartera_sintetica(60, seed=2)
+    recotizador = Recotizador(tabla, workers=2, chunk_size=10, start_method=start_method)
+    try:
+        assert recotizador.recotizar(trabajos) == cotizar_trabajos(trabajos, tabla)
+    finally:
+        recotizador.close()
+
+
+def test_fork_por_defecto():
+    esperado = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+    assert Recotizador(tabla_sintetica(10)).start_method == esperado
+
+
+def test_un_solo_pool_con_llamadas_simultaneas(monkeypatch):
+    recotizador = Recotizador(tabla_sintetica(10), workers=2, start_method="fork")
+    creados = []
+    barrera = threading.Barrier(8)
+
+    def crear():
+        creados.append(object())
+        return creados[-1]
+
+    monkeypatch.setattr(recotizador, "_crear_pool", crear)
+
+    def pedir():
+        barrera.wait()
+        recotizador._pool()
+
+    hilos = [threading.Thread(target=pedir) for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert len(creados) == 1
@@ -0,0 +1,133 @@
+import sqlite3
+
+import pytest
+
+import replica
+from bench import standin
+
+CURSOR = ["s.RowVer", "c.RowVer", "i.RowVer"]
+VERSION = replica.version_rowversion(*CURSOR)
+
+
+def test_traducir_datediff():
+    sql = replica.traducir("select datediff(day, s.Sol1VigDesFac, s.Sol1VigHasFac) dias from solici s")
+    assert sql == ("select cast(julianday(s.Sol1VigHasFac) - julianday(s.Sol1VigDesFac) as integer) dias "
+                   "from solici s")
+
+
+def test_traducir_for_json_path():
+    sql = replica.traducir("""select (select i.ImpCod, i.Sol2Ali
+         from SolImp i
+         where i.SolNro = s.SolNro
+         for json path) as impuestosJson from solici s""")
+    assert sql == ("select (select case when count(*) > 0 then json_group_array(json_object("
+                   "'ImpCod', i.ImpCod, 'Sol2Ali', i.Sol2Ali)) end from SolImp i\n"
+                   "         where i.SolNro = s.SolNro) as impuestosJson from solici s")
+
+
+def test_traducir_deja_lo_demas():
+    sql = "select checksum(binary_checksum(s.Sol1Pri)) from solici s where s.EmpCod = ? order by s.SolNro desc"
+    assert replica.traducir(sql) == sql
+
+
+def test_traducir_top():
+    sql = replica.traducir("select top (?) s.SolNro from solici s where s.EmpCod = ? and s.RamCod = ? "
+                           "order by s.SolNro desc")
+    assert sql == "select s.SolNro from solici s where s.EmpCod = ?2 and s.RamCod = ?3 order by s.SolNro desc limit ?1"
+
+
+def test_consultas_traducidas_en_sqlite(tmp_path):
+    path = str(tmp_path / "base.sqlite")
+    standin.sembrar(path, 3)
+    cursor = replica.conectar(path).cursor()
+    cursor.execute("""select datediff(day, s.Sol1VigDesFac, s.Sol1VigHasFac) as dias,
+        (select i.ImpCod, i.Sol2Ali from SolImp i where i.SolNro = s.SolNro and i.ImpCod = 'no hay' for json path)
+            as ninguno,
+        (select i.ImpCod from SolImp i where i.SolNro = s.SolNro and i.ImpCod = 'IVA' for json path) as iva
+        from solici s where s.SolNro = ?""", 1)
+    fila = cursor.fetchone()
+    assert fila.dias > 0
+    assert fila.ninguno is None
+    assert fila.iva == '[{"ImpCod":"IVA"}]'
+    cursor.execute("select top (?) s.SolNro from solici s where s.EmpCod = ? order by s.SolNro desc",
+                   2, standin.EMPRESA)
+    assert [f.SolNro for f in cursor.fetchall()] == [3, 2]
+
+
+class Origen:
+    """Base sintética con una columna RowVer en solici, SolRieCob y SolImp."""
+
+    def __init__(self, path):
+        self.path = path
+        self.contador = 1
+        standin.sembrar(path, 30)
+        conn = sqlite3.connect(path)
+        for tabla, _ in replica.TABLAS_CURSOR:
+            conn.execute(f"alter table {tabla} add column RowVer integer default 1")
+        conn.commit()
+        conn.close()
+
+    def ejecutar(self, sql, *params):
+        conn = sqlite3.connect(self.path)
+        conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+    def editar(self, tabla, cambio, sol):
+        self.contador += 1
+        self.ejecutar(f"update {tabla} set {cambio}, RowVer = ? where SolNro = ?", self.contador, sol)
+
+
+@pytest.fixture
+def origen(tmp_path):
+    return Origen(str(tmp_path / "origen.sqlite"))
+
+
+def _exportar(origen, destino, cursor=CURSOR):
+    conexion = replica.conectar(origen.path)
+    try:
+        return replica.exportar(conexion, destino, VERSION, cursor, empresa=standin.EMPRESA, ramo=standin.RAMO)
+    finally:
+        conexion.close()
+
+
+def _valor(destino, sql, *params):
+    conn = sqlite3.connect(destino)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("cursor", [CURSOR, None])
+def test_exportar_sigue_las_tres_tablas_y_las_bajas(origen, tmp_path, cursor):
+    destino = str(tmp_path / "replica.sqlite")
+    assert _exportar(origen, destino, cursor)["modo"] == "completa"
+    assert _valor(destino, "select count(*) from solici") == [(30,)]
+
+    origen.editar("solici", "Sol1Pri = 1", 3)
+    origen.editar("SolRieCob", "Sol14TasApl = 2", 4)
+    origen.editar("SolImp", "Sol2Ali = 3", 5)
+    origen.ejecutar("delete from solici where SolNro = ?", 6)
+    origen.ejecutar("delete from SolRieCob where SolNro = ?", 6)
+    origen.ejecutar("delete from SolImp where SolNro = ?", 6)
+
+    resultado = _exportar(origen, destino, cursor)
+    assert resultado["modo"] == ("cursor" if cursor else "versiones")
+    assert (resultado["copiadas"], resultado["borradas"]) == (3, 1)
+    assert _valor(destino, "select Sol1Pri from solici where SolNro = 3") == [(1.0,)]
+    assert _valor(destino, "select Sol14TasApl from SolRieCob where SolNro = 4") == [(2.0,)]
+    assert {a for (a,) in _valor(destino, "select Sol2Ali from SolImp where SolNro = 5")} == {3.0}
+    for tabla, _ in replica.TABLAS_CURSOR:
+        assert _valor(destino, f"select count(*) from {tabla} where SolNro = 6") == [(0,)]
+
+    # Sin cambios no se copia nada
+    resultado = _exportar(origen, destino, cursor)
+    assert (resultado["copiadas"], resultado["borradas"]) == (0, 0)
+
+
+def test_cambiar_el_cursor_exporta_completa(origen, tmp_path):
+    destino = str(tmp_path / "replica.sqlite")
+    _exportar(origen, destino, None)
+    assert _exportar(origen, destino, CURSOR)["modo"] == "completa"
+    assert _exportar(origen, destino, CURSOR)["modo"] == "cursor"
@@ -0,0 +1,112 @@
+"""Vigencia de cache_solicitudes ante cambios en solici, SolRieCob y SolImp."""
+import sqlite3
+
+import pytest
+
+import replica
+from cache_resultados import CacheResultados
+
+# Una modificación por tabla, como la haría la aplicación que edita la solicitud
+EDICIONES = [
+    ("solici", "Sol1Pri = Sol1Pri + 100"),
+    ("SolRieCob", "Sol14TasApl = Sol14TasApl * 2"),
+    ("SolImp", "Sol2Ali = Sol2Ali + 1"),
+]
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def _editar(path, tabla, cambio, sol, rowversion=None):
+    conn = sqlite3.connect(path)
+    if rowversion is not None:
+        cambio += f", RowVer = {rowversion}"
+    conn.execute(f"update {tabla} set {cambio} where EmpCod = 1 and RamCod = 9 and SolNro = ?", (sol,))
+    conn.commit()
+    conn.close()
+
+
+def _leer(api, sol):
+    m = api.modulo
+    conexion = replica.conectar(api.path)
+    try:
+        return m._fetch_cotizacion(conexion.cursor(), m.ramos_activos[(1, 9)], sol)
+    finally:
+        conexion.close()
+
+
+@pytest.fixture
+def reloj(api, monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(api.modulo.cache_solicitudes, "_clock", reloj)
+    api.modulo.cache_solicitudes.clear()
+    yield reloj
+    api.modulo.cache_solicitudes.clear()
+
+
+def test_cada_acierto_revalida_el_checksum(api, reloj):
+    anterior = _leer(api, "60")
+    # Sin cambios la revalidación acepta la entrada
+    assert _leer(api, "60") is anterior
+    for tabla, cambio in EDICIONES:
+        _editar(api.path, tabla, cambio, 60)
+        fuente = _leer(api, "60")
+        assert fuente.version != anterior.version
+        assert fuente.fila != anterior.fila or fuente.plan.alicuotas != anterior.plan.alicuotas
+        anterior = fuente
+
+
+def test_rowversion_de_las_tres_tablas(api, reloj, monkeypatch):
+    m = api.modulo
+    columnas = ["s.RowVer", "c.RowVer", "i.RowVer"]
+    expresion = replica.version_rowversion(*columnas)
+    conn = sqlite3.connect(api.path)
+    for tabla, _ in EDICIONES:
+        if "RowVer" not in [c[1] for c in conn.execute(f"pragma table_info({tabla})")]:
+            conn.execute(f"alter table {tabla} add column RowVer integer default 1")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(m, "QUERY_COTIZACION", m.QUERY_COTIZACION.replace(m.VERSION_SOLICITUD, expresion))
+    monkeypatch.setattr(m, "QUERY_VERSION", m.QUERY_VERSION.replace(m.VERSION_SOLICITUD, expresion))
+
+    anterior = _leer(api, "61")
+    for rowversion, (tabla, cambio) in enumerate(EDICIONES, start=2):
+        assert _leer(api, "61") is anterior
+        _editar(api.path, tabla, cambio, 61, rowversion)
+        fuente = _leer(api, "61")
+        assert fuente.version == rowversion
+        assert fuente.fila != anterior.fila or fuente.plan.alicuotas != anterior.plan.alicuotas
+        anterior = fuente
+
+
+def test_el_cache_de_resultados_no_sirve_datos_editados(api, reloj, monkeypatch, tmp_path):
+    m = api.modulo
+    resultados = CacheResultados(str(tmp_path / "resultados.sqlite"))
+    monkeypatch.setattr(m, "resultados_cache", resultados)
+    url = "/recotizar2/62/0/180/1500000/3/C"
+    try:
+        anterior = api.cliente.get(url).content
+        assert api.cliente.get(url).content == anterior
+        assert resultados.stats()["aciertos"] == 1
+        _editar(api.path, "SolImp", "Sol2Ali = Sol2Ali + 1", 62)
+        assert api.cliente.get(url).content != anterior
+    finally:
+        resultados.close()
+
+
+def test_precalentar_lee_las_mas_recientes(api, reloj):
+    m = api.modulo
+    conexion = replica.conectar(api.path)
+    try:
+        assert m._precalentar_ramo(conexion.cursor(), m.ramos_activos[(1, 9)], 5) == 5
+    finally:
+        conexion.close()
+    assert len(m.cache_solicitudes) == 5
+    fallos = m.cache_solicitudes.stats()["fallos"]
+    assert all(_leer(api, str(sol)) is not None for sol in range(196, 201))
+    assert m.cache_solicitudes.stats()["fallos"] == fallos
@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+import solver
+from bench import micro
+from derechos import TablaDerechos
+from impuestos import PlanImpuestos
+
+
+PRIMAS = [0.0] + [100.0 * 1.35 ** i for i in range(60)]
+
+
+@pytest.fixture(scope="module", params=["creciente", "con bajas"])
+def tabla(request):
+    # Tramos con saltos de derecho, como deremi.xlsx; la segunda tabla baja el
+    # derecho cada 7 tramos y no admite la banda en forma cerrada
+    if request.param == "creciente":
+        return TablaDerechos(PRIMAS, [20.0 + 3.5 * i for i in range(61)])
+    return TablaDerechos(PRIMAS, [round(20.0 + 3.5 * i + (i % 7) * 0.8, 2) for i in range(61)])
+
+
+def _biseccion_original(objetivo, tasa, suma, dias, plan, tabla, bonificacion=0.0):
+    def evaluar(t):
+        prima = solver.calcular_prima(t, suma, dias)
+        return solver.premio_base(prima, tabla.derecho(prima), plan, 15.0, bonificacion)
+    return solver.biseccion(objetivo, tasa, evaluar)
+
+
+def test_resolver_tasa_reproduce_la_biseccion(tabla):
+    for c in micro.casos(1500, seed=11):
+        for objetivo in (c.objetivo, c.objetivo * 0.05, c.objetivo * 2.7, 0.0, 1.0):
+            esperado = _biseccion_original(objetivo, c.fila.tasaAplicada, c.suma, c.dias, c.plan, tabla)
+            assert solver.resolver_tasa(objetivo, c.fila.tasaAplicada, c.suma, c.dias, c.plan, 15.0, tabla) == esperado
+
+
+def test_resolver_tasa_con_bonificacion(tabla):
+    for c in micro.casos(300, seed=5):
+        esperado = _biseccion_original(c.objetivo, c.fila.tasaAplicada, c.suma, c.dias, c.plan, tabla, 250.0)
+        assert solver.resolver_tasa(c.objetivo, c.fila.tasaAplicada, c.suma, c.dias, c.plan, 15.0, tabla,
+                                    250.0) == esperado
+
+
+@pytest.mark.parametrize("objetivo", [1e12, None])
+def test_sin_convergencia_igual_que_la_biseccion(tabla, objetivo):
+    # Inalcanzable con la tasa máxima, o dentro del salto de derecho entre dos
+    # tramos: la bisección agota MAX_ITER y se informa la tasa siguiente
+    plan = PlanImpuestos.compilar(["IVA"], [21.0], [True])
+    if objetivo is None:
+        prima = tabla.primas[20]
+        objetivo = solver.premio_base(prima, tabla.derecho(prima), plan, 15.0) - 1.0
+    esperado = _biseccion_original(objetivo, 5.0, 1e6, 365, plan, tabla)
+    obtenido = solver.resolver_tasa(objetivo, 5.0, 1e6, 365, plan, 15.0, tabla)
+    assert obtenido == esperado
+    assert obtenido.iteraciones == solver.MAX_ITER
+
+
+def test_banda_cerrada_evita_los_pasos(tabla, monkeypatch):
+    busquedas = []
+    monkeypatch.setattr(solver.metricas, "sumar",
+                        lambda nombre, valor=1: busquedas.append(valor) if nombre == "derechos_busquedas_total" else None)
+    casos = micro.casos(500, seed=4)
+    iteraciones = sum(solver.resolver_tasa(c.objetivo, c.fila.tasaAplicada, c.suma, c.dias, c.plan, 15.0,
+                                           tabla).iteraciones + 1 for c in casos)
+    if tabla.creciente:
+        # Sólo los pasos dentro de la banda buscan un derecho
+        assert sum(busquedas) < iteraciones / 4
+    else:
+        assert solver.banda_cerrada(casos[0].objetivo, casos[0].suma, casos[0].dias, casos[0].plan, 15.0,
+                                    tabla) is None
+        assert sum(busquedas) >= iteraciones
+
+
+def test_banda_cerrada():
+    tabla = TablaDerechos(PRIMAS, [20.0 + 3.5 * i for i in range(61)])
+    plan = PlanImpuestos.compilar(["IVA", "IIBB"], [21.0, 3.0], [True, False])
+    rnd = random.Random(8)
+    for _ in range(300):
+        suma, dias = rnd.uniform(1e4, 3e7), rnd.choice([30, 365])
+        objetivo = rnd.uniform(0, 3e5)
+        desde, hasta = solver.banda_cerrada(objetivo, suma, dias, plan, 15.0, tabla)
+        for t in [desde * rnd.random() for _ in range(20)] + [hasta + rnd.expovariate(1e-2) for _ in range(20)]:
+            prima = solver.calcular_prima(t, suma, dias)
+            premio = solver.premio_base(prima, tabla.derecho(prima), plan, 15.0)
+            assert abs(premio - objetivo) > solver.TOLERANCIA
+            assert (premio < objetivo) == (t < desde)
+
+
+def test_pasos_lejanos_no_evaluan_el_premio(tabla):
+    c = micro.casos(1, seed=3)[0]
+    evaluaciones = []
+
+    def evaluar(t):
+        evaluaciones.append(t)
+        prima = solver.calcular_prima(t, c.suma, c.dias)
+        return solver.premio_base(prima, tabla.derecho(prima), c.plan, 15.0)
+
+    def aproximar(t):
+        prima = solver.calcular_prima(t, c.suma, c.dias)
+        return solver.calcular_base_imponible(prima, tabla.derecho(prima), 15.0) * c.plan.multiplicador
+
+    solucion = solver.biseccion(c.objetivo, c.fila.tasaAplicada, evaluar, aproximar, solver.cota_redondeo(c.plan))
+    assert solucion == solver.biseccion(c.objetivo, c.fila.tasaAplicada, evaluar)
+    assert len(evaluaciones) - (solucion.iteraciones + 1) < solucion.iteraciones + 1
+
+
+def test_cota_redondeo():
+    rnd = random.Random(2)
+    for _ in range(20000):
+        n = rnd.randint(0, 5)
+        plan = PlanImpuestos.compilar(range(n), [rnd.choice([0.0, 0.6, 1.2, 3.0, 21.0, 27.0]) for _ in range(n)],
+                                      [rnd.random() < 0.7 for _ in range(n)])
+        base = rnd.choice([rnd.uniform(-5, 5), rnd.uniform(0, 1e4), rnd.uniform(0, 1e8)])
+        assert abs(plan.premio(base) - base * plan.multiplicador) <= solver.cota_redondeo(plan)
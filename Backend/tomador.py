@@ -0,0 +1,51 @@
+"""Perfil del tomador de una solicitud e importes itemA–itemE de /policyholder.
+
+El perfil (id, CUIT, nombre y provincia) no depende del monto ni del plazo,
+así que se lee una vez por solicitud y se cachea; los ítems son proporciones
+de ``sumaAseg * meses`` que se calculan acá en lugar de en la consulta.
+"""
+from decimal import Decimal
+from typing import NamedTuple
+
+# Proporción de sumaAseg * meses de cada ítem
+PROPORCIONES_ITEMS = {
+    "itemA": Decimal(".20"),
+    "itemB": Decimal("0"),
+    "itemC": Decimal(".25"),
+    "itemD": Decimal(".20"),
+    "itemE": Decimal(".35"),
+}
+
+
+class PerfilTomador(NamedTuple):
+    id: str | None
+    cuit: str | None
+    name: str | None
+    provinceCode: str | None
+    province: str | None
+
+
+def perfil_desde_fila(row, columna_id: str = "id") -> PerfilTomador:
+    id_ = getattr(row, columna_id)
+    return PerfilTomador(None if id_ is None else str(id_), row.cuit, row.name, row.provinceCode, row.province)
+
+
+def parsear_proporciones(texto: str | None) -> dict[str, Decimal]:
+    """Proporciones de ``"itemA=.20,itemC=.3"`` sobre las de por defecto."""
+    proporciones = dict(PROPORCIONES_ITEMS)
+    for parte in (texto or "").split(","):
+        if not parte.strip():
+            continue
+        item, _, valor = parte.partition("=")
+        item = item.strip()
+        if item not in proporciones:
+            raise ValueError(f"Ítem desconocido en las proporciones: {item!r}")
+        proporciones[item] = Decimal(valor.strip())
+    return proporciones
+
+
+def items(sumaAseg: int, meses: int, proporciones: dict[str, Decimal] = PROPORCIONES_ITEMS) -> dict[str, float]:
+    # En Decimal, como el numeric de SQL Server: el importe sale exacto y recién
+    # después se pasa a float
+    producto = Decimal(sumaAseg) * Decimal(meses)
+    return {item: float(producto * p) for item, p in proporciones.items()}